@@ -3,11 +3,48 @@
 from __future__ import annotations
 
 import asyncio
+from dataclasses import dataclass, field
 import logging
+from typing import Any
 
 from homeassistant import config_entries, core
-from homeassistant.const import Platform
+from homeassistant.const import (
+    CONF_IP_ADDRESS,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    Platform,
+)
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    ALLOWED_LIMIT,
+    COMPLIANCE_LOG_DIR,
+    CONF_FALLBACK_LIMIT,
+    CONF_MODBUS_PORT,
+    CONF_MODBUS_UNIT,
+    CONF_SIZE,
+    CONF_TRANSPORT,
+    CONF_WATCHDOG_TIMEOUT,
+    LIMITED_PRODUCTION,
+    SIGNAL_RECONFIGURED,
+    TRANSPORT_MODBUS,
+    MqttBroker,
+    MqttPassword,
+    MqttPort,
+    MqttUser,
+)
+from .compliance_log import ComplianceLog
+from .controller import STORAGE_VERSION, LimitController, storage_key
+from .fleet import Fleet, async_join_fleet, async_leave_fleet
+from .lpp_a import FroniusGEN24
+from .metrics import RequestMetrics, StartupTimes
+from .modbus import MODBUS_PORT, MODBUS_UNIT, SunSpecLimit
+from .monitor import FeedInMonitor
+from .mqtt_hub import MqttHub, async_get_mqtt_hub, async_release_mqtt_hub
+from .plant import Plant, async_join_plant, async_leave_plant
+from .watchdog import LimitWatchdog
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -15,24 +52,205 @@ _LOGGER = logging.getLogger(__name__)
 # eg <cover.py> and <sensor.py>
 _PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.BINARY_SENSOR, Platform.TEXT]
 
+# Startup milestones not reached by then are left out of the report
+STARTUP_REPORT_TIMEOUT = 120
+
+
+@dataclass
+class Gen24LppData:
+    """Runtime data shared by the platforms of one config entry."""
+
+    fronius: FroniusGEN24
+    controller: LimitController
+    monitor: FeedInMonitor
+    mqtt: MqttHub
+    metrics: RequestMetrics
+    watchdog: LimitWatchdog
+    fleet: Fleet
+    startup: StartupTimes
+    plant: Plant | None = None
+    # entry data the runtime objects were last configured with
+    config: dict[str, Any] = field(default_factory=dict)
+
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: config_entries.ConfigEntry
 ) -> bool:
-    """Set up Gen24_LPP from a config entry."""
+    """Set up Gen24_LPP from a config entry.
+
+    Nothing here waits for the network: the broker connection and the first
+    inverter request run in the background, in parallel, and are reported
+    as startup milestones once both are done.
+    """
+    startup = StartupTimes()
+
+    # One client per entry on the keep-alive session shared by all entries, so
+    # the digest nonce and the TCP connection survive between limit writes.
+    fleet = async_join_fleet(hass, entry)
+    fronius = FroniusGEN24(
+        entry.data[CONF_IP_ADDRESS],
+        entry.data[CONF_USERNAME],
+        entry.data[CONF_PASSWORD],
+        session=fleet.session,
+        fleet=fleet.scheduler,
+    )
+    metrics = RequestMetrics()
+    fronius.on_request = metrics.record_request
+    controller = LimitController(
+        hass,
+        entry,
+        fronius,
+        _create_modbus(entry),
+        # kept when the entry is removed, it is the evidence of past limits
+        ComplianceLog(hass.config.path(COMPLIANCE_LOG_DIR, entry.entry_id)),
+    )
+    controller.on_applied = fleet.record_applied
+    controller.on_write = metrics.record_write
+    mqtt = async_get_mqtt_hub(hass, entry)
+    plant = async_join_plant(hass, entry, controller, mqtt)
+    entry.runtime_data = Gen24LppData(
+        fronius=fronius,
+        controller=controller,
+        monitor=FeedInMonitor(hass, entry, fronius, controller, plant),
+        mqtt=mqtt,
+        metrics=metrics,
+        watchdog=LimitWatchdog(hass, entry, controller),
+        fleet=fleet,
+        startup=startup,
+        plant=plant,
+        config=dict(entry.data),
+    )
+    # restored before the platforms, so entities start with the last state
+    await controller.async_load()
+    startup.mark("state_restored")
+    controller.async_start()
+    entry.runtime_data.monitor.async_start()
+    entry.runtime_data.watchdog.async_watch([entry.data[ALLOWED_LIMIT]])
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
     await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
+    startup.mark("platforms")
+    entry.async_create_background_task(
+        hass, _async_report_startup(entry), f"gen24lpp startup {entry.title}"
+    )
 
     return True
 
 
+async def _async_report_startup(entry: config_entries.ConfigEntry) -> None:
+    """Log when the broker connection and the inverter are ready."""
+    data: Gen24LppData = entry.runtime_data
+
+    async def milestone(name: str, event: asyncio.Event) -> None:
+        await event.wait()
+        data.startup.mark(name)
+
+    try:
+        async with asyncio.timeout(STARTUP_REPORT_TIMEOUT):
+            await asyncio.gather(
+                milestone("mqtt_connected", data.mqtt.connected),
+                milestone("inverter_ready", data.controller.inverter_ready),
+            )
+    except TimeoutError:
+        pass
+    _LOGGER.debug(
+        "Startup of %s (ms): %s",
+        entry.title,
+        ", ".join(f"{name} {ms:.0f}" for name, ms in data.startup.milestones.items()),
+    )
+
+
+def _create_modbus(entry: config_entries.ConfigEntry) -> SunSpecLimit | None:
+    """Return the Modbus transport of an entry, None for HTTP only."""
+    if entry.data.get(CONF_TRANSPORT) != TRANSPORT_MODBUS:
+        return None
+    # the HTTP address may carry a port, Modbus has its own
+    host = entry.data[CONF_IP_ADDRESS]
+    if host.count(":") == 1:
+        host = host.split(":")[0]
+    return SunSpecLimit(
+        host,
+        entry.data.get(CONF_MODBUS_PORT, MODBUS_PORT),
+        entry.data.get(CONF_MODBUS_UNIT, MODBUS_UNIT),
+    )
+
+
+async def _async_update_listener(
+    hass: HomeAssistant, entry: config_entries.ConfigEntry
+) -> None:
+    """Apply changed settings to the running entry instead of reloading it.
+
+    Only the affected part is rebuilt, so limit control continues meanwhile.
+    """
+    data: Gen24LppData = entry.runtime_data
+    changed = {
+        key
+        for key in data.config.keys() | entry.data.keys()
+        if data.config.get(key) != entry.data.get(key)
+    }
+    data.config = dict(entry.data)
+    if not changed:
+        return
+    _LOGGER.debug("Reconfiguring %s: %s", entry.title, ", ".join(sorted(changed)))
+
+    old_modbus = data.controller.modbus
+    if changed & {
+        CONF_IP_ADDRESS,
+        CONF_TRANSPORT,
+        CONF_MODBUS_PORT,
+        CONF_MODBUS_UNIT,
+    } and (old_modbus or entry.data.get(CONF_TRANSPORT) == TRANSPORT_MODBUS):
+        data.controller.async_set_transport(_create_modbus(entry))
+        if old_modbus:
+            await old_modbus.close()
+
+    if changed & {CONF_IP_ADDRESS, CONF_USERNAME, CONF_PASSWORD}:
+        data.fronius.reconfigure(
+            entry.data[CONF_IP_ADDRESS],
+            entry.data[CONF_USERNAME],
+            entry.data[CONF_PASSWORD],
+        )
+        data.controller.async_resync()
+    elif CONF_SIZE in changed:
+        # wattPeakReferenceValue is taken from the entry on every write
+        data.controller.async_reapply()
+
+    old_mqtt = None
+    if changed & {MqttBroker, MqttPort, MqttUser, MqttPassword}:
+        old_mqtt = data.mqtt
+        data.mqtt = async_get_mqtt_hub(hass, entry)
+    if data.plant and (old_mqtt or ALLOWED_LIMIT in changed):
+        async_leave_plant(hass, entry, data.plant)
+        data.plant = async_join_plant(hass, entry, data.controller, data.mqtt)
+        data.monitor.plant = data.plant
+    if changed & {ALLOWED_LIMIT, CONF_WATCHDOG_TIMEOUT, CONF_FALLBACK_LIMIT}:
+        data.watchdog.async_watch([entry.data[ALLOWED_LIMIT]])
+    if old_mqtt or changed & {ALLOWED_LIMIT, LIMITED_PRODUCTION}:
+        # entities subscribe on the new hub before the old one is released
+        async_dispatcher_send(hass, SIGNAL_RECONFIGURED.format(entry.entry_id))
+    if old_mqtt:
+        await async_release_mqtt_hub(hass, old_mqtt)
+
+
 async def async_unload_entry(
     hass: core.HomeAssistant, entry: config_entries.ConfigEntry
 ) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, _PLATFORMS):
-        try:
-            entry.runtime_data.listener()
-        except AttributeError:
-            pass
+        if entry.runtime_data.plant:
+            async_leave_plant(hass, entry, entry.runtime_data.plant)
+        entry.runtime_data.watchdog.async_stop()
+        await entry.runtime_data.monitor.async_stop()
+        await entry.runtime_data.controller.async_stop()
+        if modbus := entry.runtime_data.controller.modbus:
+            await modbus.close()
+        await async_release_mqtt_hub(hass, entry.runtime_data.mqtt)
+        await async_leave_fleet(hass, entry)
     return unload_ok
+
+
+async def async_remove_entry(
+    hass: core.HomeAssistant, entry: config_entries.ConfigEntry
+) -> None:
+    """Remove the persisted limit state of a deleted entry."""
+    await Store(hass, STORAGE_VERSION, storage_key(entry)).async_remove()
@@ -1,40 +1,22 @@
-
 """Number platform for gen24lpp."""
 
 from __future__ import annotations
 
-import json
+from collections.abc import Callable
 import logging
-import random
-
-import paho.mqtt.client as mqtt
-
-from datetime import timedelta
 
 from homeassistant.components.switch import SwitchEntity, SwitchEntityDescription
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    CONF_IP_ADDRESS,
-    CONF_PASSWORD,
-    CONF_USERNAME,
-    EntityCategory,
-)
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import (
-    CONF_SIZE,
-    LIMITED_PRODUCTION,
-    MqttBroker,
-    MqttPassword,
-    MqttPort,
-    MqttUser,
-)
-from .lpp_a import FroniusGEN24
+from .const import LIMITED_PRODUCTION, SIGNAL_RECONFIGURED
+from .entity import ChangeOnlyEntity
 
 _LOGGER = logging.getLogger(__name__)
-SCAN_INTERVAL = timedelta(seconds=1)
 
 
 async def async_setup_entry(
@@ -59,32 +41,42 @@ async def async_setup_entry(
     async_add_entities(entities)
 
 
-class SoftLimitSwitch(SwitchEntity):
+class SoftLimitSwitch(ChangeOnlyEntity, SwitchEntity):
     """Companion on/off switch that is part of the same device as the number."""
 
+    # limits, timing and counters change with every command
+    _unrecorded_attributes = frozenset(
+        {
+            "applied_limit",
+            "applied_time",
+            "latency",
+            "writes",
+            "writes_suppressed",
+            "writes_skipped",
+            "writes_failed",
+            "round_trips_per_write",
+            "failsafe",
+            "plant",
+        }
+    )
+
     def __init__(
         self,
         description: SwitchEntityDescription,
         entry: ConfigEntry,
     ) -> None:
         """Initialize the switch."""
-        self._is_on = False
-        self._is_on_set = False
         self._entry = entry
+        self._controller = entry.runtime_data.controller
+        self._fronius = entry.runtime_data.fronius
         self.entity_description = description
         self._ensure_runtime_called = False
         self._attr_unique_id = f"{entry.entry_id}_soft_limit_enabled"
         self._attr_has_entity_name = True
         self._attr_name = "Soft limit enabled"
         self._attr_icon = "mdi:lightning-bolt-circle"
-        self._attr_should_poll = True
+        self._attr_should_poll = False
 
-        self._fronius = FroniusGEN24(
-            entry.data[CONF_IP_ADDRESS],
-            entry.data[CONF_USERNAME],
-            entry.data[CONF_PASSWORD],
-        )
-        self.response = ""
         # Device info mirrors the number entity so both appear under the same device
         self._attr_device_info = DeviceInfo(
             identifiers={(entry.domain, entry.entry_id)},
@@ -93,24 +85,42 @@ class SoftLimitSwitch(SwitchEntity):
             model="Gen24LPP",
         )
 
-        self._mqtt_broker = entry.data[MqttBroker]
-        self._mqtt_user = entry.data[MqttUser]
-        self._mqtt_password = entry.data[MqttPassword]
-        self._mqtt_port = entry.data[MqttPort]
-        self._mqtt_client = mqtt.Client()
-        self._mqtt_client.username_pw_set(self._mqtt_user, self._mqtt_password)
-        self._client_id = f"gen24lpp_{random.randint(0, 1000)}"
-        self._topic_bool = entry.data[LIMITED_PRODUCTION]
-
-        self._limit = self._fronius.lpp_on["exportLimits"]["activePower"]["softLimit"][
-            "powerLimit"
-        ]
-        self._limit_old = self._limit
+        self._unsubscribe_topic: Callable[[], None] | None = None
 
     @property
     def is_on(self):
         """If the switch is currently on or off."""
-        return self._is_on
+        return self._controller.is_on
+
+    def _significant_state(self) -> tuple:
+        """On/off, transport, link and failsafe, the limit has own entities."""
+        return (
+            self._controller.is_on,
+            self._controller.applied_on,
+            self._controller.applied_via,
+            self._fronius.breaker.state,
+            self._entry.runtime_data.watchdog.tripped,
+        )
+
+    @property
+    def extra_state_attributes(self):
+        """Return the applied limit and the MQTT to inverter latency."""
+        attributes = {
+            "applied_limit": self._controller.applied_limit,
+            "applied_time": self._controller.applied_time,
+            "latency": self._controller.latency.as_dict(),
+            "writes": self._controller.writes,
+            "writes_suppressed": self._controller.writes_suppressed,
+            "writes_skipped": self._controller.writes_skipped,
+            "writes_failed": self._controller.writes_failed,
+            "inverter_link": self._fronius.breaker.state,
+            "transport": self._controller.applied_via,
+            "round_trips_per_write": dict(self._fronius.round_trips),
+            "failsafe": self._entry.runtime_data.watchdog.as_dict(),
+        }
+        if plant := self._entry.runtime_data.plant:
+            attributes["plant"] = plant.as_dict()
+        return attributes
 
     # def publish_mqtt(self, state) -> None:
     #     """Publish the limit, power limit, and state using MQTT."""
@@ -122,99 +132,44 @@ class SoftLimitSwitch(SwitchEntity):
     #         topic_full = f"{self._topic}/{topic.replace(' ', '_').lower()}"
     #         self._mqtt_client.publish(topic_full, value, 1)
 
-    def subscribe_mqtt(self) -> None:
-        """Subscribe to MQTT topics if needed."""
-
-        def on_message(client, userdata, msg):
-            match msg.topic:
-                case str(x) if f"{self._topic_bool}" in x:
-                    if msg.payload.decode().lower() == "true":
-                        self._is_on = True
-                    else:
-                        self._is_on = False
+    @callback
+    def _handle_message(self, topic: str, payload: bytes, received: float) -> None:
+        """Forward the limit active flag to the controller."""
+        self._controller.async_set_enabled(payload.decode().lower() == "true", received)
+
+    @callback
+    def _async_subscribe(self) -> None:
+        """(Re)subscribe the limit active topic on the entry's MQTT hub."""
+        self._async_unsubscribe()
+        self._unsubscribe_topic = self._entry.runtime_data.mqtt.async_subscribe(
+            self._entry.data[LIMITED_PRODUCTION], self._handle_message
+        )
 
-        self._mqtt_client.subscribe(f"{self._topic_bool}")
-        self._mqtt_client.on_message = on_message
+    @callback
+    def _async_unsubscribe(self) -> None:
+        if self._unsubscribe_topic:
+            self._unsubscribe_topic()
+            self._unsubscribe_topic = None
 
     async def async_turn_on(self, **kwargs):
         """Turn the entity on."""
-
-        print("async turn on")
-
-        lpp = self._fronius.lpp_on
-        lpp["visualization"]["wattPeakReferenceValue"] = self._entry.data[CONF_SIZE]
-        self.response = await self._fronius.send_request(
-            "config/limit_settings/powerLimits",
-            method="POST",
-            payload=json.dumps(lpp),
-            add_praefix=True,
-        )
-        self._is_on = True
-        # self.publish_mqtt(self._is_on)
-
-        self.async_write_ha_state()
+        self._controller.async_set_enabled(True)
 
     async def async_turn_off(self, **kwargs):
         """Turn the entity off."""
-        print("async turn off")
-        lpp = self._fronius.lpp_off
-        self.response = await self._fronius.send_request(
-            "config/limit_settings/powerLimits",
-            method="POST",
-            payload=json.dumps(lpp),
-            add_praefix=True,
-        )
-        self._is_on = False
-        # self.publish_mqtt(self._is_on)
-        self.async_write_ha_state()
-
-    async def async_update(self):
-        """Fetch updates from the device."""
-
-        # self.response = await self._fronius.send_request(
-        #     "config/limit_settings/powerLimits",
-        #     method="GET",
-        #     payload={},
-        #     add_praefix=True,
-        # )
-        # if self.response:
-        #     res = json.loads(self.response)
-        #     self._is_on_set = res["exportLimits"]["activePower"]["softLimit"]["enabled"]
-        self._limit = self._fronius.lpp_on["exportLimits"]["activePower"]["softLimit"][
-            "powerLimit"
-        ]
-        if self._is_on_set:
-            if not self._is_on:
-                self._is_on_set = False
-                await self.async_turn_off()
-            elif self._limit != self._limit_old:  # accept new limit when on
-                self._limit_old = self._limit
-                await self.async_turn_on()
-        else:
-            if self._is_on:
-                self._is_on_set = True
-                await self.async_turn_on()
-
-        # self._attr_is_on = self._is_on
-        # self.publish_mqtt(self._is_on)
-        self.async_write_ha_state()
+        self._controller.async_set_enabled(False)
 
     async def async_added_to_hass(self) -> None:
         """Handle entity which will be added."""
-
-        def on_connect(client, userdata, flags, rc):
-            if rc == 0:
-                self.subscribe_mqtt()
-                _LOGGER.info("Connected to MQTT Broker!")
-            else:
-                _LOGGER.error("Failed to connect, return code %d\n", rc)
-
-        try:
-            self._mqtt_client.connect(self._mqtt_broker, self._mqtt_port, 60)
-            self._mqtt_client.on_connect = on_connect
-            self._mqtt_client.loop_start()
-        except Exception as e:
-            _LOGGER.error("Connection attempt failed: %s", e)
+        self._async_subscribe()
+        self.async_on_remove(self._async_unsubscribe)
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_RECONFIGURED.format(self._entry.entry_id),
+                self._async_subscribe,
+            )
+        )
 
         # self.response = await self._fronius.send_request(
         #     "config/limit_settings/powerLimits",
@@ -232,13 +187,6 @@ class SoftLimitSwitch(SwitchEntity):
         # else:
         #     state = False
         # self.publish_mqtt(state)
-        # self._is_on = state
-        self.async_write_ha_state()
-        await self.async_update()
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Handle entity which will be removed."""
-        await self._fronius.close()
-
-        self._mqtt_client.loop_stop()
-        self._mqtt_client.disconnect()
+        self.async_on_remove(
+            self._controller.async_add_listener(self.async_write_if_changed)
+        )
@@ -0,0 +1,310 @@
+"""Append-only log of every limit write, as evidence of curtailments.
+
+Every write attempt is one fixed-size binary record: when the command was
+received, when the inverter acknowledged it (or the write failed), the
+commanded limit, the enabled flag, the HTTP status and the number of round
+trips. Records are buffered in memory and appended to segment files that
+are rotated by size and never rewritten. Free of Home Assistant imports, so
+the tools can load it on its own; file access blocks and belongs in the
+executor.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import csv
+from datetime import UTC, datetime
+import logging
+import mmap
+import os
+from pathlib import Path
+import struct
+import threading
+from typing import IO, NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# segment header: magic, format version, record size
+HEADER = struct.Struct("<4sHH8x")
+MAGIC = b"G24C"
+VERSION = 1
+# received, completed, limit, status, enabled, round trips, flags
+RECORD = struct.Struct("<ddiHBBB7x")
+COMPLETED_OFFSET = 8
+
+FLAG_ACKNOWLEDGED = 1
+FLAG_MODBUS = 2
+# Modbus failed and the write went through HTTP
+FLAG_FALLBACK = 4
+
+SEGMENT_SUFFIX = ".g24c"
+# 131072 records per segment
+MAX_SEGMENT_BYTES = 4 * 1024 * 1024
+# records kept in memory while the disk is not writable
+MAX_BUFFERED = 65536
+
+CSV_FIELDS = (
+    "received",
+    "completed",
+    "acknowledged",
+    "enabled",
+    "limit_w",
+    "transport",
+    "fallback",
+    "http_status",
+    "round_trips",
+    "apply_ms",
+)
+
+
+class ComplianceRecord(NamedTuple):
+    """One limit write; times are Unix timestamps in seconds."""
+
+    received: float
+    completed: float
+    limit: int
+    status: int
+    enabled: bool
+    round_trips: int
+    flags: int
+
+    @property
+    def acknowledged(self) -> bool:
+        """True if the inverter confirmed the write."""
+        return bool(self.flags & FLAG_ACKNOWLEDGED)
+
+    @property
+    def transport(self) -> str:
+        """Transport of the write, "http" or "modbus"."""
+        return "modbus" if self.flags & FLAG_MODBUS else "http"
+
+    def as_row(self) -> dict:
+        """Return the CSV row."""
+        return {
+            "received": _isoformat(self.received),
+            "completed": _isoformat(self.completed),
+            "acknowledged": int(self.acknowledged),
+            "enabled": int(self.enabled),
+            "limit_w": self.limit,
+            "transport": self.transport,
+            "fallback": int(bool(self.flags & FLAG_FALLBACK)),
+            "http_status": self.status or "",
+            "round_trips": self.round_trips,
+            "apply_ms": round((self.completed - self.received) * 1000, 1),
+        }
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, UTC).isoformat(timespec="milliseconds")
+
+
+class ComplianceLog:
+    """Segmented append-only log of ``ComplianceRecord``.
+
+    Segments are named after the completion time of their first record, and
+    records are appended in completion order (a clock stepping back is
+    clamped), so a time range is found by the segment names and a binary
+    search within the memory-mapped segments. ``append`` only encodes into
+    the buffer and may be called from the event loop; ``flush``, ``query``
+    and ``export_csv`` do file I/O.
+    """
+
+    def __init__(self, directory: str | os.PathLike) -> None:
+        """Initialize the log, the directory is created on the first flush."""
+        self.directory = Path(directory)
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._file: IO[bytes] | None = None
+        self._segment_size = 0
+        self._last_completed = 0.0
+        self.records = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.last_error: str | None = None
+
+    @property
+    def pending(self) -> int:
+        """Records appended but not yet on disk."""
+        return len(self._buffer) // RECORD.size
+
+    def append(self, record: ComplianceRecord) -> None:
+        """Add a record to the buffer."""
+        with self._buffer_lock:
+            completed = max(record.completed, self._last_completed)
+            self._last_completed = completed
+            if len(self._buffer) >= MAX_BUFFERED * RECORD.size:
+                # keep the newest records, the disk failed for a long time
+                del self._buffer[: RECORD.size]
+                self.dropped += 1
+            self._buffer += RECORD.pack(
+                record.received,
+                completed,
+                record.limit,
+                record.status,
+                record.enabled,
+                min(record.round_trips, 255),
+                record.flags,
+            )
+            self.records += 1
+
+    def flush(self) -> None:
+        """Write the buffered records to disk and sync them."""
+        with self._file_lock:
+            with self._buffer_lock:
+                data, self._buffer = self._buffer, bytearray()
+            if not data:
+                return
+            try:
+                self._write(data)
+            except OSError as e:
+                self.last_error = repr(e)
+                _LOGGER.warning("Writing the compliance log failed: %s", e)
+                self._close_file()
+                # retry what did not reach the disk with the next flush
+                with self._buffer_lock:
+                    self._buffer[:0] = data
+
+    def _write(self, data: bytearray) -> None:
+        """Append data segment by segment, removing what was synced."""
+        while data:
+            if self._file is None:
+                self._open(data)
+            room = (MAX_SEGMENT_BYTES - self._segment_size) // RECORD.size
+            chunk = data[: room * RECORD.size]
+            self._file.write(chunk)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._segment_size += len(chunk)
+            self.flushed += len(chunk) // RECORD.size
+            del data[: len(chunk)]
+            if self._segment_size + RECORD.size > MAX_SEGMENT_BYTES:
+                self._close_file()
+
+    def _open(self, data: bytes) -> None:
+        """Continue the newest segment, or start one with the first record."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = self._segments()
+        if segments and (size := segments[-1].stat().st_size) + RECORD.size <= (
+            MAX_SEGMENT_BYTES
+        ):
+            path = segments[-1]
+            self._file = open(path, "r+b")  # noqa: SIM115
+            if size < HEADER.size:
+                # the header was cut short by a crash
+                self._file.truncate(0)
+                self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+                size = HEADER.size
+            # drop a record cut short by a crash
+            size -= (size - HEADER.size) % RECORD.size
+            self._file.truncate(size)
+            self._file.seek(size)
+            self._segment_size = size
+            return
+        (first,) = struct.unpack_from("<d", data, COMPLETED_OFFSET)
+        path = self.directory / f"{int(first * 1000):015d}{SEGMENT_SUFFIX}"
+        self._file = open(path, "xb")  # noqa: SIM115
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._segment_size = HEADER.size
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            file, self._file = self._file, None
+            try:
+                file.close()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Flush and close the current segment."""
+        self.flush()
+        with self._file_lock:
+            self._close_file()
+
+    def _segments(self) -> list[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def query(
+        self, start: float | None = None, end: float | None = None
+    ) -> Iterator[ComplianceRecord]:
+        """Yield the records completed within [start, end), oldest first."""
+        self.flush()
+        segments = self._segments()
+        starts = [
+            int(path.name.removesuffix(SEGMENT_SUFFIX)) / 1000 for path in segments
+        ]
+        for index, path in enumerate(segments):
+            if end is not None and starts[index] >= end:
+                break
+            if (
+                start is not None
+                and index + 1 < len(segments)
+                and starts[index + 1] <= start
+            ):
+                continue
+            yield from _scan(path, start, end)
+
+    def export_csv(
+        self, file: IO[str], start: float | None = None, end: float | None = None
+    ) -> int:
+        """Write the records of a time range as CSV, return their number."""
+        writer = csv.DictWriter(file, CSV_FIELDS)
+        writer.writeheader()
+        count = 0
+        for record in self.query(start, end):
+            writer.writerow(record.as_row())
+            count += 1
+        return count
+
+    def as_dict(self) -> dict:
+        """Return the log state for diagnostics."""
+        return {
+            "records": self.records,
+            "flushed": self.flushed,
+            "pending": self.pending,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
+
+
+def _scan(
+    path: Path, start: float | None, end: float | None
+) -> Iterator[ComplianceRecord]:
+    """Yield the records of one segment within [start, end)."""
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        count = (size - HEADER.size) // RECORD.size
+        if count <= 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, record_size = HEADER.unpack_from(mapped)
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                _LOGGER.warning("Skipping unknown compliance log segment %s", path)
+                return
+            low = 0 if start is None else _bisect(mapped, count, start)
+            high = count if end is None else _bisect(mapped, count, end)
+            view = memoryview(mapped)[
+                HEADER.size + low * RECORD.size : HEADER.size + high * RECORD.size
+            ]
+            try:
+                for fields in RECORD.iter_unpack(view):
+                    yield ComplianceRecord._make(fields)
+            finally:
+                view.release()
+
+
+def _bisect(mapped: mmap.mmap, count: int, timestamp: float) -> int:
+    """Return the index of the first record completed at or after timestamp."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        (completed,) = struct.unpack_from(
+            "<d", mapped, HEADER.size + middle * RECORD.size + COMPLETED_OFFSET
+        )
+        if completed < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
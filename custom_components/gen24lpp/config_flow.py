@@ -1,12 +1,16 @@
 """Config flow for Fronius Gen24 LPP integration."""
 
+import asyncio
+from collections.abc import Awaitable
 import logging
+import time
 
-import paho.mqtt.client as mqtt
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
 from homeassistant.const import CONF_IP_ADDRESS, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .const import (
     CONF_NAME,
@@ -18,11 +22,37 @@ from .const import (
     MqttUser,
     LIMITED_PRODUCTION,
     ALLOWED_LIMIT,
+    CONF_MIN_INTERVAL,
+    CONF_MAX_DELAY,
+    CONF_DEADBAND_W,
+    CONF_DEADBAND_PERCENT,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_DEADBAND_W,
+    DEFAULT_DEADBAND_PERCENT,
+    CONF_PLANT,
+    CONF_WEIGHT,
+    CONF_WATCHDOG_TIMEOUT,
+    CONF_FALLBACK_LIMIT,
+    DEFAULT_WATCHDOG_TIMEOUT,
+    DEFAULT_FALLBACK_LIMIT,
+    CONF_TRANSPORT,
+    CONF_MODBUS_PORT,
+    CONF_MODBUS_UNIT,
+    CONF_STATE_MAX_AGE,
+    DEFAULT_STATE_MAX_AGE,
+    TRANSPORT_HTTP,
+    TRANSPORT_MODBUS,
 )
+from .modbus import MODBUS_PORT, MODBUS_UNIT
 from .lpp_a import FroniusGEN24
 
 _LOGGER = logging.getLogger(__name__)
 
+# Both checks run concurrently, the form answers after the slower one
+INVERTER_TIMEOUT = 10
+MQTT_TIMEOUT = 5
+
 SCHEMA_DEVICE = vol.Schema(
     {
         vol.Required(CONF_IP_ADDRESS, default="0.0.0.0"): str,
@@ -36,19 +66,95 @@ SCHEMA_DEVICE = vol.Schema(
         vol.Optional(MqttPassword, default=""): str,
         vol.Optional(LIMITED_PRODUCTION, default=""): str,
         vol.Optional(ALLOWED_LIMIT, default=""): str,
+        vol.Optional(CONF_MIN_INTERVAL, default=DEFAULT_MIN_INTERVAL): vol.Coerce(
+            float
+        ),
+        vol.Optional(CONF_MAX_DELAY, default=DEFAULT_MAX_DELAY): vol.Coerce(float),
+        vol.Optional(CONF_DEADBAND_W, default=DEFAULT_DEADBAND_W): int,
+        vol.Optional(
+            CONF_DEADBAND_PERCENT, default=DEFAULT_DEADBAND_PERCENT
+        ): vol.Coerce(float),
+        vol.Optional(CONF_PLANT, default=""): str,
+        vol.Optional(CONF_WEIGHT, default=0): vol.Coerce(float),
+        vol.Optional(
+            CONF_WATCHDOG_TIMEOUT, default=DEFAULT_WATCHDOG_TIMEOUT
+        ): vol.Coerce(float),
+        vol.Optional(CONF_FALLBACK_LIMIT, default=DEFAULT_FALLBACK_LIMIT): int,
+        vol.Optional(CONF_TRANSPORT, default=TRANSPORT_HTTP): vol.In(
+            [TRANSPORT_HTTP, TRANSPORT_MODBUS]
+        ),
+        vol.Optional(CONF_MODBUS_PORT, default=MODBUS_PORT): int,
+        vol.Optional(CONF_MODBUS_UNIT, default=MODBUS_UNIT): int,
+        vol.Optional(CONF_STATE_MAX_AGE, default=DEFAULT_STATE_MAX_AGE): vol.Coerce(
+            float
+        ),
     }
 )
 
 
-async def validate_connection(ip: str, user: str, password: str) -> None:
+async def validate_connection(
+    hass: HomeAssistant, ip: str, user: str, password: str
+) -> None:
     """Validate Inverter Connection."""
-    fronius = FroniusGEN24(ip, user, password)
+    fronius = FroniusGEN24(ip, user, password, session=async_get_clientsession(hass))
     test = await fronius.login()
     if not test:
         _LOGGER.error(f"Cannot login")
         raise ConnectionError
 
 
+def _check_mqtt(host: str, port: int, user: str, password: str) -> None:
+    """Connect to the broker and wait for CONNACK, runs in the executor."""
+    # imported here, so loading the integration does not load paho
+    import paho.mqtt.client as mqtt  # noqa: PLC0415
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.connect_timeout = MQTT_TIMEOUT
+    if user:
+        client.username_pw_set(user, password)
+    result = []
+    client.on_connect = lambda client, userdata, flags, reason_code, properties: (
+        result.append(reason_code)
+    )
+    client.connect(host, port, 60)
+    deadline = time.monotonic() + MQTT_TIMEOUT
+    try:
+        while not result and time.monotonic() < deadline:
+            client.loop(0.1)
+    finally:
+        client.disconnect()
+    if not result:
+        raise TimeoutError
+    if result[0].is_failure:
+        raise ConnectionError(str(result[0]))
+
+
+async def validate_mqtt(
+    hass: HomeAssistant, host: str, port: int, user: str, password: str
+) -> None:
+    """Validate MQTT Connection, an empty broker uses Home Assistant's MQTT."""
+    if not host:
+        if not hass.config_entries.async_entries("mqtt"):
+            raise ConnectionError("MQTT integration not set up")
+        return
+    await hass.async_add_executor_job(_check_mqtt, host, port, user, password)
+
+
+async def _timed(check: Awaitable[None], timeout: float) -> tuple[str | None, float]:
+    """Run a check, return its error key (None if it passed) and duration."""
+    start = time.monotonic()
+    try:
+        await asyncio.wait_for(check, timeout)
+    except TimeoutError:
+        error = "timeout"
+    except Exception as e:  # noqa: BLE001
+        _LOGGER.debug("Check failed: %s", e)
+        error = "failed"
+    else:
+        error = None
+    return error, time.monotonic() - start
+
+
 class ConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow."""
 
@@ -58,31 +164,51 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
         """Handle the initial step."""
 
         errors = {}
+        checks = ""
 
         # data: Optional[Dict[str, Any]]
 
         if user_input is not None:
-            try:
-                await validate_connection(
-                    user_input[CONF_IP_ADDRESS],
-                    user_input[CONF_USERNAME],
-                    user_input[CONF_PASSWORD],
-                )
-            except ConnectionError:
+            (inverter, inverter_time), (broker, broker_time) = await asyncio.gather(
+                _timed(
+                    validate_connection(
+                        self.hass,
+                        user_input[CONF_IP_ADDRESS],
+                        user_input[CONF_USERNAME],
+                        user_input[CONF_PASSWORD],
+                    ),
+                    INVERTER_TIMEOUT,
+                ),
+                _timed(
+                    validate_mqtt(
+                        self.hass,
+                        user_input[MqttBroker],
+                        user_input[MqttPort],
+                        user_input[MqttUser],
+                        user_input[MqttPassword],
+                    ),
+                    MQTT_TIMEOUT,
+                ),
+            )
+            _LOGGER.debug(
+                "Inverter check %s after %.2f s, MQTT check %s after %.2f s",
+                inverter or "ok",
+                inverter_time,
+                broker or "ok",
+                broker_time,
+            )
+            if inverter == "timeout":
+                errors[CONF_IP_ADDRESS] = "inverter_timeout"
+            elif inverter:
                 errors["base"] = "login"
-
-            try:
-                mqtt_client = mqtt.Client()
-                if len(user_input[MqttUser]) > 0:
-                    mqtt_client.username_pw_set(
-                        user_input[MqttUser], user_input[MqttPassword]
-                    )
-                    mqtt_client.connect(
-                        user_input[MqttBroker], user_input[MqttPort], 60
-                    )
-                    mqtt_client.disconnect()
-            except Exception:
-                errors["base"] = "mqtt_connection_failed"
+            if broker == "timeout":
+                errors[MqttBroker] = "mqtt_timeout"
+            elif broker:
+                errors[MqttBroker] = "mqtt_connection_failed"
+            checks = (
+                f"Inverter: {inverter or 'ok'} ({inverter_time:.1f} s), "
+                f"MQTT: {broker or 'ok'} ({broker_time:.1f} s)"
+            )
 
             if not errors:
                 name = user_input[CONF_NAME]
@@ -97,4 +223,5 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
             step_id="user",
             data_schema=SCHEMA_DEVICE,
             errors=errors,
+            description_placeholders={"checks": checks},
         )
@@ -7,3 +7,27 @@ MqttUser = "mqttuser"
 MqttPassword = "mqttpassword"
 ALLOWED_LIMIT = "allowed_limit"
 LIMITED_PRODUCTION = "limited_production"
+CONF_MIN_INTERVAL = "min_write_interval"
+CONF_MAX_DELAY = "max_write_delay"
+CONF_DEADBAND_W = "deadband_w"
+CONF_DEADBAND_PERCENT = "deadband_percent"
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_DELAY = 10.0
+DEFAULT_DEADBAND_W = 0
+DEFAULT_DEADBAND_PERCENT = 0.0
+CONF_PLANT = "plant"
+CONF_WEIGHT = "weight"
+SIGNAL_RECONFIGURED = "gen24lpp_reconfigured_{}"
+CONF_WATCHDOG_TIMEOUT = "watchdog_timeout"
+CONF_FALLBACK_LIMIT = "fallback_limit"
+DEFAULT_WATCHDOG_TIMEOUT = 0.0
+DEFAULT_FALLBACK_LIMIT = 0
+CONF_TRANSPORT = "transport"
+CONF_MODBUS_PORT = "modbus_port"
+CONF_MODBUS_UNIT = "modbus_unit"
+TRANSPORT_HTTP = "http"
+TRANSPORT_MODBUS = "modbus"
+CONF_STATE_MAX_AGE = "state_max_age"
+DEFAULT_STATE_MAX_AGE = 300.0
+# Compliance logs below the configuration directory, one directory per entry
+COMPLIANCE_LOG_DIR = "gen24lpp_compliance"
@@ -0,0 +1,691 @@
+"""Event-driven limit pipeline between MQTT and the inverter."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_DEADBAND_PERCENT,
+    CONF_DEADBAND_W,
+    CONF_MAX_DELAY,
+    CONF_MIN_INTERVAL,
+    CONF_SIZE,
+    DEFAULT_DEADBAND_PERCENT,
+    DEFAULT_DEADBAND_W,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_MIN_INTERVAL,
+    DOMAIN,
+)
+from .compliance_log import (
+    FLAG_ACKNOWLEDGED,
+    FLAG_FALLBACK,
+    FLAG_MODBUS,
+    ComplianceLog,
+    ComplianceRecord,
+)
+from .lpp_a import JSON_HEADERS, FroniusGEN24, canonical_json
+from .metrics import LatencyHistogram, RingBuffer
+from .modbus import SunSpecLimit
+
+_LOGGER = logging.getLogger(__name__)
+
+# Cheap GET of powerLimits to validate the cache of the last acknowledged write
+REFRESH_INTERVAL = timedelta(minutes=5)
+
+# Retry of a failed write when no newer command arrives meanwhile
+RETRY_DELAY = 5
+
+STORAGE_VERSION = 1
+# Coalesce state saves, Home Assistant flushes pending saves on shutdown
+SAVE_DELAY = 10
+# Coalesce compliance log appends into one synced write
+LOG_FLUSH_DELAY = 5
+
+
+def storage_key(entry: ConfigEntry) -> str:
+    """Return the storage key of the persisted state of an entry."""
+    return f"{DOMAIN}.{entry.entry_id}"
+
+
+class LimitController:
+    """Apply limit commands to the inverter as soon as they arrive.
+
+    MQTT callbacks only record the requested state and wake the worker; the
+    worker performs the inverter write on the event loop. Commands arriving
+    while a write is in flight or within the minimum write interval are
+    coalesced, so only the latest requested state is sent. Relaxing the limit
+    by less than the deadband is deferred for at most ``max_delay`` seconds;
+    tightening it or switching on/off is always written immediately.
+
+    With a Modbus transport the limit is written through SunSpec first and
+    through the HTTP API whenever Modbus fails. Every write attempt is
+    appended to the compliance log, if one is given.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        fronius: FroniusGEN24,
+        modbus: SunSpecLimit | None = None,
+        compliance_log: ComplianceLog | None = None,
+    ) -> None:
+        """Initialize the controller."""
+        self.hass = hass
+        self._entry = entry
+        self._fronius = fronius
+        self.modbus = modbus
+        self.compliance_log = compliance_log
+        self._log_flush: asyncio.TimerHandle | None = None
+        self._wakeup = asyncio.Event()
+        self._listeners: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+        self._deferred: asyncio.TimerHandle | None = None
+        self._deferred_since = 0.0
+        self._retry: asyncio.TimerHandle | None = None
+        self._force = False
+        self._waiters: list[asyncio.Future[bool]] = []
+        self._unsub_refresh: Callable[[], None] | None = None
+        self._store: Store[dict] = Store(hass, STORAGE_VERSION, storage_key(entry))
+        # sha256 of the canonical powerLimits document the inverter holds
+        self._acked_digest: str | None = None
+
+        # receive time of the oldest command not yet written
+        self._pending_since: float | None = None
+        self._last_write = 0.0
+
+        # requested state
+        self.is_on = False
+        self.limit = 0
+        # hard limit of the failsafe watchdog, overrides the requested state
+        self.fallback_limit: int | None = None
+        # state acknowledged by the inverter
+        self.applied_on = False
+        self.applied_limit: int | None = None
+        # monotonic time of the last acknowledged write
+        self.applied_at: float | None = None
+        # wall clock time of the last acknowledged write, survives restarts
+        self.applied_time: str | None = None
+        # transport of the last acknowledged write, "http" or "modbus"
+        self.applied_via: str | None = None
+        # the HTTP soft limit may be enabled, None if unknown
+        self._http_on: bool | None = None
+        # digest of the powerLimits document the HTTP API acknowledged last
+        self._http_digest: str | None = None
+        # WMaxLim_Ena as last written or read back, None if unknown
+        self._modbus_on: bool | None = None
+        self.restored = False
+        self.response: str | None = None
+        # set once the inverter answered for the first time
+        self.inverter_ready = asyncio.Event()
+
+        self.writes = 0
+        self.writes_suppressed = 0
+        self.writes_skipped = 0
+        self.writes_failed = 0
+        self.modbus_fallbacks = 0
+        self.latency = LatencyHistogram()
+        # commands merged into the write in preparation, and per past write
+        self.queue_depth = 0
+        self.queue_depths = RingBuffer()
+        # observer of acknowledged writes: (receive time, acknowledge time)
+        self.on_applied: Callable[[float, float], None] | None = None
+        # observer of HTTP limit writes: True if the inverter acknowledged
+        self.on_write: Callable[[bool], None] | None = None
+
+    @property
+    def min_interval(self) -> float:
+        """Minimum time between two writes in seconds."""
+        return self._entry.data.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL)
+
+    @property
+    def max_delay(self) -> float:
+        """Upper bound for deferring a change within the deadband."""
+        return self._entry.data.get(CONF_MAX_DELAY, DEFAULT_MAX_DELAY)
+
+    @property
+    def deadband(self) -> float:
+        """Deadband in W, the larger of the absolute and the relative setting."""
+        return max(
+            self._entry.data.get(CONF_DEADBAND_W, DEFAULT_DEADBAND_W),
+            self._entry.data.get(CONF_DEADBAND_PERCENT, DEFAULT_DEADBAND_PERCENT)
+            * self._entry.data[CONF_SIZE]
+            / 100,
+        )
+
+    async def async_load(self) -> None:
+        """Restore the last requested and acknowledged state.
+
+        Retained MQTT messages repeating this state are then recognised by
+        the acknowledged digest and cause no write.
+        """
+        if not (stored := await self._store.async_load()):
+            return
+        self.is_on = stored["is_on"]
+        self.limit = stored["limit"]
+        self.applied_on = stored["applied_on"]
+        self.applied_limit = stored["applied_limit"]
+        self.applied_time = stored["applied_time"]
+        self._acked_digest = stored["acked_digest"]
+        self.applied_via = stored.get("applied_via")
+        self.restored = True
+        _LOGGER.debug(
+            "Restored on=%s limit=%s acknowledged at %s",
+            self.applied_on,
+            self.applied_limit,
+            self.applied_time,
+        )
+
+    @callback
+    def _data_to_save(self) -> dict:
+        return {
+            "is_on": self.is_on,
+            "limit": self.limit,
+            "applied_on": self.applied_on,
+            "applied_limit": self.applied_limit,
+            "applied_time": self.applied_time,
+            "acked_digest": self._acked_digest,
+            "applied_via": self.applied_via,
+        }
+
+    @callback
+    def async_start(self) -> None:
+        """Start the worker task."""
+        self._task = self._entry.async_create_background_task(
+            self.hass, self._async_run(), f"gen24lpp limit worker {self._entry.title}"
+        )
+
+        self._entry.async_create_background_task(
+            self.hass, self._async_refresh(), "gen24lpp powerLimits refresh"
+        )
+        self._unsub_refresh = async_track_time_interval(
+            self.hass, self._async_refresh, REFRESH_INTERVAL
+        )
+
+    async def async_stop(self) -> None:
+        """Stop the worker task."""
+        self._cancel_deferred()
+        self._cancel_retry()
+        if self._unsub_refresh:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for waiter in self._waiters:
+            waiter.cancel()
+        self._waiters.clear()
+        await self._store.async_save(self._data_to_save())
+        if self._log_flush:
+            self._log_flush.cancel()
+            self._log_flush = None
+        if self.compliance_log is not None:
+            await self.hass.async_add_executor_job(self.compliance_log.close)
+
+    @callback
+    def async_add_listener(
+        self, update_callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Register a callback run after every state change."""
+        self._listeners.append(update_callback)
+
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_notify(self) -> None:
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def async_set_enabled(self, enabled: bool, received: float | None = None) -> None:
+        """Request the soft limit to be switched on or off."""
+        self.is_on = enabled
+        self._async_schedule(time.monotonic() if received is None else received)
+
+    @callback
+    def async_set_limit(self, limit: int, received: float | None = None) -> None:
+        """Request a new soft limit in W."""
+        self.limit = limit
+        self._async_schedule(time.monotonic() if received is None else received)
+
+    @callback
+    def async_set_fallback(self, limit: int | None) -> None:
+        """Enforce a hard limit in W, None returns to the requested state."""
+        self.fallback_limit = limit
+        if limit is None:
+            # leaving the fallback is not held back by the deadband
+            self._force = True
+        self._async_schedule(time.monotonic())
+
+    @property
+    def target(self) -> tuple[bool, int]:
+        """Return the state to write, the requested one capped by the fallback."""
+        if self.fallback_limit is None:
+            return self.is_on, self.limit
+        if self.is_on:
+            return True, min(self.limit, self.fallback_limit)
+        return True, self.fallback_limit
+
+    @callback
+    def async_reapply(self) -> None:
+        """Write the requested state again, e.g. after the PV size changed."""
+        self._async_schedule(time.monotonic())
+
+    @callback
+    def async_set_transport(self, modbus: SunSpecLimit | None) -> None:
+        """Switch the Modbus transport and write the requested state again."""
+        self.modbus = modbus
+        self._acked_digest = None
+        self._http_digest = None
+        self._modbus_on = None
+        self._force = True
+        self._async_schedule(time.monotonic())
+
+    @callback
+    def async_resync(self) -> None:
+        """Forget the acknowledged state and re-read it from the inverter."""
+        self._acked_digest = None
+        self._http_digest = None
+        self._entry.async_create_background_task(
+            self.hass, self._async_refresh(), "gen24lpp powerLimits refresh"
+        )
+
+    async def async_apply_limit(
+        self, limit: int, received: float | None = None
+    ) -> bool:
+        """Request a new soft limit and wait until the inverter acknowledged it."""
+        waiter = self.hass.loop.create_future()
+        self._waiters.append(waiter)
+        self.async_set_limit(limit, received)
+        return await waiter
+
+    @callback
+    def _async_schedule(self, received: float) -> None:
+        self.queue_depth += 1
+        if self._pending_since is not None or self._deferred is not None:
+            # an unsent or held back command is replaced by this one
+            self.writes_suppressed += 1
+        if self._pending_since is None:
+            self._pending_since = received
+        self._wakeup.set()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        self._async_notify()
+
+    @callback
+    def _cancel_deferred(self) -> None:
+        if self._deferred:
+            self._deferred.cancel()
+            self._deferred = None
+
+    @callback
+    def _cancel_retry(self) -> None:
+        if self._retry:
+            self._retry.cancel()
+            self._retry = None
+
+    @callback
+    def _async_retry_write(self, received: float) -> None:
+        """Repeat a failed write, unless a newer command is already pending."""
+        self._retry = None
+        self._force = True
+        if self._pending_since is None:
+            self._pending_since = received
+        self._wakeup.set()
+
+    @callback
+    def _async_flush_deferred(self) -> None:
+        """Write a change held back by the deadband."""
+        self._deferred = None
+        self._force = True
+        if self._pending_since is None:
+            self._pending_since = self._deferred_since
+        self._wakeup.set()
+
+    def _urgent(self) -> bool:
+        """True if the requested state switches or lowers the applied limit."""
+        is_on, limit = self.target
+        if is_on != self.applied_on:
+            return True
+        return is_on and self.applied_limit is not None and limit < self.applied_limit
+
+    async def _async_run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # switching and lowering skip the minimum interval, a command
+            # arriving meanwhile may end the wait early
+            while (
+                wait := self._last_write + self.min_interval - time.monotonic()
+            ) > 0 and not self._urgent():
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except TimeoutError:
+                    pass
+            self._wakeup.clear()
+            received, self._pending_since = self._pending_since, None
+            self.queue_depths.append(self.queue_depth)
+            self.queue_depth = 0
+            force, self._force = self._force, False
+            waiters, self._waiters = self._waiters, []
+            success: bool | None = False
+            try:
+                success = await self._async_apply(received or time.monotonic(), force)
+            except Exception:  # noqa: BLE001
+                _LOGGER.exception("Applying limit failed")
+            finally:
+                if success is None:
+                    # answered by the write of the held back change
+                    self._waiters[:0] = waiters
+                else:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_result(success)
+
+    async def _async_apply(self, received: float, force: bool = False) -> bool | None:
+        """Bring the inverter in line with the requested state.
+
+        Return False if the inverter did not acknowledge a required write,
+        None if the deadband held the change back for a later write.
+        """
+        is_on, target_limit = self.target
+        if is_on:
+            if (
+                not force
+                and self.applied_on
+                and self.applied_limit is not None
+                and 0 < target_limit - self.applied_limit < self.deadband
+            ):
+                if self._deferred is None:
+                    self._deferred_since = received
+                    self._deferred = self.hass.loop.call_later(
+                        self.max_delay, self._async_flush_deferred
+                    )
+                return None
+            limit = target_limit
+            payload = self._fronius.payload.on(limit, self._entry.data[CONF_SIZE])
+        else:
+            if not self.applied_on and not self._modbus_stale:
+                return True
+            limit = None
+            payload = self._fronius.payload.off
+
+        self._cancel_deferred()
+        self._cancel_retry()
+        digest = hashlib.sha256(payload).hexdigest()
+        if digest == self._acked_digest:
+            # the inverter already holds exactly this configuration
+            self.writes_skipped += 1
+            return True
+
+        self._last_write = time.monotonic()
+        response = None
+        modbus_requests = self.modbus.client.requests if self.modbus else 0
+        if self.modbus is not None and await self.modbus.async_write(limit):
+            via = "modbus"
+        else:
+            via = "http"
+            if self.modbus is not None:
+                self.modbus_fallbacks += 1
+            if self.modbus is not None and digest == self._http_digest:
+                # HTTP holds this already, only the Modbus cap is out of date
+                self._async_log_write(
+                    received,
+                    limit,
+                    FLAG_ACKNOWLEDGED | FLAG_FALLBACK,
+                    0,
+                    self.modbus.client.requests - modbus_requests,
+                )
+                self._async_retry_modbus(received)
+                return True
+            response = await self._async_post(payload)
+
+        if via == "modbus":
+            flags, status, round_trips = FLAG_ACKNOWLEDGED | FLAG_MODBUS, 0, 0
+        else:
+            flags = FLAG_FALLBACK if self.modbus is not None else 0
+            if response is not None:
+                flags |= FLAG_ACKNOWLEDGED
+            status = self._fronius.last_status or 0
+            round_trips = self._fronius.last_round_trips
+        if self.modbus is not None:
+            round_trips += self.modbus.client.requests - modbus_requests
+        self._async_log_write(received, limit, flags, status, round_trips)
+
+        if via == "http" and response is None:
+            self.writes_failed += 1
+            self._acked_digest = None
+            self._http_digest = None
+            if not self._wakeup.is_set():
+                delay = max(RETRY_DELAY, self._fronius.breaker.retry_in())
+                _LOGGER.warning(
+                    "Inverter did not acknowledge the limit write (%s), retrying in"
+                    " %.0f s",
+                    self._fronius.last_error,
+                    delay,
+                )
+                self._retry = self.hass.loop.call_later(
+                    delay, self._async_retry_write, received
+                )
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+            return False
+
+        self.writes += 1
+        self.inverter_ready.set()
+        if via == "http":
+            self.response = response
+            self._http_on = limit is not None
+            self._http_digest = digest
+        else:
+            self._modbus_on = limit is not None
+        self.applied_via = via
+        if self._modbus_stale:
+            # not acknowledged until Modbus confirms or clears its cap as well
+            self._acked_digest = None
+            self._async_retry_modbus(received)
+        else:
+            self._acked_digest = digest
+        self.applied_on = limit is not None
+        self.applied_limit = limit
+        self.applied_at = time.monotonic()
+        self.applied_time = dt_util.utcnow().isoformat()
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        self.latency.record(time.monotonic() - received)
+        if self.on_applied:
+            self.on_applied(received, self.applied_at)
+        _LOGGER.debug(
+            "Applied limit on=%s limit=%s in %.1f ms",
+            self.applied_on,
+            limit,
+            self.latency.last,
+        )
+        self._async_notify()
+        if via == "modbus" and self._http_on and digest != self._http_digest:
+            # keep the export limit of an earlier HTTP fallback write in line
+            if await self._async_post(payload) is not None:
+                self._http_on = limit is not None
+                self._http_digest = digest
+            else:
+                self._http_digest = None
+        return True
+
+    @property
+    def _modbus_stale(self) -> bool:
+        """True if a cap written through Modbus may outlive an HTTP write."""
+        return (
+            self.modbus is not None
+            and self.applied_via == "http"
+            and self._modbus_on is not False
+        )
+
+    @callback
+    def _async_retry_modbus(self, received: float) -> None:
+        """Write the state again once Modbus is tried again."""
+        self._cancel_retry()
+        self._retry = self.hass.loop.call_later(
+            max(RETRY_DELAY, self.modbus.retry_in()), self._async_retry_write, received
+        )
+
+    @callback
+    def _async_log_write(
+        self,
+        received: float,
+        limit: int | None,
+        flags: int,
+        status: int,
+        round_trips: int,
+    ) -> None:
+        """Append a write attempt to the compliance log."""
+        if self.compliance_log is None:
+            return
+        now = time.time()
+        self.compliance_log.append(
+            ComplianceRecord(
+                # the receive time is monotonic, the log keeps wall clock time
+                received=now - (time.monotonic() - received),
+                completed=now,
+                limit=limit or 0,
+                status=status,
+                enabled=limit is not None,
+                round_trips=round_trips,
+                flags=flags,
+            )
+        )
+        if self._log_flush is None:
+            self._log_flush = self.hass.loop.call_later(
+                LOG_FLUSH_DELAY, self._async_flush_log
+            )
+
+    @callback
+    def _async_flush_log(self) -> None:
+        self._log_flush = None
+        self.hass.async_add_executor_job(self.compliance_log.flush)
+
+    async def _async_post(self, payload: bytes) -> str | None:
+        """Write a powerLimits document through the HTTP API."""
+        response = await self._fronius.send_request(
+            "config/limit_settings/powerLimits",
+            method="POST",
+            payload=payload,
+            headers=JSON_HEADERS,
+            add_praefix=True,
+            # a newer command supersedes this write instead of waiting for it
+            interrupt=self._wakeup,
+        )
+        if self.on_write is not None:
+            self.on_write(response is not None)
+        return response
+
+    async def _async_refresh(self, now=None) -> None:
+        """Re-read powerLimits and refresh the acknowledged state cache."""
+        if self.modbus is not None and (
+            self.applied_via == "modbus" or self._modbus_stale
+        ):
+            await self._async_refresh_modbus()
+            if self.applied_via == "modbus":
+                return
+        writes = self.writes
+        response = await self._fronius.send_request(
+            "config/limit_settings/powerLimits", method="GET", add_praefix=True
+        )
+        if response is not None:
+            self.inverter_ready.set()
+        if response is None or writes != self.writes or self._pending_since:
+            # unreachable, or a write raced with the read
+            return
+        try:
+            reported = json.loads(response)
+            soft_limit = reported["exportLimits"]["activePower"]["softLimit"]
+            enabled = bool(soft_limit["enabled"])
+        except (ValueError, KeyError, TypeError):
+            _LOGGER.debug("Unexpected powerLimits document: %s", response)
+            return
+
+        if enabled:
+            template = json.loads(
+                self._fronius.payload.on(self.target[1], self._entry.data[CONF_SIZE])
+            )
+        else:
+            template = json.loads(self._fronius.payload.off)
+        digest = hashlib.sha256(
+            canonical_json(_project(reported, template))
+        ).hexdigest()
+        if digest == self._acked_digest:
+            return
+
+        _LOGGER.debug("Inverter powerLimits differ from the last acknowledged write")
+        self._acked_digest = digest
+        # the HTTP API holds the reported document, not the last written one
+        self._http_digest = digest
+        self.applied_on = enabled
+        self.applied_limit = soft_limit.get("powerLimit") if enabled else None
+        self._http_on = enabled
+        self._async_schedule(time.monotonic())
+
+    async def _async_refresh_modbus(self) -> None:
+        """Read back the SunSpec limit registers."""
+        writes = self.writes
+        reported = await self.modbus.async_read()
+        if reported is not None:
+            self.inverter_ready.set()
+        if reported is None or writes != self.writes or self._pending_since:
+            return
+        enabled, limit = reported
+        self._modbus_on = enabled
+        matches = (
+            self.applied_on
+            and self.applied_limit is not None
+            and abs(limit - self.applied_limit) <= self.modbus.resolution
+        )
+        if self.applied_via != "modbus":
+            # the HTTP write holds the state, Modbus must not cap it differently
+            if not enabled or matches:
+                if self._acked_digest is None and self._http_digest is not None:
+                    self._cancel_retry()
+                    self._acked_digest = self._http_digest
+                return
+            _LOGGER.debug("Inverter WMaxLimPct left over from an earlier write")
+            self._acked_digest = None
+            self._force = True
+            self._async_schedule(time.monotonic())
+            return
+        if enabled == self.applied_on and (not enabled or matches):
+            return
+
+        _LOGGER.debug("Inverter WMaxLimPct differs from the last acknowledged write")
+        self._acked_digest = None
+        self.applied_on = enabled
+        self.applied_limit = limit if enabled else None
+        self._async_schedule(time.monotonic())
+
+
+def _project(reported, template):
+    """Restrict a reported document to the keys of a payload template.
+
+    Keys the inverter does not report are taken from the template, so only
+    reported values can invalidate the cache.
+    """
+    if isinstance(template, dict) and isinstance(reported, dict):
+        return {
+            key: _project(reported[key], value) if key in reported else value
+            for key, value in template.items()
+        }
+    return reported
@@ -0,0 +1,74 @@
+"""Diagnostics support for gen24lpp."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_IP_ADDRESS, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import MqttPassword, MqttUser
+
+TO_REDACT = {CONF_IP_ADDRESS, CONF_PASSWORD, CONF_USERNAME, MqttPassword, MqttUser}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = entry.runtime_data
+    controller = data.controller
+    monitor = data.monitor
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "startup_ms": data.startup.as_dict(),
+        "controller": {
+            "is_on": controller.is_on,
+            "limit": controller.limit,
+            "fallback_limit": controller.fallback_limit,
+            "applied_on": controller.applied_on,
+            "applied_limit": controller.applied_limit,
+            "applied_time": controller.applied_time,
+            "applied_via": controller.applied_via,
+            "restored": controller.restored,
+            "writes": controller.writes,
+            "writes_suppressed": controller.writes_suppressed,
+            "writes_skipped": controller.writes_skipped,
+            "writes_failed": controller.writes_failed,
+            "modbus_fallbacks": controller.modbus_fallbacks,
+            "queue_depth": controller.queue_depth,
+            "queue_depth_mean": controller.queue_depths.mean(),
+            "queue_depth_max": controller.queue_depths.max(),
+            "mqtt_to_inverter": controller.latency.as_dict(),
+        },
+        "requests": {
+            **data.metrics.as_dict(),
+            "round_trips_per_write": dict(data.fronius.round_trips),
+            "retries": data.fronius.retries,
+            "fast_failures": data.fronius.fast_failures,
+            "superseded": data.fronius.superseded,
+            "last_error": data.fronius.last_error,
+            "scheduler": data.fronius.scheduler.as_dict(),
+            "breaker": {
+                "state": data.fronius.breaker.state,
+                "opened": data.fronius.breaker.opened,
+                "retry_in": data.fronius.breaker.retry_in(),
+            },
+        },
+        "monitor": {
+            "feed_in": monitor.feed_in,
+            "compliant": monitor.compliant,
+            "violations": monitor.violations,
+            "settle_time": monitor.settle_time,
+            "settle_histogram": monitor.settle_histogram.as_dict(),
+        },
+        "watchdog": data.watchdog.as_dict(),
+        "modbus": controller.modbus.as_dict() if controller.modbus else None,
+        "compliance_log": (
+            controller.compliance_log.as_dict() if controller.compliance_log else None
+        ),
+        "fleet": data.fleet.as_dict(),
+        "plant": data.plant.as_dict() if data.plant else None,
+    }
@@ -0,0 +1,98 @@
+"""Base entity writing its state only on significant changes."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity
+
+from .const import CONF_STATE_MAX_AGE, DEFAULT_STATE_MAX_AGE
+
+_UNSET = object()
+
+
+class ChangeOnlyEntity(Entity):
+    """Entity that skips state writes which would not tell anything new.
+
+    The controller and the monitor notify their listeners with every MQTT
+    command and every readback, and the attributes (latencies, counters)
+    differ each time, so every notification would be a state change in the
+    state machine and a row in the recorder. Listeners call
+    ``async_write_if_changed`` instead of ``async_write_ha_state``: the state
+    is written right away on a transition of ``_significant_state`` (beyond
+    ``_significant_change`` for numbers), any other update is written at the
+    latest ``state_max_age`` seconds after the previous write.
+    """
+
+    _entry: ConfigEntry
+    # smallest difference of a numeric state that is written right away
+    _significant_change: float = 0
+
+    _written: Any = _UNSET
+    _written_at = 0.0
+    _heartbeat: asyncio.TimerHandle | None = None
+    state_writes = 0
+    state_writes_skipped = 0
+
+    @property
+    def _max_age(self) -> float:
+        return self._entry.data.get(CONF_STATE_MAX_AGE, DEFAULT_STATE_MAX_AGE)
+
+    def _significant_state(self) -> Any:
+        """Return the part of the state whose change is written right away."""
+        return self.state
+
+    def _changed(self, old: Any, new: Any) -> bool:
+        if isinstance(old, tuple) and isinstance(new, tuple) and len(old) == len(new):
+            return any(self._changed(a, b) for a, b in zip(old, new))
+        if (
+            isinstance(old, (int, float))
+            and isinstance(new, (int, float))
+            and not isinstance(old, bool)
+        ):
+            return abs(new - old) > self._significant_change
+        return old != new
+
+    @callback
+    def async_write_if_changed(self) -> None:
+        """Write the state if it changed significantly or is due."""
+        significant = self._significant_state()
+        if (
+            self._written is _UNSET
+            or self._changed(self._written, significant)
+            or self.hass.loop.time() - self._written_at >= self._max_age
+        ):
+            self._async_write(significant)
+            return
+        self.state_writes_skipped += 1
+        if self._heartbeat is None:
+            self._heartbeat = self.hass.loop.call_at(
+                self._written_at + self._max_age, self._async_heartbeat
+            )
+
+    @callback
+    def _async_heartbeat(self) -> None:
+        self._heartbeat = None
+        self._async_write(self._significant_state())
+
+    @callback
+    def _async_write(self, significant: Any) -> None:
+        self._cancel_heartbeat()
+        self._written = significant
+        # loop clock, the heartbeat is scheduled with call_at
+        self._written_at = self.hass.loop.time()
+        self.state_writes += 1
+        self.async_write_ha_state()
+
+    @callback
+    def _cancel_heartbeat(self) -> None:
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Drop a pending heartbeat."""
+        self._cancel_heartbeat()
@@ -0,0 +1,125 @@
+"""Fleet mode: HTTP resources shared by all inverters of a Home Assistant."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import DOMAIN
+from .lpp_a import MAX_CONCURRENCY, RequestScheduler
+from .metrics import LatencyHistogram
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_FLEET = "fleet"
+
+# Requests in flight across all inverters
+FLEET_CONCURRENCY = 16
+# Writes received within this window after the first one form one wave
+WAVE_WINDOW = 0.5
+# A wave is reported once no write was acknowledged for this long
+WAVE_IDLE = 10.0
+
+
+class Fleet:
+    """HTTP session and request scheduler of all config entries.
+
+    All inverters use Home Assistant's shared keep-alive session and one
+    scheduler capping the requests in flight, so connections are bounded by
+    the schedulers rather than the connector; limit writes overtake reads
+    fleet-wide as well. Writes whose commands arrived together (a grid
+    operator signal hitting all sites) are grouped into a wave, and the time
+    from the first command to the last acknowledgement is the fleet
+    time-to-apply.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the fleet."""
+        self.hass = hass
+        self.entries: set[str] = set()
+        self.scheduler = RequestScheduler(FLEET_CONCURRENCY)
+        self.session = async_get_clientsession(hass)
+        self.time_to_apply = LatencyHistogram()
+        self.waves = 0
+        self.last_wave: dict | None = None
+        # [first receive, last acknowledgement, writes] of the open wave
+        self._wave: list | None = None
+        self._close_wave_timer: asyncio.TimerHandle | None = None
+
+    @callback
+    def record_applied(self, received: float, applied_at: float) -> None:
+        """Add an acknowledged write to the current wave."""
+        if self._wave is not None:
+            if received < self._wave[0]:
+                # late acknowledgement of a command older than the open wave
+                return
+            if received - self._wave[0] > WAVE_WINDOW:
+                self._close_wave()
+        if self._wave is None:
+            self._wave = [received, applied_at, 0]
+        wave = self._wave
+        wave[1] = max(wave[1], applied_at)
+        wave[2] += 1
+        if self._close_wave_timer:
+            self._close_wave_timer.cancel()
+        self._close_wave_timer = self.hass.loop.call_later(WAVE_IDLE, self._close_wave)
+
+    @callback
+    def _close_wave(self) -> None:
+        if self._close_wave_timer:
+            self._close_wave_timer.cancel()
+            self._close_wave_timer = None
+        if self._wave is None:
+            return
+        start, end, writes = self._wave
+        self._wave = None
+        self.waves += 1
+        self.time_to_apply.record(end - start)
+        self.last_wave = {
+            "writes": writes,
+            "time_to_apply_ms": (end - start) * 1000,
+        }
+        _LOGGER.debug(
+            "Fleet wave: %d writes acknowledged within %.1f ms",
+            writes,
+            (end - start) * 1000,
+        )
+
+    async def async_close(self) -> None:
+        """Report the open wave, the session belongs to Home Assistant."""
+        self._close_wave()
+
+    def as_dict(self) -> dict:
+        """Return the fleet state for diagnostics."""
+        return {
+            "entries": len(self.entries),
+            "requests_in_flight_limit": FLEET_CONCURRENCY,
+            "requests_in_flight_limit_per_host": MAX_CONCURRENCY,
+            "scheduler": self.scheduler.as_dict(),
+            "waves": self.waves,
+            "last_wave": self.last_wave,
+            "time_to_apply": self.time_to_apply.as_dict(),
+        }
+
+
+@callback
+def async_join_fleet(hass: HomeAssistant, entry: ConfigEntry) -> Fleet:
+    """Return the fleet, creating it with its first entry."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (fleet := domain_data.get(DATA_FLEET)) is None:
+        fleet = domain_data[DATA_FLEET] = Fleet(hass)
+    fleet.entries.add(entry.entry_id)
+    return fleet
+
+
+async def async_leave_fleet(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove an entry, dropping the fleet after the last one."""
+    fleet: Fleet = hass.data[DOMAIN][DATA_FLEET]
+    fleet.entries.discard(entry.entry_id)
+    if not fleet.entries:
+        hass.data[DOMAIN].pop(DATA_FLEET, None)
+        await fleet.async_close()
@@ -1,10 +1,28 @@
 """http request handler."""
 
+import asyncio
+from collections import Counter
+from collections.abc import Callable, Iterable
+import contextlib
+import copy
+from dataclasses import dataclass
 import hashlib
+import heapq
+import itertools
+import json
+import logging
 import os
+import random
+import re
+import time
 
 import aiohttp
 
+_LOGGER = logging.getLogger(__name__)
+
+# key=value oder key="quoted, value" aus einem Digest-Challenge-Header
+_CHALLENGE_PARAM = re.compile(r'([\w-]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^,\s]*)')
+
 LPP_ON = {
     "exportLimits": {
         "activePower": {
@@ -38,63 +56,440 @@ LPP_OFF = {
     "visualization": {"exportLimits": {"activePower": {}}},
 }
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Gesamtfrist einer Anfrage inkl. Wiederholungen und Frist eines Versuchs in s
+REQUEST_TIMEOUT = 10
+ATTEMPT_TIMEOUT = 4
+REQUEST_RETRIES = 2
+# Exponentielles Backoff mit Jitter zwischen den Versuchen in s
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2
+
+# Gleichzeitige Anfragen, die der Webserver des GEN24 verträgt
+MAX_CONCURRENCY = 2
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+# Platzhalter im vorkodierten Template, z.B. "@@limit@@"
+_PLACEHOLDER = re.compile(rb'"@@(\w+)@@"')
+
+
+def canonical_json(document) -> bytes:
+    """Deterministische, kompakte JSON-Kodierung."""
+    return json.dumps(document, sort_keys=True, separators=(",", ":")).encode()
+
+
+class PowerLimitPayload:
+    """Vorkodierte powerLimits-Dokumente eines Wechselrichters.
+
+    Die statischen Teile werden einmalig serialisiert; beim Schreiben werden
+    nur enabled, powerLimit und wattPeakReferenceValue eingesetzt.
+    """
+
+    def __init__(self, template_on=LPP_ON, template_off=LPP_OFF):
+        document = copy.deepcopy(template_on)
+        soft_limit = document["exportLimits"]["activePower"]["softLimit"]
+        soft_limit["enabled"] = "@@enabled@@"
+        soft_limit["powerLimit"] = "@@limit@@"
+        document["visualization"]["wattPeakReferenceValue"] = "@@peak@@"
+        # [statisch, name, statisch, name, ..., statisch]
+        self._parts = tuple(_PLACEHOLDER.split(canonical_json(document)))
+        self.off = canonical_json(template_off)
+
+    def on(self, limit: int, watt_peak: int, enabled: bool = True) -> bytes:
+        """Baut das Dokument für eine aktive Begrenzung."""
+        values = {
+            b"enabled": b"true" if enabled else b"false",
+            b"limit": b"%d" % limit,
+            b"peak": b"%d" % watt_peak,
+        }
+        parts = self._parts
+        return b"".join(
+            values[part] if index % 2 else part for index, part in enumerate(parts)
+        )
+
+
+class CircuitBreaker:
+    """Lässt Anfragen sofort scheitern, solange der Wechselrichter ausfällt.
+
+    Nach ``threshold`` fehlgeschlagenen Anfragen in Folge ist der Breaker
+    offen. Nach ``open_time`` lässt er genau eine Probe durch (half-open):
+    Gelingt sie, ist er wieder geschlossen, sonst verdoppelt sich die Wartezeit
+    bis ``max_open_time``.
+    """
+
+    def __init__(
+        self, threshold: int = 3, open_time: float = 5.0, max_open_time: float = 60.0
+    ):
+        self.threshold = threshold
+        self.open_time = open_time
+        self.max_open_time = max_open_time
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._current_open_time = open_time
+        self._probing = False
+
+    def retry_in(self) -> float:
+        """Sekunden bis zur nächsten Probe, 0 wenn Anfragen erlaubt sind."""
+        if self.state != BREAKER_OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._current_open_time - time.monotonic())
+
+    def allow(self) -> bool:
+        """Prüft, ob eine Anfrage gesendet werden darf."""
+        if self.state == BREAKER_CLOSED:
+            return True
+        if self.state == BREAKER_OPEN and not self.retry_in():
+            self.state = BREAKER_HALF_OPEN
+            self._probing = False
+        if self.state == BREAKER_HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Anfrage erfolgreich, Breaker schließen."""
+        if self.state != BREAKER_CLOSED:
+            _LOGGER.info("Wechselrichter wieder erreichbar")
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self._current_open_time = self.open_time
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """Anfrage endgültig gescheitert."""
+        if self.state == BREAKER_HALF_OPEN:
+            self._current_open_time = min(
+                self._current_open_time * 2, self.max_open_time
+            )
+            self._open()
+            return
+        self.failures += 1
+        if self.state == BREAKER_CLOSED and self.failures >= self.threshold:
+            self._open()
+
+    def _open(self) -> None:
+        if self.state == BREAKER_CLOSED:
+            _LOGGER.warning(
+                "Wechselrichter nach %d Fehlern nicht erreichbar", self.failures
+            )
+        self.state = BREAKER_OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+
+class LaneStats:
+    """Wartezeiten einer Prioritätsstufe des Schedulers."""
+
+    def __init__(self):
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overtaken = 0
+
+    def record(self, wait: float) -> None:
+        """Erfasst die Wartezeit einer gestarteten Anfrage."""
+        self.requests += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def as_dict(self) -> dict:
+        """Zusammenfassung für Diagnose und Attribute."""
+        return {
+            "requests": self.requests,
+            "wait_mean_ms": (
+                self.wait_total / self.requests * 1000 if self.requests else None
+            ),
+            "wait_max_ms": self.wait_max * 1000,
+            "overtaken": self.overtaken,
+        }
+
+
+class RequestScheduler:
+    """Vergibt die HTTP-Slots eines Wechselrichters nach Priorität.
+
+    Höchstens ``max_concurrency`` Anfragen laufen gleichzeitig. Wartende
+    Schreibzugriffe (PRIORITY_HIGH) überholen wartende Lesezugriffe, und
+    Lesezugriffe belegen nie den letzten Slot: ein langsamer GET kann einen
+    powerLimits-POST daher nicht aufhalten.
+
+    Mit ``parent`` belegt jede Anfrage zusätzlich einen Slot des
+    übergeordneten Schedulers (Flotte), immer nach dem eigenen Slot.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        parent: "RequestScheduler | None" = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.parent = parent
+        self.active = [0, 0]
+        self.peak = 0
+        self.lanes = {PRIORITY_HIGH: LaneStats(), PRIORITY_LOW: LaneStats()}
+        # Heap aus (Priorität, Reihenfolge, Future)
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        """Anzahl wartender Anfragen."""
+        return len(self._queue)
+
+    def _may_start(self, priority: int) -> bool:
+        if sum(self.active) >= self.max_concurrency:
+            return False
+        # ein Slot bleibt für Schreibzugriffe frei
+        return priority == PRIORITY_HIGH or (
+            self.active[PRIORITY_LOW] < max(1, self.max_concurrency - 1)
+        )
+
+    def _start(self, priority: int) -> None:
+        self.active[priority] += 1
+        self.peak = max(self.peak, sum(self.active))
+
+    def _wake(self) -> None:
+        """Gibt freie Slots an die Wartenden in Prioritätsreihenfolge."""
+        waiting = []
+        while self._queue:
+            priority, order, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            if self._may_start(priority):
+                self._start(priority)
+                future.set_result(None)
+            else:
+                waiting.append((priority, order, future))
+        for item in waiting:
+            heapq.heappush(self._queue, item)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int):
+        """Wartet auf einen Slot der angegebenen Priorität."""
+        start = time.monotonic()
+        if priority == PRIORITY_HIGH:
+            self.lanes[PRIORITY_LOW].overtaken += sum(
+                1 for item in self._queue if item[0] == PRIORITY_LOW
+            )
+        if self._may_start(priority) and not any(
+            item[0] <= priority for item in self._queue
+        ):
+            self._start(priority)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (priority, next(self._order), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Slot wurde schon vergeben
+                    self.active[priority] -= 1
+                    self._wake()
+                raise
+        self.lanes[priority].record(time.monotonic() - start)
+        try:
+            if self.parent is None:
+                yield
+            else:
+                async with self.parent.slot(priority):
+                    yield
+        finally:
+            self.active[priority] -= 1
+            self._wake()
+
+    def as_dict(self) -> dict:
+        """Zusammenfassung für Diagnose und Attribute."""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": sum(self.active),
+            "peak_active": self.peak,
+            "queued": self.queued,
+            "writes": self.lanes[PRIORITY_HIGH].as_dict(),
+            "reads": self.lanes[PRIORITY_LOW].as_dict(),
+        }
+
+
+TIMEOFUSE_TYPES = ("CHARGE_MIN", "CHARGE_MAX", "DISCHARGE_MIN", "DISCHARGE_MAX")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+@dataclass(frozen=True)
+class TimeOfUseSlot:
+    """Ein Eintrag des timeofuse-Plans, z.B. Entladen max. 0 W von 17 bis 21 Uhr."""
+
+    schedule_type: str
+    power: int
+    start: str
+    end: str
+    weekdays: tuple[str, ...] = WEEKDAYS
+    active: bool = True
+
+    def __post_init__(self):
+        if self.schedule_type not in TIMEOFUSE_TYPES:
+            raise ValueError(f"Unbekannter ScheduleType {self.schedule_type}")
+        if unknown := set(self.weekdays) - set(WEEKDAYS):
+            raise ValueError(f"Unbekannte Wochentage {sorted(unknown)}")
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "TimeOfUseSlot":
+        """Liest einen Eintrag, wie ihn der Wechselrichter liefert."""
+        return cls(
+            schedule_type=entry["ScheduleType"],
+            power=int(entry["Power"]),
+            start=entry["TimeTable"]["Start"],
+            end=entry["TimeTable"]["End"],
+            weekdays=tuple(day for day in WEEKDAYS if entry["Weekdays"].get(day)),
+            active=bool(entry["Active"]),
+        )
+
+    def as_dict(self) -> dict:
+        """Eintrag im Format der timeofuse-API."""
+        return {
+            "Active": self.active,
+            "Power": self.power,
+            "ScheduleType": self.schedule_type,
+            "TimeTable": {"Start": self.start, "End": self.end},
+            "Weekdays": {day: day in self.weekdays for day in WEEKDAYS},
+        }
+
+
+def build_timeofuse(slots: Iterable[TimeOfUseSlot]) -> bytes:
+    """Baut das vollständige timeofuse-Dokument.
+
+    Die Slots werden nach Startzeit sortiert, damit gleiche Pläne
+    byte-identisch kodiert werden.
+    """
+    ordered = sorted(slots, key=lambda slot: (slot.start, slot.end, slot.schedule_type))
+    return canonical_json({"timeofuse": [slot.as_dict() for slot in ordered]})
+
 
 class FroniusGEN24:
     """Fronius GEN24 LPP HTTP Request Handler mit Digest-Auth."""
 
-    def __init__(self, host: str, user: str, password: str):
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        session: aiohttp.ClientSession | None = None,
+        fleet: RequestScheduler | None = None,
+    ):
         self.host = host
         self.user = user.lower()
         self.password = password
-        self.session = None
+        # Eine übergebene Session gehört dem Aufrufer und wird nie geschlossen.
+        self.session = session
+        self._own_session = session is None
         self.realm = None
         self.nonce = None
         self.qop = None
         self.opaque = None
         self.algorithm = "MD5"
         self.nc = 0
-        self.lpp_on = LPP_ON
-        self.lpp_off = LPP_OFF
+        self._ha1_cache: dict[tuple, str] = {}
+        self.payload = PowerLimitPayload()
+
+        # Anzahl Schreibzugriffe je benötigter HTTP-Round-Trips, z.B. {1: 980, 2: 3}
+        self.round_trips: Counter[int] = Counter()
+        # Round-Trips und HTTP-Status des letzten Schreibzugriffs, Wiederholungen
+        # eingeschlossen; None, wenn keine Antwort kam
+        self.last_round_trips = 0
+        self.last_status: int | None = None
+
+        # Beobachter je HTTP-Austausch:
+        # (method, path, Sekunden, Round-Trips, Nonce wiederverwendet, Erfolg)
+        self.on_request: Callable[[str, str, float, int, bool, bool], None] | None = (
+            None
+        )
+
+        # Eigene Slots je Wechselrichter, optional unter dem Flotten-Scheduler
+        self.scheduler = RequestScheduler(parent=fleet)
+        self.breaker = CircuitBreaker()
+        self.retries = 0
+        self.fast_failures = 0
+        self.superseded = 0
+        self.last_error: str | None = None
 
         self.http_request_path_praefix = "/api/"
         self.login_path = "/api/commands/Login"
         self.timeofuse_path = "/api/config/timeofuse"
         self.powerlimit_path = "/api/config/limit_settings/powerLimits"
+        self.powerflow_path = "/solar_api/v1/GetPowerFlowRealtimeData.fcgi"
+
+        # Zuletzt gelesener oder bestätigter timeofuse-Plan und sein Hash
+        self.timeofuse: tuple[TimeOfUseSlot, ...] | None = None
+        self._timeofuse_digest: str | None = None
+        self.timeofuse_uploads = 0
+        self.timeofuse_skipped = 0
+
+    def reconfigure(self, host: str, user: str, password: str) -> None:
+        """Übernimmt neue Zugangsdaten, die Session bleibt erhalten.
+
+        Digest-Zustand und Circuit Breaker gehören zum alten Gerät und werden
+        verworfen.
+        """
+        self.host = host
+        self.user = user.lower()
+        self.password = password
+        self.realm = None
+        self.nonce = None
+        self.qop = None
+        self.opaque = None
+        self.nc = 0
+        self._ha1_cache.clear()
+        self.breaker = CircuitBreaker()
+        self.last_status = None
+        self.last_round_trips = 0
+        self.last_error = None
+        self.timeofuse = None
+        self._timeofuse_digest = None
 
     async def init_session(self):
-        """Initialisiert aiohttp ClientSession."""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        """Initialisiert aiohttp ClientSession mit Keep-Alive-Verbindungspool."""
+        if not self.session or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=MAX_CONCURRENCY, keepalive_timeout=60
+                )
+            )
+            self._own_session = True
 
     async def close(self):
-        """Schließt die aiohttp-Session."""
-        if self.session:
+        """Schließt die aiohttp-Session, falls sie selbst erstellt wurde."""
+        if self.session and self._own_session:
             await self.session.close()
+            self.session = None
 
-    async def _get_auth_params(self, url: str):
-        """Fordert 401 an, um die Digest-Parameter zu bekommen."""
-        async with self.session.get(
-            url
-        ) as r:  # <-- geändert: async context mit aiohttp
-            if r.status != 401:
-                raise Exception(f"Erwartet 401, aber {r.status}")
-            header = r.headers.get("WWW-Authenticate") or r.headers.get(
-                "X-WWW-Authenticate"
-            )
-            if not header:
-                raise Exception("Kein WWW-Authenticate-Header gefunden")
+    def _parse_challenge(self, response_headers) -> None:
+        """Übernimmt die Digest-Parameter direkt aus der 401-Antwort."""
+        header = response_headers.get("WWW-Authenticate") or response_headers.get(
+            "X-WWW-Authenticate"
+        )
+        if not header or not header.lstrip().lower().startswith("digest"):
+            raise Exception("Kein WWW-Authenticate-Header gefunden")
 
-            params = {}
-            for item in header.replace("Digest ", "").split(","):
-                if "=" in item:
-                    k, v = item.strip().split("=", 1)
-                    params[k] = v.strip('"')
+        params = {
+            k.lower(): v[1:-1] if v.startswith('"') else v
+            for k, v in _CHALLENGE_PARAM.findall(header.lstrip()[6:])
+        }
+        if params.get("stale", "").lower() == "true":
+            _LOGGER.debug("Nonce abgelaufen (stale), Realm bleibt %s", self.realm)
 
-            self.realm = params.get("realm")
-            self.nonce = params.get("nonce")
-            self.qop = params.get("qop")
-            self.opaque = params.get("opaque")
-            self.algorithm = params.get("algorithm", "MD5")
+        self.realm = params.get("realm")
+        self.nonce = params.get("nonce")
+        self.nc = 0
+        qop_options = [q.strip() for q in params.get("qop", "").split(",")]
+        self.qop = "auth" if "auth" in qop_options else None
+        self.opaque = params.get("opaque")
+        self.algorithm = params.get("algorithm", "MD5")
 
     def _hash(self, data: str) -> str:
         if self.algorithm.upper() in ["SHA-256", "SHA256"]:
@@ -102,23 +497,37 @@ class FroniusGEN24:
         else:
             return hashlib.md5(data.encode()).hexdigest()
 
+    def _ha1(self) -> str:
+        """HA1 hängt nur von Realm und Algorithmus ab und wird gecacht."""
+        key = (self.realm, self.algorithm)
+        if (ha1 := self._ha1_cache.get(key)) is None:
+            ha1 = self._ha1_cache[key] = self._hash(
+                f"{self.user}:{self.realm}:{self.password}"
+            )
+        return ha1
+
     def _build_auth_header(self, method: str, uri: str):
         self.nc += 1
         nc_value = f"{self.nc:08x}"
-        cnonce = hashlib.md5(os.urandom(8)).hexdigest()
+        cnonce = os.urandom(8).hex()
 
-        ha1 = self._hash(f"{self.user}:{self.realm}:{self.password}")
         ha2 = self._hash(f"{method}:{uri}")
-        response = self._hash(
-            f"{ha1}:{self.nonce}:{nc_value}:{cnonce}:{self.qop}:{ha2}"
-        )
+        if self.qop:
+            response = self._hash(
+                f"{self._ha1()}:{self.nonce}:{nc_value}:{cnonce}:{self.qop}:{ha2}"
+            )
+        else:
+            # RFC 2069 ohne qop
+            response = self._hash(f"{self._ha1()}:{self.nonce}:{ha2}")
 
         header = (
             f'Digest username="{self.user}", realm="{self.realm}", '
-            f'nonce="{self.nonce}", uri="{uri}", '
-            f'response="{response}", qop={self.qop}, '
-            f'nc={nc_value}, cnonce="{cnonce}"'
+            f'nonce="{self.nonce}", uri="{uri}", response="{response}"'
         )
+        if self.qop:
+            header += f', qop={self.qop}, nc={nc_value}, cnonce="{cnonce}"'
+        if self.algorithm != "MD5":
+            header += f", algorithm={self.algorithm}"
         if self.opaque:
             header += f', opaque="{self.opaque}"'
         return header
@@ -126,28 +535,62 @@ class FroniusGEN24:
     async def _request(
         self, method: str, uri: str, headers=None, data=None, params=None
     ):
-        """Asynchrone HTTP-Anfrage mit Digest-Auth."""
+        """Asynchrone HTTP-Anfrage mit Digest-Auth.
+
+        Mit gültiger Nonce genügt ein Round-Trip. Sonst liefert die 401-Antwort
+        die neue Challenge direkt mit, und die Anfrage wird einmal wiederholt.
+        """
         url = f"http://{self.host}{uri}"
         if headers is None:
             headers = {}
+        round_trips = 1
+        status = None
+        nonce_reused = self.nonce is not None
+        ok = False
+        start = time.monotonic()
 
-        # Ersten Auth-Header bauen
-        headers["Authorization"] = self._build_auth_header(method, uri)
-
-        async with self.session.request(
-            method, url, headers=headers, params=params, data=data
-        ) as r:
-            if r.status == 401:
-                # Wenn 401: Auth-Parameter neu holen
-                await self._get_auth_params(url)
+        try:
+            # Bekannte Nonce wiederverwenden (nc wird hochgezählt), sonst ohne Auth
+            if self.nonce:
                 headers["Authorization"] = self._build_auth_header(method, uri)
-                async with self.session.request(
-                    method, url, headers=headers, params=params, data=data
-                ) as r2:
-                    r2.raise_for_status()
-                    return await r2.text()
-            r.raise_for_status()
-            return await r.text()
+
+            async with self.session.request(
+                method, url, headers=headers, params=params, data=data
+            ) as r:
+                status = r.status
+                if r.status != 401:
+                    r.raise_for_status()
+                    text = await r.text()
+                    ok = True
+                    return text
+                # Neue Challenge (auch stale=true) direkt aus der 401 übernehmen
+                self._parse_challenge(r.headers)
+
+            headers["Authorization"] = self._build_auth_header(method, uri)
+            round_trips += 1
+            async with self.session.request(
+                method, url, headers=headers, params=params, data=data
+            ) as r2:
+                status = r2.status
+                r2.raise_for_status()
+                text = await r2.text()
+                ok = True
+                return text
+        finally:
+            if method != "GET":
+                self.round_trips[round_trips] += 1
+                self.last_round_trips += round_trips
+                if status is not None:
+                    self.last_status = status
+            if self.on_request is not None:
+                self.on_request(
+                    method,
+                    uri,
+                    time.monotonic() - start,
+                    round_trips,
+                    nonce_reused,
+                    ok,
+                )
 
     async def send_request(
         self,
@@ -157,22 +600,156 @@ class FroniusGEN24:
         params=None,
         headers=None,
         add_praefix=False,
+        timeout: float = REQUEST_TIMEOUT,
+        retries: int = REQUEST_RETRIES,
+        interrupt: asyncio.Event | None = None,
+        priority: int | None = None,
     ):
+        """Anfrage mit Frist, Wiederholungen und Circuit Breaker.
+
+        Liefert den Antworttext oder None. Wird ``interrupt`` während des
+        Backoffs gesetzt, ist die Anfrage überholt und wird abgebrochen.
+        Schreibzugriffe laufen standardmäßig mit PRIORITY_HIGH, Lesezugriffe
+        mit PRIORITY_LOW.
+        """
         await self.init_session()
 
         if headers is None:
             headers = {}
         if add_praefix:
             path = self.http_request_path_praefix + path
+        if method != "GET":
+            self.last_round_trips = 0
+            self.last_status = None
+
+        if not self.breaker.allow():
+            self.fast_failures += 1
+            _LOGGER.debug("Wechselrichter gesperrt, %s %s übersprungen", method, path)
+            return None
+        if self.breaker.state == BREAKER_HALF_OPEN:
+            # Probe: ein Versuch genügt
+            retries = 0
+
+        if priority is None:
+            priority = PRIORITY_LOW if method == "GET" else PRIORITY_HIGH
 
+        deadline = time.monotonic() + timeout
+        for attempt in range(retries + 1):
+            try:
+                async with asyncio.timeout(
+                    min(ATTEMPT_TIMEOUT, max(0.0, deadline - time.monotonic()))
+                ), self.scheduler.slot(priority):
+                    result = await self._request(
+                        method, path, headers=dict(headers), data=payload, params=params
+                    )
+            except aiohttp.ClientResponseError as e:
+                if e.status < 500:
+                    # Gerät erreichbar, aber die Anfrage ist falsch: nicht wiederholen
+                    self.breaker.record_success()
+                    self.last_error = f"{e.status} {e.message}"
+                    _LOGGER.debug("Request %s %s failed: %s", method, path, e)
+                    return None
+                self.last_error = f"{e.status} {e.message}"
+            except Exception as e:
+                # Session bleibt offen, damit Verbindungspool und Nonce erhalten bleiben
+                self.last_error = repr(e)
+            else:
+                self.breaker.record_success()
+                return result
+
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1)
+            if attempt == retries or time.monotonic() + delay >= deadline:
+                break
+            self.retries += 1
+            if interrupt is None:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await asyncio.wait_for(interrupt.wait(), delay)
+            except TimeoutError:
+                continue
+            self.superseded += 1
+            _LOGGER.debug("Request %s %s durch neueren Befehl überholt", method, path)
+            return None
+
+        self.breaker.record_failure()
+        _LOGGER.debug(
+            "Request %s %s failed after %d attempts: %s",
+            method,
+            path,
+            attempt + 1,
+            self.last_error,
+        )
+        return None
+
+    async def get_power_flow(self):
+        """Liest die Echtzeit-Leistungsdaten (Solar API, ohne Auth).
+
+        P_Grid ist positiv beim Netzbezug und negativ bei Einspeisung.
+        """
+        response = await self.send_request(self.powerflow_path)
+        if response is None:
+            return None
+        try:
+            return json.loads(response)["Body"]["Data"]["Site"]
+        except (ValueError, KeyError, TypeError):
+            _LOGGER.debug("Unerwartete PowerFlow-Antwort: %s", response)
+            return None
+
+    async def get_timeofuse(self) -> tuple[TimeOfUseSlot, ...] | None:
+        """Liest den aktuellen timeofuse-Plan und aktualisiert den Cache."""
+        response = await self.send_request(self.timeofuse_path)
+        if response is None:
+            return None
         try:
-            result = await self._request(
-                method, path, headers=headers, data=payload, params=params
+            slots = tuple(
+                TimeOfUseSlot.from_dict(entry)
+                for entry in json.loads(response)["timeofuse"]
             )
-            return result
-        except Exception as e:
-            # Ensure we close the session on error to avoid "Unclosed client session"
-            await self.close()
+        except (ValueError, KeyError, TypeError):
+            _LOGGER.debug("Unerwartete timeofuse-Antwort: %s", response)
+            return None
+        self.timeofuse = slots
+        self._timeofuse_digest = hashlib.sha256(build_timeofuse(slots)).hexdigest()
+        return slots
+
+    async def upload_timeofuse(
+        self, slots: Iterable[TimeOfUseSlot], force: bool = False
+    ) -> bool:
+        """Schreibt einen kompletten timeofuse-Plan mit einer einzigen Anfrage.
+
+        Ein Plan, der dem zuletzt gelesenen oder bestätigten entspricht, wird
+        nicht erneut gesendet. Ohne Cache wird der aktuelle Plan einmal gelesen.
+        """
+        slots = tuple(slots)
+        payload = build_timeofuse(slots)
+        digest = hashlib.sha256(payload).hexdigest()
+        if self._timeofuse_digest is None and not force:
+            await self.get_timeofuse()
+        if digest == self._timeofuse_digest and not force:
+            self.timeofuse_skipped += 1
+            return True
+
+        if self.timeofuse is not None:
+            added, removed = timeofuse_diff(self.timeofuse, slots)
+            _LOGGER.debug(
+                "timeofuse: %d Einträge neu, %d entfernt", len(added), len(removed)
+            )
+        response = await self.send_request(
+            self.timeofuse_path,
+            method="POST",
+            payload=payload,
+            headers=dict(JSON_HEADERS),
+        )
+        if response is None:
+            # Zustand auf dem Gerät unbekannt, beim nächsten Mal neu lesen
+            self.timeofuse = None
+            self._timeofuse_digest = None
+            return False
+        self.timeofuse = slots
+        self._timeofuse_digest = digest
+        self.timeofuse_uploads += 1
+        return True
 
     async def login(self):
         """Asynchroner Login über Digest-Auth."""
@@ -184,8 +761,15 @@ class FroniusGEN24:
             return True
 
         except Exception as e:
+            _LOGGER.debug("Login failed: %s", e)
             return False
 
-        finally:
-            # Always close the session after attempting login to avoid leaks
-            await self.close()
+
+def timeofuse_diff(
+    current: Iterable[TimeOfUseSlot], new: Iterable[TimeOfUseSlot]
+) -> tuple[list[TimeOfUseSlot], list[TimeOfUseSlot]]:
+    """Vergleicht zwei Pläne, liefert (neue Einträge, entfernte Einträge)."""
+    current, new = list(current), list(new)
+    return [slot for slot in new if slot not in current], [
+        slot for slot in current if slot not in new
+    ]
@@ -0,0 +1,170 @@
+"""Runtime metrics for gen24lpp."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+import time
+
+# Bucket upper bounds in milliseconds, the last bucket catches everything above.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last: float | None = None
+
+    def record(self, seconds: float) -> None:
+        """Record one sample given in seconds."""
+        value = seconds * 1000
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float | None:
+        """Return the bucket upper bound (ms) containing the q-th percentile."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index < len(self.buckets):
+                    return float(self.buckets[index])
+                return self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        """Return a JSON serialisable summary."""
+        return {
+            "count": self.count,
+            "last_ms": self.last,
+            "mean_ms": self.total / self.count if self.count else None,
+            "max_ms": self.max if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets_ms": {
+                **{f"<={b}": c for b, c in zip(self.buckets, self.counts)},
+                f">{self.buckets[-1]}": self.counts[-1],
+            },
+        }
+
+
+class RingBuffer:
+    """The most recent samples of a value, older ones are dropped."""
+
+    def __init__(self, size: int = 100) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def append(self, value: float) -> None:
+        """Add one sample."""
+        self.samples.append(value)
+
+    def mean(self) -> float | None:
+        """Return the mean of the kept samples."""
+        if not self.samples:
+            return None
+        return sum(self.samples) / len(self.samples)
+
+    def max(self) -> float | None:
+        """Return the largest kept sample."""
+        return max(self.samples, default=None)
+
+
+class RequestMetrics:
+    """Timing and authentication statistics of the inverter requests.
+
+    Fed by FroniusGEN24.on_request after every HTTP exchange and by
+    LimitController.on_write after every powerLimits write, retries included.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: dict[str, LatencyHistogram] = {}
+        self.requests = 0
+        self.authenticated = 0
+        self.reauths = 0
+        self.nonce_reused = 0
+        # 1.0 for an acknowledged limit write, 0.0 for a failed one
+        self.write_outcomes = RingBuffer()
+
+    def record_request(
+        self,
+        method: str,
+        path: str,
+        seconds: float,
+        round_trips: int,
+        nonce_reused: bool,
+        ok: bool,
+    ) -> None:
+        """Record one request including its digest auth round-trips."""
+        key = f"{method} {path}"
+        if (histogram := self.endpoints.get(key)) is None:
+            histogram = self.endpoints[key] = LatencyHistogram()
+        histogram.record(seconds)
+        self.requests += 1
+        if path.startswith("/api/"):
+            # the Solar API needs no digest auth
+            self.authenticated += 1
+            if round_trips > 1:
+                self.reauths += 1
+            elif nonce_reused:
+                self.nonce_reused += 1
+
+    def record_write(self, acknowledged: bool) -> None:
+        """Record the outcome of one limit write."""
+        self.write_outcomes.append(1.0 if acknowledged else 0.0)
+
+    @property
+    def nonce_reuse_ratio(self) -> float | None:
+        """Share of authenticated requests in % that needed no 401 round-trip."""
+        if not self.authenticated:
+            return None
+        return self.nonce_reused / self.authenticated * 100
+
+    @property
+    def write_success_rate(self) -> float | None:
+        """Share of the recent writes in % the inverter acknowledged."""
+        if (mean := self.write_outcomes.mean()) is None:
+            return None
+        return mean * 100
+
+    def as_dict(self) -> dict:
+        """Return a JSON serialisable summary."""
+        return {
+            "requests": self.requests,
+            "authenticated": self.authenticated,
+            "reauths": self.reauths,
+            "nonce_reuse_ratio": self.nonce_reuse_ratio,
+            "write_success_rate": self.write_success_rate,
+            "endpoints": {
+                key: histogram.as_dict() for key, histogram in self.endpoints.items()
+            },
+        }
+
+
+class StartupTimes:
+    """Milestones of the setup of an entry in ms since it started."""
+
+    def __init__(self) -> None:
+        self._start = time.monotonic()
+        self.milestones: dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        """Record a milestone, only its first occurrence counts."""
+        self.milestones.setdefault(name, (time.monotonic() - self._start) * 1000)
+
+    def as_dict(self) -> dict:
+        """Return a JSON serialisable summary."""
+        return dict(self.milestones)
@@ -0,0 +1,283 @@
+"""SunSpec power limit over Modbus TCP.
+
+Minimal asyncio Modbus TCP client (function codes 3 and 16) and the
+WMaxLimPct control of SunSpec model 123. Free of Home Assistant imports, so
+the tools can load it on its own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+MODBUS_PORT = 502
+MODBUS_UNIT = 1
+
+REQUEST_TIMEOUT = 2
+# no Modbus attempt for this long after the inverter was unreachable
+RECONNECT_DELAY = 30
+
+READ_HOLDING_REGISTERS = 3
+WRITE_MULTIPLE_REGISTERS = 16
+
+# SunSpec map: "SunS" marker, then (model id, length) headers
+SUNSPEC_BASES = (40000, 0, 50000)
+SUNSPEC_MARKER = (0x5375, 0x6E53)
+SUNSPEC_END = 0xFFFF
+MAX_MODELS = 64
+
+MODEL_SETTINGS = 121
+MODEL_CONTROLS = 123
+# offsets from the model start, the header (ID, L) included
+WMAX = 2
+WMAX_SF = 22
+WMAXLIMPCT = 5
+WMAXLIM_ENA = 9
+WMAXLIMPCT_SF = 23
+
+
+class ModbusError(Exception):
+    """Exception response or malformed frame."""
+
+
+class ModbusTcpClient:
+    """One persistent Modbus TCP connection, one request at a time."""
+
+    def __init__(
+        self, host: str, port: int = MODBUS_PORT, unit_id: int = MODBUS_UNIT
+    ) -> None:
+        """Initialize the client."""
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+        self._transaction = 0
+        self.connects = 0
+        self.requests = 0
+
+    @property
+    def connected(self) -> bool:
+        """True while the TCP connection is open."""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def close(self) -> None:
+        """Close the connection."""
+        if self._writer is not None:
+            writer, self._writer, self._reader = self._writer, None, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, asyncio.CancelledError):
+                pass
+
+    async def _request(self, function: int, data: bytes) -> bytes:
+        """Send one PDU and return the response data after the function code."""
+        async with self._lock:
+            try:
+                async with asyncio.timeout(REQUEST_TIMEOUT):
+                    if not self.connected:
+                        self._reader, self._writer = await asyncio.open_connection(
+                            self.host, self.port
+                        )
+                        self.connects += 1
+                    self._transaction = (self._transaction + 1) & 0xFFFF
+                    self.requests += 1
+                    pdu = bytes((function,)) + data
+                    self._writer.write(
+                        struct.pack(
+                            ">HHHB", self._transaction, 0, len(pdu) + 1, self.unit_id
+                        )
+                        + pdu
+                    )
+                    header = await self._reader.readexactly(7)
+                    transaction, protocol, length, _ = struct.unpack(">HHHB", header)
+                    response = await self._reader.readexactly(length - 1)
+            except BaseException:
+                # the stream position is unknown after a timeout or an error
+                await self.close()
+                raise
+        if transaction != self._transaction or protocol != 0:
+            await self.close()
+            raise ModbusError("Unexpected transaction")
+        if response[0] == function | 0x80:
+            raise ModbusError(f"Exception code {response[1]}")
+        if response[0] != function:
+            raise ModbusError(f"Unexpected function {response[0]}")
+        return response[1:]
+
+    async def read_registers(self, address: int, count: int) -> list[int]:
+        """Read holding registers (function code 3)."""
+        data = await self._request(
+            READ_HOLDING_REGISTERS, struct.pack(">HH", address, count)
+        )
+        if data[0] != 2 * count:
+            raise ModbusError("Unexpected byte count")
+        return list(struct.unpack(f">{count}H", data[1 : 1 + 2 * count]))
+
+    async def write_registers(self, address: int, values: list[int]) -> None:
+        """Write holding registers (function code 16)."""
+        count = len(values)
+        await self._request(
+            WRITE_MULTIPLE_REGISTERS,
+            struct.pack(f">HHB{count}H", address, count, 2 * count, *values),
+        )
+
+
+def _signed(value: int) -> int:
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class SunSpecLimit:
+    """Active power limit through WMaxLimPct of SunSpec model 123.
+
+    The limit is a percentage of WMax (model 121), so it caps the AC output
+    of the inverter, not the export at the grid connection point. Pct, its
+    timing registers and the enable flag are written with one request and
+    read back to confirm them. After a failure Modbus is skipped for
+    ``RECONNECT_DELAY`` seconds, the caller falls back to HTTP meanwhile.
+    """
+
+    def __init__(
+        self, host: str, port: int = MODBUS_PORT, unit_id: int = MODBUS_UNIT
+    ) -> None:
+        """Initialize the transport."""
+        self.client = ModbusTcpClient(host, port, unit_id)
+        self.models: dict[int, int] = {}
+        self.wmax: float | None = None
+        self._pct_sf = 0
+        # WMaxLimPct .. WMaxLim_Ena as last read
+        self._controls: list[int] = []
+        self._skip_until = 0.0
+        self.writes = 0
+        self.failures = 0
+        self.last_error: str | None = None
+
+    @property
+    def available(self) -> bool:
+        """False while Modbus is skipped after a failure."""
+        return time.monotonic() >= self._skip_until
+
+    def retry_in(self) -> float:
+        """Seconds until Modbus is tried again after a failure."""
+        return max(0.0, self._skip_until - time.monotonic())
+
+    async def close(self) -> None:
+        """Close the connection."""
+        await self.client.close()
+
+    async def _discover(self) -> None:
+        """Locate models 121 and 123 and read WMax and the scale factors."""
+        for base in SUNSPEC_BASES:
+            try:
+                marker = await self.client.read_registers(base, 2)
+            except ModbusError:
+                continue
+            if tuple(marker) == SUNSPEC_MARKER:
+                break
+        else:
+            raise ModbusError("No SunSpec map found")
+
+        models = {}
+        address = base + 2
+        for _ in range(MAX_MODELS):
+            model, length = await self.client.read_registers(address, 2)
+            if model == SUNSPEC_END:
+                break
+            models[model] = address
+            address += 2 + length
+        if MODEL_SETTINGS not in models or MODEL_CONTROLS not in models:
+            raise ModbusError("SunSpec models 121/123 not available")
+
+        settings = await self.client.read_registers(models[MODEL_SETTINGS], WMAX_SF + 1)
+        controls = await self.client.read_registers(
+            models[MODEL_CONTROLS], WMAXLIMPCT_SF + 1
+        )
+        self.wmax = settings[WMAX] * 10 ** _signed(settings[WMAX_SF])
+        self._pct_sf = _signed(controls[WMAXLIMPCT_SF])
+        self._controls = controls[WMAXLIMPCT : WMAXLIM_ENA + 1]
+        self.models = models
+        _LOGGER.debug(
+            "SunSpec models at %s, WMax %s W", sorted(models.items()), self.wmax
+        )
+
+    @property
+    def resolution(self) -> float:
+        """Smallest limit step in W."""
+        return self.wmax * 10**self._pct_sf / 100 if self.wmax else 0.0
+
+    def _to_raw(self, limit: int) -> int:
+        pct = min(100.0, max(0.0, limit * 100 / self.wmax))
+        return round(pct / 10**self._pct_sf)
+
+    def _to_watts(self, raw: int) -> int:
+        return round(raw * 10**self._pct_sf * self.wmax / 100)
+
+    async def async_write(self, limit: int | None) -> bool:
+        """Write a limit in W, None disables it. Return True once read back."""
+        if not self.available:
+            return False
+        try:
+            if not self.models:
+                await self._discover()
+            address = self.models[MODEL_CONTROLS] + WMAXLIMPCT
+            controls = list(self._controls)
+            if limit is None:
+                controls[-1] = 0
+            else:
+                controls[0] = self._to_raw(limit)
+                controls[-1] = 1
+            await self.client.write_registers(address, controls)
+            readback = await self.client.read_registers(address, len(controls))
+            if readback != controls:
+                raise ModbusError(f"Read back {readback} instead of {controls}")
+        except (OSError, TimeoutError, ModbusError, asyncio.IncompleteReadError) as e:
+            self._failed(e)
+            return False
+        self._controls = readback
+        self.writes += 1
+        return True
+
+    async def async_read(self) -> tuple[bool, int] | None:
+        """Return (enabled, limit in W) as reported, None if unreachable."""
+        if not self.available:
+            return None
+        try:
+            if not self.models:
+                await self._discover()
+            self._controls = await self.client.read_registers(
+                self.models[MODEL_CONTROLS] + WMAXLIMPCT,
+                WMAXLIM_ENA - WMAXLIMPCT + 1,
+            )
+        except (OSError, TimeoutError, ModbusError, asyncio.IncompleteReadError) as e:
+            self._failed(e)
+            return None
+        return bool(self._controls[-1]), self._to_watts(self._controls[0])
+
+    def _failed(self, error: Exception) -> None:
+        self.failures += 1
+        self.last_error = repr(error)
+        self._skip_until = time.monotonic() + RECONNECT_DELAY
+        # rediscover, the device behind the address may have changed
+        self.models = {}
+        _LOGGER.debug("Modbus limit failed, using HTTP for now: %r", error)
+
+    def as_dict(self) -> dict:
+        """Return the transport state for diagnostics."""
+        return {
+            "port": self.client.port,
+            "unit_id": self.client.unit_id,
+            "connected": self.client.connected,
+            "available": self.available,
+            "models": {str(model): address for model, address in self.models.items()},
+            "wmax": self.wmax,
+            "writes": self.writes,
+            "failures": self.failures,
+            "connects": self.client.connects,
+            "last_error": self.last_error,
+        }
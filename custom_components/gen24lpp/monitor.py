@@ -0,0 +1,185 @@
+"""Closed-loop readback of the feed-in via the inverter's realtime API."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .const import CONF_SIZE
+from .controller import LimitController
+from .lpp_a import FroniusGEN24
+from .metrics import LatencyHistogram
+
+if TYPE_CHECKING:
+    from .plant import Plant
+
+_LOGGER = logging.getLogger(__name__)
+
+# Poll fast while a new limit settles, slowly while it is steady
+FAST_INTERVAL = 1
+SLOW_INTERVAL = 30
+SETTLE_WINDOW = 60
+
+# Allowed overshoot, the larger of an absolute and a relative margin
+TOLERANCE_W = 50
+TOLERANCE_PERCENT = 1
+
+SETTLE_BUCKETS_MS = (1000, 2000, 5000, 10000, 20000, 30000, 60000)
+
+
+class FeedInMonitor:
+    """Verify that the inverter follows the acknowledged limit.
+
+    P_Grid is metered at the grid connection point. For a unit of a plant it
+    includes the other inverters, so the feed-in is checked against the
+    limit the whole plant acknowledged instead of the unit's share.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        fronius: FroniusGEN24,
+        controller: LimitController,
+        plant: Plant | None = None,
+    ) -> None:
+        """Initialize the monitor."""
+        self.hass = hass
+        self._entry = entry
+        self._fronius = fronius
+        self._controller = controller
+        self.plant = plant
+        self._listeners: list[Callable[[], None]] = []
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._unsub_controller: Callable[[], None] | None = None
+        self._applied_at: float | None = None
+        self._fast_until = 0.0
+
+        self.feed_in: float | None = None
+        self.compliant: bool | None = None
+        self.violations = 0
+        self.settling = False
+        self.settle_time: float | None = None
+        self.settle_histogram = LatencyHistogram(SETTLE_BUCKETS_MS)
+
+    @property
+    def effective_limit(self) -> int | None:
+        """Limit the inverter acknowledged, None while no limit is active."""
+        if not self._controller.applied_on:
+            return None
+        return self._controller.applied_limit
+
+    @property
+    def compliance_limit(self) -> int | None:
+        """Limit the feed-in at the grid connection point is checked against."""
+        if self.plant is not None:
+            return self.plant.applied_limit
+        return self.effective_limit
+
+    @property
+    def interval(self) -> float:
+        """Current poll interval in seconds."""
+        if self.settling or time.monotonic() < self._fast_until:
+            return FAST_INTERVAL
+        return SLOW_INTERVAL
+
+    @callback
+    def async_start(self) -> None:
+        """Start polling."""
+        self._unsub_controller = self._controller.async_add_listener(
+            self._handle_controller_update
+        )
+        self._task = self._entry.async_create_background_task(
+            self.hass,
+            self._async_run(),
+            f"gen24lpp feed-in monitor {self._entry.title}",
+        )
+
+    async def async_stop(self) -> None:
+        """Stop polling."""
+        if self._unsub_controller:
+            self._unsub_controller()
+            self._unsub_controller = None
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @callback
+    def async_add_listener(
+        self, update_callback: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Register a callback run after every reading."""
+        self._listeners.append(update_callback)
+
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _handle_controller_update(self) -> None:
+        """Switch to fast polling when a new limit was acknowledged."""
+        if self._controller.applied_at == self._applied_at:
+            return
+        self._applied_at = self._controller.applied_at
+        self._fast_until = time.monotonic() + SETTLE_WINDOW
+        self.settling = self.compliance_limit is not None
+        self._changed.set()
+
+    async def _async_run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.interval)
+            except TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                await self._async_read()
+            except Exception:  # noqa: BLE001
+                _LOGGER.exception("Reading feed-in failed")
+
+    async def _async_read(self) -> None:
+        if (site := await self._fronius.get_power_flow()) is None:
+            return
+        now = time.monotonic()
+        grid = site.get("P_Grid") or 0
+        self.feed_in = max(0.0, -float(grid))
+
+        if (limit := self.compliance_limit) is None:
+            self.compliant = None
+            self.settling = False
+        else:
+            size = (
+                self._entry.data[CONF_SIZE] if self.plant is None else self.plant.size
+            )
+            tolerance = max(TOLERANCE_W, size * TOLERANCE_PERCENT / 100)
+            self.compliant = self.feed_in <= limit + tolerance
+            if self.settling and self.compliant:
+                self.settling = False
+                self.settle_time = now - self._applied_at
+                self.settle_histogram.record(self.settle_time)
+            elif self.settling and now >= self._fast_until:
+                self.settling = False
+                self.violations += 1
+                _LOGGER.warning(
+                    "Feed-in %.0f W still above limit %s W after %s s",
+                    self.feed_in,
+                    limit,
+                    SETTLE_WINDOW,
+                )
+            elif not self.settling and not self.compliant:
+                self.violations += 1
+
+        for update_callback in list(self._listeners):
+            update_callback()
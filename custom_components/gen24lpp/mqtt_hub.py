@@ -0,0 +1,495 @@
+"""Shared MQTT connection for gen24lpp."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+from collections.abc import Callable
+import importlib
+import logging
+import secrets
+import threading
+import time
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+if TYPE_CHECKING:
+    import paho.mqtt.client as mqtt
+
+    from homeassistant.components import mqtt as ha_mqtt
+
+from .const import DOMAIN, MqttBroker, MqttPassword, MqttPort, MqttUser
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_HUBS = "mqtt_hubs"
+
+KEEPALIVE = 60
+# keep-alive bookkeeping of paho, see loop_misc()
+MISC_INTERVAL = 1
+RECONNECT_MIN = 1
+RECONNECT_MAX = 60
+DISCONNECT_TIMEOUT = 1
+
+MessageCallback = Callable[[str, bytes, float], None]
+
+
+class _TrieNode:
+    __slots__ = ("callbacks", "children")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.callbacks: list[MessageCallback] = []
+
+
+class TopicTrie:
+    """Map MQTT topic filters, including + and # wildcards, to callbacks."""
+
+    def __init__(self) -> None:
+        self._root = _TrieNode()
+
+    def add(self, topic_filter: str, message_callback: MessageCallback) -> bool:
+        """Add a callback, return True if the filter was not known before."""
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, _TrieNode())
+        node.callbacks.append(message_callback)
+        return len(node.callbacks) == 1
+
+    def remove(self, topic_filter: str, message_callback: MessageCallback) -> bool:
+        """Remove a callback, return True if the filter has no callbacks left."""
+        path = [self._root]
+        levels = topic_filter.split("/")
+        for level in levels:
+            if (node := path[-1].children.get(level)) is None:
+                return False
+            path.append(node)
+        path[-1].callbacks.remove(message_callback)
+        if path[-1].callbacks:
+            return False
+        # prune empty branches
+        for depth in range(len(levels), 0, -1):
+            if path[depth].callbacks or path[depth].children:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+        return True
+
+    def filters(self) -> list[str]:
+        """Return all topic filters with at least one callback."""
+        result: list[str] = []
+
+        def walk(node: _TrieNode, prefix: list[str]) -> None:
+            if node.callbacks:
+                result.append("/".join(prefix))
+            for level, child in node.children.items():
+                walk(child, [*prefix, level])
+
+        walk(self._root, [])
+        return result
+
+    def match(self, topic: str) -> list[MessageCallback]:
+        """Return the callbacks of all filters matching a topic."""
+        levels = topic.split("/")
+        result: list[MessageCallback] = []
+        # wildcards never match topics starting with $ on the first level
+        self._match(self._root, levels, 0, result, not topic.startswith("$"))
+        return result
+
+    def _match(
+        self,
+        node: _TrieNode,
+        levels: list[str],
+        index: int,
+        result: list[MessageCallback],
+        wildcards: bool = True,
+    ) -> None:
+        if wildcards and (multi := node.children.get("#")) is not None:
+            result.extend(multi.callbacks)
+        if index == len(levels):
+            result.extend(node.callbacks)
+            return
+        if (child := node.children.get(levels[index])) is not None:
+            self._match(child, levels, index + 1, result)
+        if wildcards and (single := node.children.get("+")) is not None:
+            self._match(single, levels, index + 1, result)
+
+
+class MqttHub(ABC):
+    """Topic routing shared by every entry talking to the same broker.
+
+    Messages are dispatched as callbacks on the event loop, never from a
+    foreign thread.
+    """
+
+    def __init__(self, hass: HomeAssistant, key: tuple) -> None:
+        """Initialize the hub."""
+        self.hass = hass
+        self.key = key
+        self.users = 0
+        self._trie = TopicTrie()
+        # set while the hub can receive messages
+        self.connected = asyncio.Event()
+
+    @callback
+    @abstractmethod
+    def async_start(self) -> None:
+        """Connect to the broker."""
+
+    @abstractmethod
+    async def async_stop(self) -> None:
+        """Disconnect from the broker."""
+
+    @callback
+    def async_subscribe(
+        self, topic: str, message_callback: MessageCallback
+    ) -> Callable[[], None]:
+        """Subscribe to a topic filter, return a function to unsubscribe."""
+        if not topic:
+            return lambda: None
+        if self._trie.add(topic, message_callback):
+            self._async_subscribe_filter(topic)
+
+        @callback
+        def unsubscribe() -> None:
+            if self._trie.remove(topic, message_callback):
+                self._async_unsubscribe_filter(topic)
+
+        return unsubscribe
+
+    @callback
+    @abstractmethod
+    def _async_subscribe_filter(self, topic: str) -> None:
+        """Subscribe a filter at the broker, called for its first callback."""
+
+    @callback
+    @abstractmethod
+    def _async_unsubscribe_filter(self, topic: str) -> None:
+        """Unsubscribe a filter at the broker, called after its last callback."""
+
+    @callback
+    def _async_dispatch(self, topic: str, payload: bytes, received: float) -> None:
+        for message_callback in self._trie.match(topic):
+            try:
+                message_callback(topic, payload, received)
+            except Exception:  # noqa: BLE001
+                _LOGGER.exception("Error handling MQTT message on %s", topic)
+
+
+class PahoMqttHub(MqttHub):
+    """Own connection to a broker, driven by the event loop.
+
+    paho runs without its network thread: the socket is registered with the
+    event loop (add_reader/add_writer) and keep-alive is handled by a timer,
+    so on_connect and on_message run on the loop. paho is imported and its
+    client (which opens a socket pair) created in the executor on the first
+    connect, so neither touches the loop during setup.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, host: str, port: int, user: str, password: str
+    ) -> None:
+        """Initialize the hub."""
+        super().__init__(hass, (host, port, user, password))
+        self._host = host
+        self._port = port
+        self._user = user
+        self._password = password
+        self._stopping = False
+        self._connect_task: asyncio.Task | None = None
+        self._misc_timer: asyncio.TimerHandle | None = None
+        self._fileno: int | None = None
+        self._socket_closed = asyncio.Event()
+        self._loop_thread = threading.get_ident()
+        self._client: mqtt.Client | None = None
+
+    def _create_client(self) -> mqtt.Client:
+        """Import paho and create the client, runs in the executor."""
+        import paho.mqtt.client as mqtt  # noqa: PLC0415
+
+        client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=f"gen24lpp_{secrets.token_hex(4)}",
+        )
+        if self._user:
+            client.username_pw_set(self._user, self._password)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        return client
+
+    @callback
+    def async_start(self) -> None:
+        """Connect in the background."""
+        self._async_schedule_connect(first=True)
+
+    async def async_stop(self) -> None:
+        """Disconnect and unregister the socket from the event loop."""
+        self._stopping = True
+        if self._connect_task:
+            self._connect_task.cancel()
+            self._connect_task = None
+        if self._fileno is not None:
+            self._socket_closed.clear()
+            # the writer flushes DISCONNECT, then paho closes the socket
+            self._client.disconnect()
+            try:
+                await asyncio.wait_for(self._socket_closed.wait(), DISCONNECT_TIMEOUT)
+            except TimeoutError:
+                _LOGGER.debug("MQTT broker %s did not take DISCONNECT", self._host)
+        self._async_close_socket()
+
+    @callback
+    def _async_schedule_connect(self, first: bool = False) -> None:
+        if self._stopping or self._connect_task:
+            return
+        self._connect_task = self.hass.async_create_background_task(
+            self._async_connect(first), f"gen24lpp mqtt connect {self._host}"
+        )
+
+    async def _async_connect(self, first: bool) -> None:
+        delay = RECONNECT_MIN
+        try:
+            while not self._stopping:
+                try:
+                    if self._client is None:
+                        self._client = await self.hass.async_add_executor_job(
+                            self._create_client
+                        )
+                    # the blocking TCP connect is the only step off the loop
+                    if first:
+                        await self.hass.async_add_executor_job(
+                            self._client.connect, self._host, self._port, KEEPALIVE
+                        )
+                    else:
+                        await self.hass.async_add_executor_job(self._client.reconnect)
+                    return
+                except OSError as err:
+                    _LOGGER.warning(
+                        "Cannot connect to MQTT broker %s:%s: %s, retrying in %s s",
+                        self._host,
+                        self._port,
+                        err,
+                        delay,
+                    )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+        finally:
+            self._connect_task = None
+
+    def _call_on_loop(self, func: Callable, *args) -> None:
+        """Run a socket callback on the event loop.
+
+        paho calls them on the loop, except while the executor job runs
+        connect() or reconnect().
+        """
+        if threading.get_ident() == self._loop_thread:
+            func(*args)
+        else:
+            self.hass.loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, client, userdata, sock) -> None:
+        self._call_on_loop(self._async_on_socket_open, sock)
+
+    @callback
+    def _async_on_socket_open(self, sock) -> None:
+        if (fileno := sock.fileno()) < 0:
+            return
+        # the socket object is closed by paho before we hear about it, so
+        # the loop is handed the plain descriptor
+        self._fileno = fileno
+        self.hass.loop.add_reader(fileno, self._async_read)
+        self._async_misc()
+
+    def _on_socket_close(self, client, userdata, sock) -> None:
+        self._call_on_loop(self._async_close_socket)
+
+    @callback
+    def _async_close_socket(self) -> None:
+        if self._misc_timer:
+            self._misc_timer.cancel()
+            self._misc_timer = None
+        if self._fileno is not None:
+            self.hass.loop.remove_reader(self._fileno)
+            self.hass.loop.remove_writer(self._fileno)
+            self._fileno = None
+        self._socket_closed.set()
+
+    def _on_socket_register_write(self, client, userdata, sock) -> None:
+        self._call_on_loop(self._async_register_write, sock)
+
+    @callback
+    def _async_register_write(self, sock) -> None:
+        if self._fileno is not None and sock.fileno() == self._fileno:
+            self.hass.loop.add_writer(self._fileno, self._client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock) -> None:
+        self._call_on_loop(self._async_unregister_write, sock)
+
+    @callback
+    def _async_unregister_write(self, sock) -> None:
+        if self._fileno is not None:
+            self.hass.loop.remove_writer(self._fileno)
+
+    @callback
+    def _async_read(self) -> None:
+        self._client.loop_read()
+
+    @callback
+    def _async_misc(self) -> None:
+        """Send keep-alive pings and detect a dead connection."""
+        self._client.loop_misc()
+        # a keep-alive timeout closes the socket within loop_misc
+        if self._fileno is not None:
+            self._misc_timer = self.hass.loop.call_later(
+                MISC_INTERVAL, self._async_misc
+            )
+
+    @callback
+    def _async_subscribe_filter(self, topic: str) -> None:
+        if self._client is not None and self._client.is_connected():
+            self._client.subscribe(topic)
+
+    @callback
+    def _async_unsubscribe_filter(self, topic: str) -> None:
+        if self._client is not None and self._client.is_connected():
+            self._client.unsubscribe(topic)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties) -> None:
+        if reason_code.is_failure:
+            _LOGGER.error("Failed to connect to MQTT broker: %s", reason_code)
+            return
+        _LOGGER.info("Connected to MQTT Broker %s:%s", self._host, self._port)
+        if filters := self._trie.filters():
+            self._client.subscribe([(topic, 0) for topic in filters])
+        self._call_on_loop(self.connected.set)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties) -> None:
+        self._call_on_loop(self.connected.clear)
+        if self._stopping:
+            return
+        _LOGGER.warning("Disconnected from MQTT broker %s: %s", self._host, reason_code)
+        self._call_on_loop(self._async_schedule_connect)
+
+    def _on_message(self, client, userdata, msg) -> None:
+        # runs inside loop_read, on the event loop
+        self._async_dispatch(msg.topic, msg.payload, time.monotonic())
+
+
+class HomeAssistantMqttHub(MqttHub):
+    """Subscriptions routed through Home Assistant's MQTT integration.
+
+    Used when no broker is configured for the entry.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the hub."""
+        super().__init__(hass, ("homeassistant",))
+        self._unsubscribers: dict[str, Callable[[], None]] = {}
+        self._start_task: asyncio.Task | None = None
+        self._mqtt: ModuleType | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Subscribe all filters once the MQTT integration is ready."""
+        self._start_task = self.hass.async_create_background_task(
+            self._async_start(), "gen24lpp mqtt integration"
+        )
+
+    async def _async_start(self) -> None:
+        # imported on first use, entries with their own broker never load it
+        ha_mqtt = await self.hass.async_add_import_executor_job(
+            importlib.import_module, "homeassistant.components.mqtt"
+        )
+        if not await ha_mqtt.async_wait_for_mqtt_client(self.hass):
+            _LOGGER.error("Home Assistant's MQTT integration is not available")
+            return
+        self._mqtt = ha_mqtt
+        for topic in self._trie.filters():
+            await self._async_subscribe(topic)
+        self.connected.set()
+
+    async def async_stop(self) -> None:
+        """Drop all subscriptions."""
+        if self._start_task:
+            self._start_task.cancel()
+            self._start_task = None
+        self._mqtt = None
+        self.connected.clear()
+        for unsubscribe in self._unsubscribers.values():
+            unsubscribe()
+        self._unsubscribers.clear()
+
+    @callback
+    def _async_subscribe_filter(self, topic: str) -> None:
+        if self._mqtt is not None:
+            self.hass.async_create_task(self._async_subscribe(topic))
+
+    async def _async_subscribe(self, topic: str) -> None:
+        if topic in self._unsubscribers:
+            return
+        unsubscribe = await self._mqtt.async_subscribe(
+            self.hass, topic, self._handle_message, encoding=None
+        )
+        if topic in self._trie.filters():
+            self._unsubscribers[topic] = unsubscribe
+        else:
+            # unsubscribed while the subscription was pending
+            unsubscribe()
+
+    @callback
+    def _async_unsubscribe_filter(self, topic: str) -> None:
+        if unsubscribe := self._unsubscribers.pop(topic, None):
+            unsubscribe()
+
+    @callback
+    def _handle_message(self, msg: ha_mqtt.ReceiveMessage) -> None:
+        self._async_dispatch(msg.topic, msg.payload, time.monotonic())
+
+
+@callback
+def async_get_mqtt_hub(hass: HomeAssistant, entry: ConfigEntry) -> MqttHub:
+    """Return the hub for the broker of an entry, starting it if needed."""
+    hubs: dict[tuple, MqttHub] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        DATA_HUBS, {}
+    )
+    if not entry.data.get(MqttBroker):
+        key: tuple = ("homeassistant",)
+    else:
+        # a changed password needs its own connection, like any other credential
+        key = (
+            entry.data[MqttBroker],
+            entry.data[MqttPort],
+            entry.data[MqttUser],
+            entry.data[MqttPassword],
+        )
+    if (hub := hubs.get(key)) is None:
+        if not entry.data.get(MqttBroker):
+            hub = HomeAssistantMqttHub(hass)
+        else:
+            hub = PahoMqttHub(
+                hass,
+                entry.data[MqttBroker],
+                entry.data[MqttPort],
+                entry.data[MqttUser],
+                entry.data[MqttPassword],
+            )
+        hubs[key] = hub
+        hub.async_start()
+    hub.users += 1
+    return hub
+
+
+async def async_release_mqtt_hub(hass: HomeAssistant, hub: MqttHub) -> None:
+    """Drop one user of a hub, disconnecting it when no entry uses it anymore."""
+    hub.users -= 1
+    if hub.users > 0:
+        return
+    hass.data[DOMAIN][DATA_HUBS].pop(hub.key, None)
+    await hub.async_stop()
@@ -0,0 +1,207 @@
+"""Plant mode: one allowed limit split across several inverters."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .const import ALLOWED_LIMIT, CONF_PLANT, CONF_SIZE, CONF_WEIGHT, DOMAIN
+from .controller import LimitController
+from .metrics import LatencyHistogram
+from .mqtt_hub import MqttHub
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_PLANTS = "plants"
+
+# Upper bound for one inverter to acknowledge its share of the plant limit,
+# on top of the time the deadband may hold the share back
+UNIT_TIMEOUT = 10
+
+
+class Plant:
+    """Several config entries behind one grid connection point.
+
+    Entries with the same plant name share one ALLOWED_LIMIT topic. The plant
+    limit is split proportionally to each unit's weight (its PV size unless a
+    weight is configured) and written to all units concurrently.
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        """Initialize the plant."""
+        self.hass = hass
+        self.name = name
+        self.limit: int | None = None
+        self.units: dict[str, tuple[ConfigEntry, LimitController]] = {}
+        self.latency = LatencyHistogram()
+        self.failed_units = 0
+        self._hubs: dict[str, MqttHub] = {}
+        self._owner: str | None = None
+        self._topic: str | None = None
+        self._unsubscribe: Callable[[], None] | None = None
+
+    @callback
+    def async_add_unit(
+        self, entry: ConfigEntry, controller: LimitController, mqtt: MqttHub
+    ) -> None:
+        """Add an inverter, subscribing the plant topic with the first one."""
+        self.units[entry.entry_id] = (entry, controller)
+        self._hubs[entry.entry_id] = mqtt
+        topic = entry.data[ALLOWED_LIMIT]
+        if self._unsubscribe is None:
+            self._async_subscribe(entry.entry_id, topic)
+        elif topic != self._topic:
+            _LOGGER.warning(
+                "Plant %s listens to %s, ignoring %s of %s",
+                self.name,
+                self._topic,
+                topic,
+                entry.title,
+            )
+        self._async_rebalance()
+
+    @callback
+    def async_remove_unit(self, entry: ConfigEntry) -> bool:
+        """Remove an inverter, return True if the plant is empty now."""
+        self.units.pop(entry.entry_id, None)
+        self._hubs.pop(entry.entry_id, None)
+        if entry.entry_id == self._owner and self._unsubscribe:
+            # the subscription lives on the MQTT hub of the leaving entry
+            self._unsubscribe()
+            self._unsubscribe = None
+            if self.units:
+                self._async_subscribe(next(iter(self.units)), self._topic)
+        if self.units:
+            self._async_rebalance()
+            return False
+        return True
+
+    @callback
+    def _async_subscribe(self, entry_id: str, topic: str) -> None:
+        self._owner = entry_id
+        self._topic = topic
+        self._unsubscribe = self._hubs[entry_id].async_subscribe(
+            topic, self._handle_message
+        )
+
+    @callback
+    def _async_rebalance(self) -> None:
+        """Redistribute the current plant limit after the units changed."""
+        if self.limit is None:
+            return
+        for entry, controller in self.units.values():
+            controller.async_set_limit(self.share(entry))
+
+    @property
+    def applied_limit(self) -> int | None:
+        """Sum of the acknowledged shares, None unless every unit is limited."""
+        controllers = [controller for _, controller in self.units.values()]
+        if not controllers or not all(
+            controller.applied_on and controller.applied_limit is not None
+            for controller in controllers
+        ):
+            return None
+        return sum(controller.applied_limit for controller in controllers)
+
+    @property
+    def size(self) -> int:
+        """PV size of all units in W."""
+        return sum(entry.data[CONF_SIZE] for entry, _ in self.units.values())
+
+    def share(self, entry: ConfigEntry) -> int:
+        """Return the part of the plant limit assigned to one inverter."""
+        total_weight = sum(_weight(unit) for unit, _ in self.units.values())
+        if not total_weight or self.limit is None:
+            return 0
+        # rounded down, so the sum never exceeds the plant limit
+        return int(self.limit * _weight(entry) // total_weight)
+
+    @callback
+    def _handle_message(self, topic: str, payload: bytes, received: float) -> None:
+        try:
+            limit = int(payload.decode())
+        except ValueError:
+            _LOGGER.warning("Ignoring invalid plant limit %s on %s", payload, topic)
+            return
+        for entry, _ in self.units.values():
+            entry.runtime_data.watchdog.feed(topic)
+        self.hass.async_create_task(self.async_apply(limit, received))
+
+    async def async_apply(self, limit: int, received: float | None = None) -> bool:
+        """Write the shares of a plant limit to all inverters concurrently."""
+        if received is None:
+            received = time.monotonic()
+        self.limit = limit
+        units = list(self.units.values())
+        results = await asyncio.gather(
+            *(
+                # answered once the share is written, not when it is held back
+                asyncio.wait_for(
+                    controller.async_apply_limit(self.share(entry), received),
+                    UNIT_TIMEOUT + controller.max_delay,
+                )
+                for entry, controller in units
+            ),
+            return_exceptions=True,
+        )
+        failed = [
+            entry.title
+            for (entry, _), result in zip(units, results)
+            if result is not True
+        ]
+        if failed:
+            self.failed_units += len(failed)
+            _LOGGER.warning(
+                "Plant %s: limit %s W not acknowledged by %s",
+                self.name,
+                limit,
+                ", ".join(failed),
+            )
+            return False
+        self.latency.record(time.monotonic() - received)
+        return True
+
+    def as_dict(self) -> dict:
+        """Return the plant state for attributes and diagnostics."""
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "units": len(self.units),
+            "failed_units": self.failed_units,
+            "time_to_apply": self.latency.as_dict(),
+        }
+
+
+def _weight(entry: ConfigEntry) -> float:
+    return entry.data.get(CONF_WEIGHT) or entry.data[CONF_SIZE]
+
+
+@callback
+def async_join_plant(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    controller: LimitController,
+    mqtt: MqttHub,
+) -> Plant | None:
+    """Add an entry to its plant, return None if it is not part of one."""
+    if not (name := entry.data.get(CONF_PLANT)):
+        return None
+    plants: dict[str, Plant] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        DATA_PLANTS, {}
+    )
+    if (plant := plants.get(name)) is None:
+        plant = plants[name] = Plant(hass, name)
+    plant.async_add_unit(entry, controller, mqtt)
+    return plant
+
+
+@callback
+def async_leave_plant(hass: HomeAssistant, entry: ConfigEntry, plant: Plant) -> None:
+    """Remove an entry from its plant, dropping the plant with the last unit."""
+    if plant.async_remove_unit(entry):
+        hass.data[DOMAIN][DATA_PLANTS].pop(plant.name, None)
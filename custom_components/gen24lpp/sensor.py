@@ -2,39 +2,164 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass
 import logging
-import random
-
-import paho.mqtt.client as mqtt
-
-
-from datetime import timedelta
+from typing import TYPE_CHECKING
 
 from homeassistant.components.number import NumberEntity, NumberEntityDescription
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    CONF_IP_ADDRESS,
-    CONF_PASSWORD,
-    CONF_USERNAME,
-    EntityCategory,
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfPower, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import (
-    ALLOWED_LIMIT,
-    CONF_SIZE,
-    MqttBroker,
-    MqttPassword,
-    MqttPort,
-    MqttUser,
-)
-from .lpp_a import FroniusGEN24
+from .const import ALLOWED_LIMIT, CONF_SIZE, SIGNAL_RECONFIGURED
+from .entity import ChangeOnlyEntity
+from .monitor import TOLERANCE_W, FeedInMonitor
+
+if TYPE_CHECKING:
+    from . import Gen24LppData
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=1)
+
+@dataclass(frozen=True, kw_only=True)
+class MonitorSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor fed by the feed-in monitor."""
+
+    value_fn: Callable[[FeedInMonitor], float | None]
+    attr_fn: Callable[[FeedInMonitor], dict] | None = None
+    # smaller changes of the value wait for the next heartbeat
+    significant_change: float = 0
+
+
+MONITOR_SENSORS: tuple[MonitorSensorEntityDescription, ...] = (
+    MonitorSensorEntityDescription(
+        key="feed_in",
+        name="Feed-in",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        value_fn=lambda monitor: monitor.feed_in,
+        significant_change=TOLERANCE_W,
+        attr_fn=lambda monitor: {
+            "compliant": monitor.compliant,
+            "violations": monitor.violations,
+            "poll_interval": monitor.interval,
+        },
+    ),
+    MonitorSensorEntityDescription(
+        key="effective_limit",
+        name="Effective limit",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        value_fn=lambda monitor: monitor.effective_limit,
+    ),
+    MonitorSensorEntityDescription(
+        key="settle_time",
+        name="Settle time",
+        device_class=SensorDeviceClass.DURATION,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=1,
+        value_fn=lambda monitor: monitor.settle_time,
+        attr_fn=lambda monitor: {"histogram": monitor.settle_histogram.as_dict()},
+    ),
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class DiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor fed by the request and pipeline metrics."""
+
+    value_fn: Callable[[Gen24LppData], float | None]
+    attr_fn: Callable[[Gen24LppData], dict] | None = None
+    # smaller changes of the value wait for the next heartbeat
+    significant_change: float = 0
+
+
+def _write_latency(data: Gen24LppData) -> float | None:
+    key = f"POST {data.fronius.powerlimit_path}"
+    if (histogram := data.metrics.endpoints.get(key)) is None:
+        return None
+    return histogram.percentile(90)
+
+
+DIAGNOSTIC_SENSORS: tuple[DiagnosticSensorEntityDescription, ...] = (
+    DiagnosticSensorEntityDescription(
+        key="write_latency",
+        name="Write latency p90",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        value_fn=_write_latency,
+        attr_fn=lambda data: {
+            "endpoints": {
+                key: histogram.as_dict()
+                for key, histogram in data.metrics.endpoints.items()
+            }
+        },
+    ),
+    DiagnosticSensorEntityDescription(
+        key="mqtt_apply_lag",
+        name="MQTT to inverter lag p90",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        value_fn=lambda data: data.controller.latency.percentile(90),
+        attr_fn=lambda data: {"histogram": data.controller.latency.as_dict()},
+    ),
+    DiagnosticSensorEntityDescription(
+        key="reauths",
+        name="Re-authentications",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda data: data.metrics.reauths,
+    ),
+    DiagnosticSensorEntityDescription(
+        key="nonce_reuse_ratio",
+        name="Nonce reuse ratio",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=PERCENTAGE,
+        suggested_display_precision=1,
+        value_fn=lambda data: data.metrics.nonce_reuse_ratio,
+        significant_change=1,
+    ),
+    DiagnosticSensorEntityDescription(
+        key="write_success_rate",
+        name="Write success rate",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=PERCENTAGE,
+        suggested_display_precision=0,
+        value_fn=lambda data: data.metrics.write_success_rate,
+        significant_change=1,
+        attr_fn=lambda data: {
+            "writes": data.controller.writes,
+            "writes_failed": data.controller.writes_failed,
+            "inverter_link": data.fronius.breaker.state,
+        },
+    ),
+    DiagnosticSensorEntityDescription(
+        key="queue_depth",
+        name="Queue depth",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda data: data.controller.queue_depth,
+        # 0 and 1 alternate with every command
+        significant_change=1,
+        attr_fn=lambda data: {
+            "mean": data.controller.queue_depths.mean(),
+            "max": data.controller.queue_depths.max(),
+            "http": data.fronius.scheduler.as_dict(),
+        },
+    ),
+)
 
 
 async def async_setup_entry(
@@ -59,11 +184,17 @@ async def async_setup_entry(
     )
 
     entities.append(sln)
+    entities.extend(
+        MonitorSensor(description, entry) for description in MONITOR_SENSORS
+    )
+    entities.extend(
+        DiagnosticSensor(description, entry) for description in DIAGNOSTIC_SENSORS
+    )
 
     async_add_entities(entities)
 
 
-class SoftLimitNumber(NumberEntity):
+class SoftLimitNumber(ChangeOnlyEntity, NumberEntity):
     """Number entity for soft limit control."""
 
     def __init__(
@@ -76,12 +207,9 @@ class SoftLimitNumber(NumberEntity):
         self._attr_unique_id = f"{entry.entry_id}_soft_limit"
         self._attr_has_entity_name = True
         self._entry = entry
+        self._controller = entry.runtime_data.controller
         self._attr_native_value = 0
-        self._size = entry.data[CONF_SIZE]
-        self._limit = 0
-        self._attr_should_poll = True
-
-        self.response = ""
+        self._attr_should_poll = False
 
         # Device info mirrors the number entity so both appear under the same device
         self._attr_device_info = DeviceInfo(
@@ -91,78 +219,174 @@ class SoftLimitNumber(NumberEntity):
             model="Gen24LPP",
         )
 
-        self._mqtt_broker = entry.data[MqttBroker]
-        self._mqtt_user = entry.data[MqttUser]
-        self._mqtt_password = entry.data[MqttPassword]
-        self._mqtt_port = entry.data[MqttPort]
-        self._mqtt_client = mqtt.Client()
-        self._mqtt_client.username_pw_set(self._mqtt_user, self._mqtt_password)
-        self._client_id = f"gen24lpp_{random.randint(0, 1000)}"
-        self._topic_value = entry.data[ALLOWED_LIMIT]
-        self._fronius = FroniusGEN24(
-            entry.data[CONF_IP_ADDRESS],
-            entry.data[CONF_USERNAME],
-            entry.data[CONF_PASSWORD],
-        )
-        self.lpp_on = self._fronius.lpp_on
+        self._unsubscribe_topic: Callable[[], None] | None = None
 
     @property
     def native_value(self) -> float | None:
         """Return the native value of the number entity."""
         return self._attr_native_value
 
-    def subscribe_mqtt(self) -> None:
-        """Subscribe to MQTT topics if needed."""
+    @callback
+    def _handle_message(self, topic: str, payload: bytes, received: float) -> None:
+        """Forward the allowed limit in W to the controller."""
+        try:
+            limit = int(payload.decode())
+        except ValueError:
+            _LOGGER.warning("Ignoring invalid limit %s on %s", payload, topic)
+            return
+        self._entry.runtime_data.watchdog.feed(topic)
+        self._controller.async_set_limit(limit, received)
 
-        def on_message(client, userdata, msg):
-            match msg.topic:
-                case str(x) if f"{self._topic_value}" in x:
-                    self._limit = int(msg.payload.decode())
+    async def async_set_native_value(self, value: float) -> None:
+        """Update the current value."""
+        self._attr_native_value = int(value * 100 / self._entry.data[CONF_SIZE])
+        self.async_write_if_changed()
+
+    @callback
+    def _handle_controller_update(self) -> None:
+        """Mirror the requested limit of the controller."""
+        self._attr_native_value = (
+            self._controller.limit * 100 / self._entry.data[CONF_SIZE]
+        )
+        self.async_write_if_changed()
+
+    @callback
+    def _async_subscribe(self) -> None:
+        """(Re)subscribe the limit topic on the entry's MQTT hub."""
+        self._async_unsubscribe()
+        if self._entry.runtime_data.plant is None:
+            # in plant mode the plant owns the limit topic and sets our share
+            self._unsubscribe_topic = self._entry.runtime_data.mqtt.async_subscribe(
+                self._entry.data[ALLOWED_LIMIT], self._handle_message
+            )
+
+    @callback
+    def _async_unsubscribe(self) -> None:
+        if self._unsubscribe_topic:
+            self._unsubscribe_topic()
+            self._unsubscribe_topic = None
 
-        self._mqtt_client.subscribe(f"{self._topic_value}")
+    async def async_added_to_hass(self) -> None:
+        """Handle entity which will be added."""
+        self._async_subscribe()
+        self.async_on_remove(self._async_unsubscribe)
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_RECONFIGURED.format(self._entry.entry_id),
+                self._async_subscribe,
+            )
+        )
+        self._attr_native_value = (
+            self._controller.limit * 100 / self._entry.data[CONF_SIZE]
+        )
+        self.async_on_remove(
+            self._controller.async_add_listener(self._handle_controller_update)
+        )
 
-        self._mqtt_client.on_message = on_message
 
-    async def async_set_native_value(self, value: float) -> None:
-        """Update the current value."""
-        self._attr_native_value = int(value * 100 / self._size)
-        self.async_write_ha_state()
+class MonitorSensor(ChangeOnlyEntity, SensorEntity):
+    """Sensor showing what the inverter actually does."""
 
-    async def async_update(self):
-        """Update value."""
+    entity_description: MonitorSensorEntityDescription
+    _unrecorded_attributes = frozenset({"poll_interval", "histogram"})
 
-        self.lpp_on["exportLimits"]["activePower"]["softLimit"]["powerLimit"] = (
-            self._limit
+    def __init__(
+        self,
+        description: MonitorSensorEntityDescription,
+        entry: ConfigEntry,
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._entry = entry
+        self._monitor = entry.runtime_data.monitor
+        self._significant_change = description.significant_change
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_has_entity_name = True
+        self._attr_should_poll = False
+        self._attr_device_info = DeviceInfo(
+            identifiers={(entry.domain, entry.entry_id)},
+            name=entry.title or "Gen24LPP device",
+            manufacturer="Gen24",
+            model="Gen24LPP",
         )
-        self._attr_native_value = self._limit * 100 / self._size
 
-        self.async_write_ha_state()
+    @property
+    def native_value(self) -> float | None:
+        """Return the current reading."""
+        return self.entity_description.value_fn(self._monitor)
+
+    def _significant_state(self) -> tuple:
+        """The reading, and whether the feed-in complies."""
+        return self.native_value, self._monitor.compliant
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return compliance details."""
+        if self.entity_description.attr_fn is None:
+            return None
+        return self.entity_description.attr_fn(self._monitor)
 
     async def async_added_to_hass(self) -> None:
         """Handle entity which will be added."""
+        self.async_on_remove(
+            self._monitor.async_add_listener(self.async_write_if_changed)
+        )
 
-        def on_connect(client, userdata, flags, rc):
-            if rc == 0:
-                self.subscribe_mqtt()
-                _LOGGER.info("Connected to MQTT Broker!")
-            else:
-                _LOGGER.error("Failed to connect, return code %d\n", rc)
 
-        try:
-            self._mqtt_client.connect(self._mqtt_broker, self._mqtt_port, 60)
-            self._mqtt_client.on_connect = on_connect
-            self._mqtt_client.loop_start()
-        except Exception as e:
-            _LOGGER.error("Connection attempt failed: %s", e)
+class DiagnosticSensor(ChangeOnlyEntity, SensorEntity):
+    """Sensor showing how fast and reliable the limit pipeline is."""
+
+    entity_description: DiagnosticSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _unrecorded_attributes = frozenset(
+        {"endpoints", "histogram", "writes", "writes_failed", "mean", "max", "http"}
+    )
+
+    def __init__(
+        self,
+        description: DiagnosticSensorEntityDescription,
+        entry: ConfigEntry,
+    ) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._entry = entry
+        self._significant_change = description.significant_change
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_has_entity_name = True
+        self._attr_should_poll = False
+        self._attr_device_info = DeviceInfo(
+            identifiers={(entry.domain, entry.entry_id)},
+            name=entry.title or "Gen24LPP device",
+            manufacturer="Gen24",
+            model="Gen24LPP",
+        )
 
-        limit = self._size
-        self.lpp_on["visualization"]["wattPeakReferenceValue"] = self._size
+    @property
+    def native_value(self) -> float | None:
+        """Return the current value."""
+        return self.entity_description.value_fn(self._entry.runtime_data)
 
-        self._attr_native_value = limit * 100 / self._size
-        self.async_write_ha_state()
+    def _significant_state(self) -> float | None:
+        """Return the value, the attributes wait for the heartbeat."""
+        return self.native_value
 
-    async def async_will_remove_from_hass(self) -> None:
-        """Handle entity which will be removed."""
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return the details behind the value."""
+        if self.entity_description.attr_fn is None:
+            return None
+        return self.entity_description.attr_fn(self._entry.runtime_data)
 
-        self._mqtt_client.loop_stop()
-        self._mqtt_client.disconnect()
+    async def async_added_to_hass(self) -> None:
+        """Update after every write and every readback."""
+        self.async_on_remove(
+            self._entry.runtime_data.controller.async_add_listener(
+                self.async_write_if_changed
+            )
+        )
+        self.async_on_remove(
+            self._entry.runtime_data.monitor.async_add_listener(
+                self.async_write_if_changed
+            )
+        )
@@ -102,8 +102,9 @@ async def async_setup_entry(
             hass=hass,
             native_value=str(entry.data[MqttPort]),
             mode=TextMode.TEXT,
-            # pattern=r"\\d+",
+            pattern=r"\d+",
             option=MqttPort,
+            number=True,
         )
     )
 
@@ -196,7 +197,7 @@ class ConfigTextEntity(TextEntity):
         )
 
     async def async_set_value(self, value: str) -> None:
-        """Update the value in ConfigEntry and reload integration."""
+        """Update the value in ConfigEntry, the running entry follows it."""
         self._attr_native_value = value
         self.async_write_ha_state()
 
@@ -206,7 +207,5 @@ class ConfigTextEntity(TextEntity):
             new_data[self.option] = int(self._attr_native_value)
         else:
             new_data[self.option] = self._attr_native_value
+        # The update listener applies only what changed, without a reload
         self.hass.config_entries.async_update_entry(self.entry, data=new_data)
-
-        # Reload integration
-        await self.hass.config_entries.async_reload(self.entry.entry_id)
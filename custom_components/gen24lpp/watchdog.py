@@ -0,0 +1,173 @@
+"""Failsafe watchdog for the MQTT limit source."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    CONF_FALLBACK_LIMIT,
+    CONF_WATCHDOG_TIMEOUT,
+    DEFAULT_FALLBACK_LIMIT,
+    DEFAULT_WATCHDOG_TIMEOUT,
+)
+from .controller import LimitController
+from .metrics import LatencyHistogram
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LimitWatchdog:
+    """Drive the inverter to a fallback limit when limit messages stop.
+
+    Every watched topic has a deadline on the monotonic loop clock. A message
+    only moves its deadline forward; the single timer is not touched. When the
+    timer fires it re-arms itself for the earliest deadline that has not
+    passed yet, so steady heartbeats cost one timer callback per timeout
+    instead of one cancel and reschedule per message. A topic whose deadline
+    passed trips the watchdog, the next message on it restores the limit
+    requested by the source.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, controller: LimitController
+    ) -> None:
+        """Initialize the watchdog."""
+        self.hass = hass
+        self._entry = entry
+        self._controller = controller
+        self._deadlines: dict[str, float] = {}
+        self._expired: set[str] = set()
+        self._timer: asyncio.TimerHandle | None = None
+
+        # monotonic time the watchdog tripped, None while the source is alive
+        self.tripped_at: float | None = None
+        self.trips = 0
+        self.last_trip: str | None = None
+        self.last_restore: str | None = None
+        # time from a missed deadline until the fallback was requested
+        self.detection_latency = LatencyHistogram()
+
+    @property
+    def timeout(self) -> float:
+        """Allowed silence of a topic in s, 0 disables the watchdog."""
+        return self._entry.data.get(CONF_WATCHDOG_TIMEOUT, DEFAULT_WATCHDOG_TIMEOUT)
+
+    @property
+    def fallback_limit(self) -> int:
+        """Limit in W written while the source is silent."""
+        return self._entry.data.get(CONF_FALLBACK_LIMIT, DEFAULT_FALLBACK_LIMIT)
+
+    @property
+    def tripped(self) -> bool:
+        """True while the fallback limit is active."""
+        return self.tripped_at is not None
+
+    @callback
+    def async_watch(self, topics: Iterable[str]) -> None:
+        """Watch a new set of topics, each starting with a full timeout."""
+        self._cancel_timer()
+        self._expired.clear()
+        if self.tripped:
+            self._async_restore()
+        if self.timeout <= 0:
+            self._deadlines = {}
+            return
+        deadline = self.hass.loop.time() + self.timeout
+        self._deadlines = {topic: deadline for topic in topics if topic}
+        self._arm()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop watching."""
+        self._cancel_timer()
+        self._deadlines = {}
+
+    @callback
+    def feed(self, topic: str) -> None:
+        """Record a message on a topic, called for every message."""
+        if topic not in self._deadlines:
+            return
+        self._deadlines[topic] = self.hass.loop.time() + self.timeout
+        if self._expired:
+            self._expired.discard(topic)
+            if not self._expired:
+                self._async_restore()
+        if self._timer is None:
+            self._arm()
+
+    @callback
+    def _cancel_timer(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    @callback
+    def _arm(self) -> None:
+        deadlines = [
+            deadline
+            for topic, deadline in self._deadlines.items()
+            if topic not in self._expired
+        ]
+        if deadlines:
+            self._timer = self.hass.loop.call_at(min(deadlines), self._async_check)
+
+    @callback
+    def _async_check(self) -> None:
+        """Trip on passed deadlines, re-arm for the remaining ones."""
+        self._timer = None
+        now = self.hass.loop.time()
+        for topic, deadline in self._deadlines.items():
+            if topic in self._expired or deadline > now:
+                continue
+            self._expired.add(topic)
+            self.detection_latency.record(now - deadline)
+            if not self.tripped:
+                self._async_trip(topic, now)
+        self._arm()
+
+    @callback
+    def _async_trip(self, topic: str, now: float) -> None:
+        self.tripped_at = now
+        self.trips += 1
+        self.last_trip = dt_util.utcnow().isoformat()
+        _LOGGER.warning(
+            "%s: no message on %s for %s s (detected %.1f ms late), falling back"
+            " to %s W",
+            self._entry.title,
+            topic,
+            self.timeout,
+            self.detection_latency.last,
+            self.fallback_limit,
+        )
+        self._controller.async_set_fallback(self.fallback_limit)
+
+    @callback
+    def _async_restore(self) -> None:
+        _LOGGER.info(
+            "%s: limit source is back after %.1f s, leaving the fallback limit",
+            self._entry.title,
+            self.hass.loop.time() - self.tripped_at,
+        )
+        self.tripped_at = None
+        self.last_restore = dt_util.utcnow().isoformat()
+        self._controller.async_set_fallback(None)
+
+    def as_dict(self) -> dict:
+        """Return the watchdog state for attributes and diagnostics."""
+        return {
+            "enabled": bool(self._deadlines),
+            "tripped": self.tripped,
+            "silent_topics": sorted(self._expired),
+            "timeout": self.timeout,
+            "fallback_limit": self.fallback_limit,
+            "trips": self.trips,
+            "last_trip": self.last_trip,
+            "last_restore": self.last_restore,
+            "detection_latency": self.detection_latency.as_dict(),
+        }
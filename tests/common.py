@@ -0,0 +1,95 @@
+"""Stand-ins for the tests that need Home Assistant.
+
+Only import this after ``pytest.importorskip("homeassistant")``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+import contextlib
+import json
+from pathlib import Path
+from typing import Any
+
+from custom_components.gen24lpp.const import CONF_MIN_INTERVAL, CONF_SIZE
+from custom_components.gen24lpp.controller import LimitController
+from custom_components.gen24lpp.lpp_a import CircuitBreaker, PowerLimitPayload
+from homeassistant.core import HomeAssistant
+
+
+class FakeInverter:
+    """FroniusGEN24 stand-in holding one powerLimits document."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """Start with the soft limit switched off."""
+        self.payload = PowerLimitPayload()
+        self.document: dict = json.loads(self.payload.off)
+        self.latency = latency
+        self.available = True
+        self.gets = 0
+        self.posts: list[dict] = []
+        self.breaker = CircuitBreaker()
+        self.last_status: int | None = None
+        self.last_round_trips = 0
+        self.last_error: str | None = None
+
+    @property
+    def soft_limit(self) -> dict:
+        """Return the soft limit of the held document."""
+        return self.document["exportLimits"]["activePower"]["softLimit"]
+
+    async def send_request(
+        self, path: str, method: str = "GET", payload: bytes | None = None, **kwargs
+    ) -> str | None:
+        """Answer a powerLimits GET or POST."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not self.available:
+            self.last_error = "unreachable"
+            return None
+        if method == "GET":
+            self.gets += 1
+            return json.dumps(self.document)
+        self.document = json.loads(payload)
+        self.posts.append(self.document)
+        self.last_status = 200
+        self.last_round_trips = 1
+        return json.dumps({"writeSuccess": ["exportLimits"]})
+
+
+class FakeEntry:
+    """Config entry stand-in, independent of the ConfigEntry signature."""
+
+    def __init__(self, **data: Any) -> None:
+        """Initialize the entry, writes are not rate limited by default."""
+        self.entry_id = "test"
+        self.title = "Test"
+        self.data = {CONF_SIZE: 10000, CONF_MIN_INTERVAL: 0, **data}
+
+    def async_create_background_task(
+        self, hass: HomeAssistant, target, name: str
+    ) -> asyncio.Task:
+        """Run a task for the lifetime of the entry."""
+        return hass.async_create_background_task(target, name)
+
+
+async def settle(seconds: float = 0.05) -> None:
+    """Give the worker time to pick up and write pending commands."""
+    await asyncio.sleep(seconds)
+
+
+@contextlib.asynccontextmanager
+async def running_controller(
+    config_dir: Path, inverter: FakeInverter, **data: Any
+) -> AsyncIterator[LimitController]:
+    """Run a controller against a fake inverter, after its first read-back."""
+    hass = HomeAssistant(str(config_dir))
+    controller = LimitController(hass, FakeEntry(**data), inverter)
+    controller.async_start()
+    try:
+        await settle()
+        yield controller
+    finally:
+        await controller.async_stop()
+        await hass.async_stop(force=True)
@@ -0,0 +1,200 @@
+"""Tests for the compliance log."""
+
+from __future__ import annotations
+
+import csv
+import io
+from pathlib import Path
+
+import pytest
+
+from . import load_component_module
+
+compliance_log = load_component_module("compliance_log")
+
+START = 1_767_225_600.0  # 2026-01-01T00:00:00Z
+
+
+def record(completed: float, limit: int = 4000, **kwargs):
+    """Return an acknowledged HTTP write completed at the given time."""
+    fields = {
+        "received": completed - 0.05,
+        "completed": completed,
+        "limit": limit,
+        "status": 200,
+        "enabled": True,
+        "round_trips": 1,
+        "flags": compliance_log.FLAG_ACKNOWLEDGED,
+    }
+    fields.update(kwargs)
+    return compliance_log.ComplianceRecord(**fields)
+
+
+def segments(directory: Path) -> list[Path]:
+    """Return the segment files, oldest first."""
+    return sorted(directory.glob(f"*{compliance_log.SEGMENT_SUFFIX}"))
+
+
+def test_record_format(tmp_path: Path) -> None:
+    """Segments are a 16 byte header followed by 32 byte records."""
+    assert compliance_log.HEADER.size == 16
+    assert compliance_log.RECORD.size == 32
+
+    log = compliance_log.ComplianceLog(tmp_path)
+    log.append(record(START, limit=-1, status=0, enabled=False, round_trips=300))
+    log.close()
+    (path,) = segments(tmp_path)
+    assert path.name == f"{int(START * 1000):015d}.g24c"
+    data = path.read_bytes()
+    assert len(data) == 48
+    assert compliance_log.HEADER.unpack_from(data) == (b"G24C", 1, 32)
+    assert compliance_log.RECORD.unpack_from(data, 16) == (
+        START - 0.05,
+        START,
+        -1,
+        0,
+        False,
+        255,
+        compliance_log.FLAG_ACKNOWLEDGED,
+    )
+
+
+def test_query_range(tmp_path: Path) -> None:
+    """Queries return the records completed within [start, end)."""
+    log = compliance_log.ComplianceLog(tmp_path)
+    for index in range(100):
+        log.append(record(START + index, limit=index))
+    assert log.pending == 100
+
+    assert [r.limit for r in log.query(START + 10, START + 20)] == list(range(10, 20))
+    assert log.pending == 0
+    assert [r.limit for r in log.query(START + 9.5, START + 10.5)] == [10]
+    assert [r.limit for r in log.query(end=START + 3)] == [0, 1, 2]
+    assert [r.limit for r in log.query(START + 97)] == [97, 98, 99]
+    assert list(log.query(START + 100)) == []
+    assert list(log.query(START - 10, START)) == []
+    assert len(list(log.query())) == 100
+    log.close()
+
+
+def test_clock_stepping_back_is_clamped(tmp_path: Path) -> None:
+    """Records stay sorted by completion time, so the bisect stays valid."""
+    log = compliance_log.ComplianceLog(tmp_path)
+    log.append(record(START + 10, limit=1))
+    log.append(record(START + 5, limit=2))
+    log.append(record(START + 11, limit=3))
+    completed = [(r.limit, r.completed) for r in log.query()]
+    assert completed == [(1, START + 10), (2, START + 10), (3, START + 11)]
+    assert [r.limit for r in log.query(START + 10, START + 11)] == [1, 2]
+    log.close()
+
+
+def test_segment_rotation(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Full segments are closed, queries span them and skip older ones."""
+    per_segment = 10
+    monkeypatch.setattr(
+        compliance_log,
+        "MAX_SEGMENT_BYTES",
+        compliance_log.HEADER.size + per_segment * compliance_log.RECORD.size,
+    )
+    log = compliance_log.ComplianceLog(tmp_path)
+    for index in range(25):
+        log.append(record(START + index, limit=index))
+        if index % 7 == 0:
+            log.flush()
+    log.close()
+
+    paths = segments(tmp_path)
+    assert [path.stat().st_size for path in paths] == [336, 336, 176]
+    assert paths[1].name == f"{int((START + 10) * 1000):015d}.g24c"
+    assert [r.limit for r in log.query()] == list(range(25))
+    assert [r.limit for r in log.query(START + 8, START + 12)] == [8, 9, 10, 11]
+    assert [r.limit for r in log.query(START + 22)] == [22, 23, 24]
+
+    reopened = compliance_log.ComplianceLog(tmp_path)
+    reopened.append(record(START + 25, limit=25))
+    reopened.close()
+    assert len(segments(tmp_path)) == 3
+    assert [r.limit for r in reopened.query(START + 24)] == [24, 25]
+
+
+def test_reopen_drops_partial_record(tmp_path: Path) -> None:
+    """A record cut short by a crash is dropped before appending."""
+    log = compliance_log.ComplianceLog(tmp_path)
+    log.append(record(START, limit=1))
+    log.append(record(START + 1, limit=2))
+    log.close()
+    (path,) = segments(tmp_path)
+    with path.open("r+b") as file:
+        file.truncate(16 + 32 + 20)
+
+    reopened = compliance_log.ComplianceLog(tmp_path)
+    reopened.append(record(START + 2, limit=3))
+    reopened.close()
+    assert path.stat().st_size == 16 + 2 * 32
+    assert [r.limit for r in reopened.query()] == [1, 3]
+
+
+def test_failed_flush_keeps_records(tmp_path: Path) -> None:
+    """Records that did not reach the disk are written with the next flush."""
+    blocker = tmp_path / "log"
+    blocker.write_text("not a directory")
+    log = compliance_log.ComplianceLog(blocker)
+    log.append(record(START, limit=1))
+    log.flush()
+    assert log.last_error is not None
+    assert log.pending == 1
+
+    blocker.unlink()
+    log.append(record(START + 1, limit=2))
+    log.flush()
+    assert log.pending == 0
+    assert log.flushed == 2
+    assert [r.limit for r in log.query()] == [1, 2]
+    log.close()
+
+
+def test_export_csv(tmp_path: Path) -> None:
+    """The CSV has one row per record with readable times and flags."""
+    log = compliance_log.ComplianceLog(tmp_path)
+    log.append(record(START, limit=4000))
+    log.append(
+        record(
+            START + 60,
+            limit=2000,
+            status=0,
+            round_trips=0,
+            flags=compliance_log.FLAG_ACKNOWLEDGED | compliance_log.FLAG_MODBUS,
+        )
+    )
+    log.append(
+        record(
+            START + 120,
+            limit=0,
+            status=503,
+            enabled=False,
+            round_trips=3,
+            flags=compliance_log.FLAG_FALLBACK,
+        )
+    )
+    output = io.StringIO()
+    assert log.export_csv(output, START, START + 3600) == 3
+    log.close()
+
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert list(rows[0]) == list(compliance_log.CSV_FIELDS)
+    assert rows[0] == {
+        "received": "2025-12-31T23:59:59.950+00:00",
+        "completed": "2026-01-01T00:00:00.000+00:00",
+        "acknowledged": "1",
+        "enabled": "1",
+        "limit_w": "4000",
+        "transport": "http",
+        "fallback": "0",
+        "http_status": "200",
+        "round_trips": "1",
+        "apply_ms": "50.0",
+    }
+    assert (rows[1]["transport"], rows[1]["http_status"]) == ("modbus", "")
+    assert (rows[2]["acknowledged"], rows[2]["enabled"]) == ("0", "0")
+    assert (rows[2]["transport"], rows[2]["fallback"]) == ("http", "1")
@@ -0,0 +1,238 @@
+"""Tests for the limit controller against a fake inverter."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from .common import FakeInverter, running_controller, settle  # noqa: E402
+
+
+def test_refresh_repairs_drift(tmp_path: Path) -> None:
+    """A limit changed on the inverter is written back once."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(tmp_path, inverter) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(4000)
+            assert len(inverter.posts) == 1
+
+            inverter.soft_limit["powerLimit"] = 9000
+            await controller._async_refresh()
+            await settle()
+            assert len(inverter.posts) == 2
+            assert inverter.soft_limit == {"enabled": True, "powerLimit": 4000}
+            assert controller.applied_limit == 4000
+            assert controller.writes == 2
+
+    asyncio.run(run())
+
+
+def test_refresh_matching_read_back(tmp_path: Path) -> None:
+    """A read-back equal to the acknowledged write causes no write."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(tmp_path, inverter) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(4000)
+
+            # keys the payload does not set are ignored by the comparison
+            inverter.document["exportLimits"]["activePower"]["extra"] = 1
+            inverter.document["visualization"]["exportLimits"]["activePower"] = {
+                "shown": True
+            }
+            gets = inverter.gets
+            await controller._async_refresh()
+            await settle()
+            assert inverter.gets == gets + 1
+            assert len(inverter.posts) == 1
+            assert controller.writes_skipped == 0
+
+    asyncio.run(run())
+
+
+def test_refresh_drift_written_once(tmp_path: Path) -> None:
+    """Drift in HTTP-only mode costs exactly one corrective write."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(tmp_path, inverter) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(4000)
+
+            inverter.soft_limit["enabled"] = False
+            for _ in range(3):
+                await controller._async_refresh()
+                await settle()
+            assert len(inverter.posts) == 2
+            assert inverter.soft_limit == {"enabled": True, "powerLimit": 4000}
+            assert controller.applied_on
+
+    asyncio.run(run())
+
+
+def test_refresh_unreachable(tmp_path: Path) -> None:
+    """A failed read-back leaves the acknowledged state alone."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(tmp_path, inverter) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(4000)
+            acked = controller._acked_digest
+
+            inverter.available = False
+            await controller._async_refresh()
+            await settle()
+            assert controller._acked_digest == acked
+            assert controller.applied_limit == 4000
+            assert len(inverter.posts) == 1
+
+    asyncio.run(run())
+
+
+def test_coalescing(tmp_path: Path) -> None:
+    """Commands arriving during a write are merged into one more write."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(tmp_path, inverter) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(5000)
+            suppressed = controller.writes_suppressed
+            inverter.latency = 0.1
+
+            first = asyncio.create_task(controller.async_apply_limit(4000))
+            await settle(0.02)
+            for limit in (3000, 2000, 1000):
+                controller.async_set_limit(limit)
+            assert await first
+            await settle(0.3)
+            assert [
+                post["exportLimits"]["activePower"]["softLimit"]["powerLimit"]
+                for post in inverter.posts
+            ] == [5000, 4000, 1000]
+            assert controller.writes_suppressed == suppressed + 2
+            assert controller.applied_limit == 1000
+
+    asyncio.run(run())
+
+
+def test_min_interval(tmp_path: Path) -> None:
+    """Only raising the limit waits for the minimum write interval."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(
+            tmp_path, inverter, min_write_interval=1.0
+        ) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(5000)
+            # lowering and switching are written right away
+            assert await asyncio.wait_for(controller.async_apply_limit(3000), 0.5)
+            controller.async_set_enabled(False)
+            await settle()
+            assert not inverter.soft_limit["enabled"]
+            controller.async_set_enabled(True)
+            await settle()
+            assert inverter.soft_limit == {"enabled": True, "powerLimit": 3000}
+            posts = len(inverter.posts)
+
+            raised = asyncio.create_task(controller.async_apply_limit(8000))
+            await settle(0.3)
+            assert len(inverter.posts) == posts
+            # a lower limit arriving meanwhile ends the wait
+            controller.async_set_limit(2000)
+            assert await asyncio.wait_for(raised, 0.5)
+            assert len(inverter.posts) == posts + 1
+            assert inverter.soft_limit["powerLimit"] == 2000
+
+            raised = asyncio.create_task(controller.async_apply_limit(8000))
+            await settle(0.5)
+            assert not raised.done()
+            assert await asyncio.wait_for(raised, 1.0)
+            assert inverter.soft_limit["powerLimit"] == 8000
+
+    asyncio.run(run())
+
+
+def test_deadband_waits_for_the_write(tmp_path: Path) -> None:
+    """A raise within the deadband is answered once it is written."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(
+            tmp_path, inverter, deadband_w=500, max_write_delay=0.3
+        ) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(4000)
+            suppressed = controller.writes_suppressed
+
+            raised = asyncio.create_task(controller.async_apply_limit(4200))
+            await settle(0.1)
+            assert not raised.done()
+            assert len(inverter.posts) == 1
+            assert controller.writes_suppressed == suppressed
+
+            # replaces the held back change, counted once
+            controller.async_set_limit(4300)
+            await settle(0.1)
+            assert controller.writes_suppressed == suppressed + 1
+            assert not raised.done()
+
+            assert await asyncio.wait_for(raised, 0.5)
+            assert len(inverter.posts) == 2
+            assert inverter.soft_limit["powerLimit"] == 4300
+            assert controller.applied_limit == 4300
+            assert controller.writes_suppressed == suppressed + 1
+
+            # beyond the deadband the raise is written right away
+            assert await asyncio.wait_for(controller.async_apply_limit(5000), 0.2)
+            assert len(inverter.posts) == 3
+
+    asyncio.run(run())
+
+
+def test_deadband_flush_timing(tmp_path: Path) -> None:
+    """The held back change is written max_write_delay after the first one."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(
+            tmp_path, inverter, deadband_w=500, max_write_delay=0.3
+        ) as controller:
+            controller.async_set_enabled(True)
+            assert await controller.async_apply_limit(4000)
+            for limit in (4100, 4200, 4300):
+                controller.async_set_limit(limit)
+                await settle(0.08)
+            assert len(inverter.posts) == 1
+            await settle(0.15)
+            assert len(inverter.posts) == 2
+            assert inverter.soft_limit["powerLimit"] == 4300
+
+    asyncio.run(run())
+
+
+def test_write_outcomes(tmp_path: Path) -> None:
+    """Every HTTP limit write reports one outcome."""
+
+    async def run():
+        inverter = FakeInverter()
+        async with running_controller(tmp_path, inverter) as controller:
+            outcomes: list[bool] = []
+            controller.on_write = outcomes.append
+            controller.async_set_enabled(True)
+            inverter.available = False
+            assert not await controller.async_apply_limit(4000)
+            inverter.available = True
+            assert await controller.async_apply_limit(3000)
+            assert outcomes == [False, True]
+
+    asyncio.run(run())
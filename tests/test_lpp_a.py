@@ -0,0 +1,208 @@
+"""Tests for the digest auth and the powerLimits payload of the HTTP client."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+from pathlib import Path
+import sys
+
+import pytest
+
+from . import load_component_module
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools"))
+
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+
+lpp_a = load_component_module("lpp_a")
+
+
+def run_against_simulator(scenario, config: SimulatorConfig | None = None):
+    """Run scenario(simulator, fronius) against a local GEN24 simulator."""
+
+    async def run():
+        simulator, runner, host = await start_simulator(config)
+        fronius = lpp_a.FroniusGEN24(host, "Technician", "secret")
+        try:
+            return await scenario(simulator, fronius)
+        finally:
+            await fronius.close()
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+async def write(fronius, limit: int = 4000) -> str | None:
+    """Write a soft limit, return the response text."""
+    return await fronius.send_request(
+        fronius.powerlimit_path,
+        method="POST",
+        payload=fronius.payload.on(limit, 10000),
+        headers=dict(lpp_a.JSON_HEADERS),
+    )
+
+
+def test_parse_challenge() -> None:
+    """Quoted values may contain commas, qop picks auth out of a list."""
+    fronius = lpp_a.FroniusGEN24("host", "user", "secret")
+    fronius.nc = 7
+    fronius._parse_challenge(
+        {
+            "X-WWW-Authenticate": 'Digest realm="Webinterface, area", '
+            'nonce="abc123", qop="auth-int,auth", opaque=xyz, algorithm=SHA-256'
+        }
+    )
+    assert fronius.realm == "Webinterface, area"
+    assert fronius.nonce == "abc123"
+    assert fronius.qop == "auth"
+    assert fronius.opaque == "xyz"
+    assert fronius.algorithm == "SHA-256"
+    assert fronius.nc == 0
+
+
+def test_parse_challenge_without_qop() -> None:
+    """A challenge without qop falls back to RFC 2069 and MD5."""
+    fronius = lpp_a.FroniusGEN24("host", "user", "secret")
+    fronius._parse_challenge(
+        {"WWW-Authenticate": 'digest realm="r", nonce="n", stale=TRUE'}
+    )
+    assert (fronius.realm, fronius.nonce) == ("r", "n")
+    assert fronius.qop is None
+    assert fronius.opaque is None
+    assert fronius.algorithm == "MD5"
+    assert "qop=" not in fronius._build_auth_header("GET", "/api/")
+
+
+@pytest.mark.parametrize(
+    "headers", [{}, {"WWW-Authenticate": 'Basic realm="r"'}], ids=["none", "basic"]
+)
+def test_parse_challenge_rejects(headers: dict) -> None:
+    """Only digest challenges are accepted."""
+    fronius = lpp_a.FroniusGEN24("host", "user", "secret")
+    with pytest.raises(Exception, match="WWW-Authenticate"):
+        fronius._parse_challenge(headers)
+
+
+def test_auth_header_counts_nonce_uses() -> None:
+    """Every header built from the same nonce carries the next nc."""
+    fronius = lpp_a.FroniusGEN24("host", "user", "secret")
+    fronius._parse_challenge(
+        {"WWW-Authenticate": 'Digest realm="r", nonce="n", qop=auth'}
+    )
+    assert "nc=00000001" in fronius._build_auth_header("POST", "/api/")
+    assert "nc=00000002" in fronius._build_auth_header("POST", "/api/")
+
+
+@pytest.mark.parametrize("algorithm", ["MD5", "SHA-256"])
+def test_nonce_reuse(algorithm: str) -> None:
+    """Only the first request takes the 401 round trip."""
+
+    async def scenario(simulator, fronius):
+        for limit in (4000, 3000, 2000):
+            assert await write(fronius, limit) is not None
+        assert fronius.round_trips == {2: 1, 1: 2}
+        assert fronius.last_round_trips == 1
+        assert fronius.last_status == 200
+        assert fronius.nc == 3
+        assert simulator.stats.challenges == 1
+        assert simulator.stats.requests == 4
+        limits = simulator.power_limits["exportLimits"]["activePower"]["softLimit"]
+        assert limits["powerLimit"] == 2000
+
+    run_against_simulator(scenario, SimulatorConfig(algorithm=algorithm))
+
+
+def test_stale_nonce() -> None:
+    """An expired nonce costs one extra round trip, not a new login."""
+
+    async def scenario(simulator, fronius):
+        for _ in range(3):
+            assert await write(fronius) is not None
+        assert simulator.stats.stale == 1
+        assert fronius.round_trips == {2: 2, 1: 1}
+        assert fronius.last_round_trips == 2
+
+    run_against_simulator(scenario, SimulatorConfig(nonce_max_uses=2))
+
+
+def test_wrong_password() -> None:
+    """Rejected credentials fail the write without retries."""
+
+    async def scenario(simulator, fronius):
+        fronius.password = "wrong"
+        assert await write(fronius) is None
+        assert fronius.last_status == 401
+        assert fronius.last_round_trips == 2
+        assert fronius.retries == 0
+        assert fronius.breaker.state == lpp_a.BREAKER_CLOSED
+
+    run_against_simulator(scenario)
+
+
+def test_reads_do_not_touch_write_status() -> None:
+    """A GET between writes leaves the status of the last write alone."""
+
+    async def scenario(simulator, fronius):
+        assert await write(fronius) is not None
+        assert await fronius.send_request(fronius.powerlimit_path) is not None
+        assert fronius.last_round_trips == 2
+        assert fronius.round_trips == {2: 1}
+
+    run_against_simulator(scenario)
+
+
+def test_payload_on() -> None:
+    """The pre-encoded document carries the values and is canonical JSON."""
+    payload = lpp_a.PowerLimitPayload()
+    encoded = payload.on(4200, 11500)
+    document = json.loads(encoded)
+    soft_limit = document["exportLimits"]["activePower"]["softLimit"]
+    assert soft_limit == {"enabled": True, "powerLimit": 4200}
+    assert document["visualization"]["wattPeakReferenceValue"] == 11500
+    assert lpp_a.canonical_json(document) == encoded
+
+    expected = copy.deepcopy(lpp_a.LPP_ON)
+    expected["exportLimits"]["activePower"]["softLimit"]["powerLimit"] = 4200
+    expected["visualization"]["wattPeakReferenceValue"] = 11500
+    assert document == expected
+
+    disabled = json.loads(payload.on(4200, 11500, enabled=False))
+    assert disabled["exportLimits"]["activePower"]["softLimit"]["enabled"] is False
+
+
+def test_payload_off() -> None:
+    """The off document is the canonical encoding of LPP_OFF."""
+    assert lpp_a.PowerLimitPayload().off == lpp_a.canonical_json(lpp_a.LPP_OFF)
+
+
+def test_payload_leaves_templates_alone() -> None:
+    """Building payloads never changes the module templates."""
+    before = copy.deepcopy(lpp_a.LPP_ON)
+    payload = lpp_a.PowerLimitPayload()
+    payload.on(1234, 5678)
+    assert before == lpp_a.LPP_ON
+
+
+def test_payload_digest() -> None:
+    """The idempotency digest depends only on the written values.
+
+    A document read back from the inverter and encoded canonically hashes
+    like the payload that wrote it, whatever the key order.
+    """
+    first = lpp_a.PowerLimitPayload()
+    second = lpp_a.PowerLimitPayload()
+
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    assert digest(first.on(4000, 10000)) == digest(second.on(4000, 10000))
+    assert digest(first.on(4000, 10000)) != digest(first.on(4001, 10000))
+    assert digest(first.on(4000, 10000)) != digest(first.on(4000, 10001))
+    assert digest(first.on(4000, 10000)) != digest(first.off)
+
+    read_back = json.dumps(json.loads(first.on(4000, 10000)), indent=2, sort_keys=False)
+    reordered = dict(reversed(json.loads(read_back).items()))
+    assert digest(lpp_a.canonical_json(reordered)) == digest(first.on(4000, 10000))
@@ -0,0 +1,39 @@
+"""Tests for the runtime metrics."""
+
+from __future__ import annotations
+
+from . import load_component_module
+
+metrics = load_component_module("metrics")
+
+
+def test_write_success_rate_counts_writes() -> None:
+    """Retried HTTP attempts do not count as separate limit writes."""
+    request_metrics = metrics.RequestMetrics()
+    path = "/api/config/limit_settings/powerLimits"
+    # one write, acknowledged at the third attempt
+    for ok in (False, False, True):
+        request_metrics.record_request("POST", path, 0.05, 1, True, ok)
+    assert request_metrics.write_success_rate is None
+    request_metrics.record_write(True)
+    assert request_metrics.write_success_rate == 100
+
+    request_metrics.record_write(False)
+    assert request_metrics.write_success_rate == 50
+    assert request_metrics.requests == 3
+
+
+def test_auth_counters() -> None:
+    """Re-authentications and nonce reuse are counted for the web API only."""
+    request_metrics = metrics.RequestMetrics()
+    request_metrics.record_request("GET", "/api/commands/Login", 0.1, 2, False, True)
+    request_metrics.record_request("GET", "/api/status", 0.1, 1, True, True)
+    request_metrics.record_request("GET", "/solar_api/v1/x.fcgi", 0.1, 1, False, True)
+    assert request_metrics.authenticated == 2
+    assert request_metrics.reauths == 1
+    assert request_metrics.nonce_reuse_ratio == 50
+    assert set(request_metrics.as_dict()["endpoints"]) == {
+        "GET /api/commands/Login",
+        "GET /api/status",
+        "GET /solar_api/v1/x.fcgi",
+    }
@@ -0,0 +1,160 @@
+"""Tests for the feed-in readback."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.gen24lpp import monitor as monitor_module  # noqa: E402
+from custom_components.gen24lpp.const import CONF_SIZE  # noqa: E402
+from custom_components.gen24lpp.plant import Plant  # noqa: E402
+
+SIZE = 10000
+
+
+class FakeClock:
+    """Stand-in for the time module of the monitor."""
+
+    def __init__(self) -> None:
+        """Start at an arbitrary point."""
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        """Return the current fake time."""
+        return self.now
+
+
+class FakeSolarApi:
+    """FroniusGEN24 stand-in reporting a fixed feed-in."""
+
+    def __init__(self) -> None:
+        """Start without feed-in."""
+        self.feed_in = 0.0
+
+    async def get_power_flow(self) -> dict:
+        """Return the site data, P_Grid is negative while feeding in."""
+        return {"P_Grid": -self.feed_in}
+
+
+def unit(limit: int | None, size: int = SIZE) -> SimpleNamespace:
+    """Return an entry and a controller with an acknowledged limit."""
+    controller = SimpleNamespace(
+        applied_on=limit is not None,
+        applied_limit=limit,
+        applied_at=None,
+        async_add_listener=lambda update_callback: lambda: None,
+    )
+    return SimpleNamespace(
+        entry=SimpleNamespace(data={CONF_SIZE: size}), controller=controller
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Let the tests move the clock of the monitor."""
+    fake = FakeClock()
+    monkeypatch.setattr(monitor_module, "time", fake)
+    return fake
+
+
+def make_monitor(
+    own: SimpleNamespace, plant: Plant | None = None
+) -> tuple[monitor_module.FeedInMonitor, FakeSolarApi]:
+    """Return a monitor of one unit and its Solar API."""
+    api = FakeSolarApi()
+    monitor = monitor_module.FeedInMonitor(None, own.entry, api, own.controller, plant)
+    return monitor, api
+
+
+def acknowledge(monitor, own: SimpleNamespace, clock: FakeClock, limit: int) -> None:
+    """Let the controller acknowledge a new limit."""
+    own.controller.applied_on = True
+    own.controller.applied_limit = limit
+    own.controller.applied_at = clock.now
+    monitor._handle_controller_update()
+
+
+def test_compliance(clock: FakeClock) -> None:
+    """Feed-in within the tolerance of the acknowledged limit complies."""
+    own = unit(4000)
+    monitor, api = make_monitor(own)
+
+    api.feed_in = 4100
+    asyncio.run(monitor._async_read())
+    assert monitor.compliant is True
+    assert monitor.violations == 0
+
+    api.feed_in = 4101
+    asyncio.run(monitor._async_read())
+    assert monitor.compliant is False
+    assert monitor.violations == 1
+
+    own.controller.applied_on = False
+    asyncio.run(monitor._async_read())
+    assert monitor.compliant is None
+    assert monitor.effective_limit is None
+
+
+def test_settling(clock: FakeClock) -> None:
+    """A new limit settles, or counts as a violation after the window."""
+    own = unit(None)
+    monitor, api = make_monitor(own)
+    api.feed_in = 8000
+
+    acknowledge(monitor, own, clock, 3000)
+    assert monitor.settling
+    assert monitor.interval == monitor_module.FAST_INTERVAL
+    clock.now += 2
+    asyncio.run(monitor._async_read())
+    assert monitor.settling
+    assert monitor.violations == 0
+
+    api.feed_in = 2900
+    clock.now += 3
+    asyncio.run(monitor._async_read())
+    assert not monitor.settling
+    assert monitor.settle_time == 5
+    assert monitor.settle_histogram.count == 1
+
+    api.feed_in = 8000
+    acknowledge(monitor, own, clock, 1000)
+    clock.now += monitor_module.SETTLE_WINDOW
+    asyncio.run(monitor._async_read())
+    assert not monitor.settling
+    assert monitor.violations == 1
+    assert monitor.interval == monitor_module.SLOW_INTERVAL
+
+
+def test_plant_checks_plant_limit(clock: FakeClock) -> None:
+    """Units of a plant compare the site feed-in with the plant limit."""
+    units = {"a": unit(4000), "b": unit(2000, size=5000)}
+    plant = Plant(None, "site")
+    plant.units = {key: (u.entry, u.controller) for key, u in units.items()}
+    monitor, api = make_monitor(units["a"], plant)
+
+    # the site feeds in more than this unit's share, less than the plant limit
+    api.feed_in = 5900
+    asyncio.run(monitor._async_read())
+    assert monitor.compliance_limit == 6000
+    assert monitor.effective_limit == 4000
+    assert monitor.compliant is True
+    assert monitor.violations == 0
+
+    # tolerance of the plant size
+    api.feed_in = 6150
+    asyncio.run(monitor._async_read())
+    assert monitor.compliant is True
+    api.feed_in = 6151
+    asyncio.run(monitor._async_read())
+    assert monitor.compliant is False
+
+    # an unlimited unit leaves the plant without a bound
+    units["b"].controller.applied_on = False
+    asyncio.run(monitor._async_read())
+    assert monitor.compliance_limit is None
+    assert monitor.compliant is None
+    assert monitor.violations == 1
@@ -0,0 +1,230 @@
+"""Tests for the topic routing of the shared MQTT hub."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.gen24lpp.const import (  # noqa: E402
+    MqttBroker,
+    MqttPassword,
+    MqttPort,
+    MqttUser,
+)
+from custom_components.gen24lpp.mqtt_hub import (  # noqa: E402
+    MqttHub,
+    PahoMqttHub,
+    TopicTrie,
+    async_get_mqtt_hub,
+    async_release_mqtt_hub,
+)
+
+
+class RecordingHub(MqttHub):
+    """Hub recording the filters it would subscribe at the broker."""
+
+    def __init__(self) -> None:
+        """Initialize the hub without Home Assistant."""
+        super().__init__(None, ("test",))
+        self.subscribed: list[str] = []
+        self.unsubscribed: list[str] = []
+
+    def async_start(self) -> None:
+        """Nothing to connect."""
+
+    async def async_stop(self) -> None:
+        """Nothing to disconnect."""
+
+    def _async_subscribe_filter(self, topic: str) -> None:
+        self.subscribed.append(topic)
+
+    def _async_unsubscribe_filter(self, topic: str) -> None:
+        self.unsubscribed.append(topic)
+
+
+def callback_named(name: str, calls: list[str]):
+    """Return a message callback appending its name to calls."""
+    return lambda topic, payload, received: calls.append(name)
+
+
+@pytest.mark.parametrize(
+    ("topic_filter", "topic", "matches"),
+    [
+        ("ems/limit", "ems/limit", True),
+        ("ems/limit", "ems/limit/set", False),
+        ("ems/+", "ems/limit", True),
+        ("ems/+", "ems", False),
+        ("ems/+/set", "ems/limit/set", True),
+        ("ems/#", "ems", True),
+        ("ems/#", "ems/limit/set", True),
+        ("#", "ems/limit", True),
+        ("+/limit", "/limit", True),
+        ("#", "$SYS/uptime", False),
+        ("+/uptime", "$SYS/uptime", False),
+        ("$SYS/#", "$SYS/uptime", True),
+    ],
+)
+def test_match(topic_filter: str, topic: str, matches: bool) -> None:
+    """Wildcards follow the MQTT rules."""
+    trie = TopicTrie()
+    calls: list[str] = []
+    trie.add(topic_filter, callback_named("a", calls))
+    assert bool(trie.match(topic)) is matches
+
+
+def test_match_all_filters() -> None:
+    """A topic reaches the callbacks of every matching filter."""
+    trie = TopicTrie()
+    calls: list[str] = []
+    for name, topic_filter in (
+        ("exact", "ems/limit"),
+        ("single", "ems/+"),
+        ("multi", "ems/#"),
+        ("other", "ems/active"),
+    ):
+        trie.add(topic_filter, callback_named(name, calls))
+    for message_callback in trie.match("ems/limit"):
+        message_callback("ems/limit", b"", 0.0)
+    assert sorted(calls) == ["exact", "multi", "single"]
+
+
+def test_add_remove() -> None:
+    """Only the first add and the last remove of a filter are reported."""
+    trie = TopicTrie()
+    first = callback_named("first", [])
+    second = callback_named("second", [])
+    assert trie.add("ems/limit", first)
+    assert not trie.add("ems/limit", second)
+    assert trie.add("ems/limit/set", first)
+    assert trie.filters() == ["ems/limit", "ems/limit/set"]
+
+    assert not trie.remove("ems/limit", first)
+    assert trie.remove("ems/limit", second)
+    assert not trie.remove("ems/unknown", first)
+    assert trie.filters() == ["ems/limit/set"]
+    assert trie.remove("ems/limit/set", first)
+    assert trie.filters() == []
+    assert trie.match("ems/limit/set") == []
+
+
+def test_hub_is_abstract() -> None:
+    """A hub has to implement the broker side."""
+    with pytest.raises(TypeError, match="abstract"):
+        MqttHub(None, ("test",))
+
+
+def test_subscribe_once_per_filter() -> None:
+    """Entries sharing a filter share one broker subscription."""
+    hub = RecordingHub()
+    unsubscribe_a = hub.async_subscribe("ems/limit", callback_named("a", []))
+    unsubscribe_b = hub.async_subscribe("ems/limit", callback_named("b", []))
+    assert hub.subscribed == ["ems/limit"]
+
+    unsubscribe_a()
+    assert hub.unsubscribed == []
+    unsubscribe_b()
+    assert hub.unsubscribed == ["ems/limit"]
+
+
+def test_subscribe_empty_topic() -> None:
+    """An unset topic subscribes nothing."""
+    hub = RecordingHub()
+    hub.async_subscribe("", callback_named("a", []))()
+    assert hub.subscribed == []
+    assert hub.unsubscribed == []
+
+
+def test_dispatch() -> None:
+    """A failing callback does not keep the message from the others."""
+    hub = RecordingHub()
+    calls: list[tuple] = []
+
+    def failing(topic: str, payload: bytes, received: float) -> None:
+        raise ValueError("bad payload")
+
+    hub.async_subscribe("ems/#", failing)
+    hub.async_subscribe(
+        "ems/limit", lambda topic, payload, received: calls.append((topic, payload))
+    )
+    hub._async_dispatch("ems/limit", b"4000", 1.0)
+    hub._async_dispatch("other/limit", b"0", 2.0)
+    assert calls == [("ems/limit", b"4000")]
+
+
+class FakeHass:
+    """Just enough of Home Assistant to hand out hubs without connecting."""
+
+    def __init__(self) -> None:
+        """Initialize the fake."""
+        self.data: dict = {}
+        self.connects = 0
+
+    def async_create_background_task(self, target, name: str):
+        """Count the connect attempt instead of running it."""
+        target.close()
+        self.connects += 1
+        return SimpleNamespace(cancel=lambda: None)
+
+
+def broker_entry(password: str, user: str = "lpp") -> SimpleNamespace:
+    """Return an entry using its own broker."""
+    return SimpleNamespace(
+        data={
+            MqttBroker: "broker.local",
+            MqttPort: 1883,
+            MqttUser: user,
+            MqttPassword: password,
+        }
+    )
+
+
+def test_password_change_gets_new_hub() -> None:
+    """A password-only change connects with the new password."""
+
+    async def run():
+        hass = FakeHass()
+        old = async_get_mqtt_hub(hass, broker_entry("old"))
+        assert async_get_mqtt_hub(hass, broker_entry("old")) is old
+        assert old.users == 2
+
+        new = async_get_mqtt_hub(hass, broker_entry("new"))
+        assert new is not old
+        assert isinstance(new, PahoMqttHub)
+        assert new._password == "new"
+        assert hass.connects == 2
+
+        await async_release_mqtt_hub(hass, old)
+        await async_release_mqtt_hub(hass, old)
+        assert old.users == 0
+        assert async_get_mqtt_hub(hass, broker_entry("new")) is new
+        assert async_get_mqtt_hub(hass, broker_entry("old")) is not old
+
+    asyncio.run(run())
+
+
+def test_keepalive_timeout_stops_misc_timer() -> None:
+    """No keep-alive timer is left running once paho closed the socket."""
+    hass = FakeHass()
+    timers: list = []
+    hass.loop = SimpleNamespace(
+        call_later=lambda delay, func: timers.append(func)
+        or SimpleNamespace(cancel=lambda: None),
+        remove_reader=lambda fileno: None,
+        remove_writer=lambda fileno: None,
+    )
+    hub = PahoMqttHub(hass, "broker.local", 1883, "", "")
+    hub._fileno = 42
+    hub._client = SimpleNamespace(loop_misc=lambda: None)
+    hub._async_misc()
+    assert len(timers) == 1
+
+    # paho closes the socket from loop_misc when the broker stops answering
+    hub._client = SimpleNamespace(loop_misc=hub._async_close_socket)
+    timers.pop()()
+    assert timers == []
+    assert hub._misc_timer is None
+    assert hub._fileno is None
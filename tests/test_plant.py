@@ -0,0 +1,48 @@
+"""Tests for splitting a plant limit across inverters."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.gen24lpp.plant import Plant  # noqa: E402
+
+from .common import FakeInverter, running_controller  # noqa: E402
+
+
+def test_plant_waits_for_deferred_shares(tmp_path: Path) -> None:
+    """Time-to-apply and success count only written shares."""
+
+    async def run():
+        inverters = [FakeInverter(), FakeInverter()]
+        async with running_controller(
+            tmp_path / "a", inverters[0], deadband_w=500, max_write_delay=0.3
+        ) as first, running_controller(
+            tmp_path / "b", inverters[1], size=5000
+        ) as second:
+            plant = Plant(None, "site")
+            plant.units = {
+                "a": (first._entry, first),
+                "b": (second._entry, second),
+            }
+            for controller in (first, second):
+                controller.async_set_enabled(True)
+            assert await plant.async_apply(6000)
+            assert (first.applied_limit, second.applied_limit) == (4000, 2000)
+
+            # the share of the first unit rises within its deadband
+            assert await plant.async_apply(6300)
+            assert (first.applied_limit, second.applied_limit) == (4200, 2100)
+            assert plant.latency.last >= 300
+            assert plant.failed_units == 0
+
+            inverters[1].available = False
+            assert not await plant.async_apply(3000)
+            assert plant.failed_units == 1
+            assert plant.latency.count == 2
+
+    asyncio.run(run())
@@ -0,0 +1,264 @@
+"""Tests for the circuit breaker and the request scheduler of the HTTP client."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from . import load_component_module
+
+lpp_a = load_component_module("lpp_a")
+
+
+class FakeClock:
+    """Stand-in for the time module of lpp_a."""
+
+    def __init__(self) -> None:
+        """Start at an arbitrary point."""
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        """Return the current fake time."""
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Let the tests move the clock of the breaker."""
+    fake = FakeClock()
+    monkeypatch.setattr(lpp_a, "time", fake)
+    return fake
+
+
+def test_breaker_opens_after_threshold(clock: FakeClock) -> None:
+    """Consecutive failures open the breaker, a success in between resets."""
+    breaker = lpp_a.CircuitBreaker(threshold=3, open_time=5)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == lpp_a.BREAKER_CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == lpp_a.BREAKER_OPEN
+    assert breaker.opened == 1
+    assert not breaker.allow()
+    assert breaker.retry_in() == 5
+
+
+def test_breaker_half_open_probe(clock: FakeClock) -> None:
+    """After the open time exactly one probe passes, its success closes."""
+    breaker = lpp_a.CircuitBreaker(threshold=1, open_time=5)
+    breaker.record_failure()
+    clock.now += 4.9
+    assert not breaker.allow()
+
+    clock.now += 0.1
+    assert breaker.retry_in() == 0
+    assert breaker.allow()
+    assert breaker.state == lpp_a.BREAKER_HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == lpp_a.BREAKER_CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_breaker_backoff(clock: FakeClock) -> None:
+    """A failed probe doubles the open time up to the maximum."""
+    breaker = lpp_a.CircuitBreaker(threshold=1, open_time=5, max_open_time=15)
+    breaker.record_failure()
+    for expected in (10, 15, 15):
+        clock.now += breaker.retry_in()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == lpp_a.BREAKER_OPEN
+        assert breaker.retry_in() == expected
+    assert breaker.opened == 4
+
+    clock.now += breaker.retry_in()
+    assert breaker.allow()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.retry_in() == 5
+
+
+def test_open_breaker_fails_fast() -> None:
+    """Requests to an unreachable inverter stop once the breaker is open."""
+
+    async def run():
+        # nothing listens on the discard port
+        fronius = lpp_a.FroniusGEN24("127.0.0.1:9", "user", "secret")
+        try:
+            for _ in range(fronius.breaker.threshold):
+                assert await fronius.send_request("/api/", retries=0) is None
+            assert fronius.breaker.state == lpp_a.BREAKER_OPEN
+            assert fronius.last_error is not None
+            assert await fronius.send_request("/api/", retries=0) is None
+            assert fronius.fast_failures == 1
+        finally:
+            await fronius.close()
+
+    asyncio.run(run())
+
+
+def test_reconfigure_resets_breaker() -> None:
+    """New credentials or a new address get a closed breaker."""
+    fronius = lpp_a.FroniusGEN24("127.0.0.1:9", "user", "secret")
+    for _ in range(fronius.breaker.threshold):
+        fronius.breaker.record_failure()
+    fronius.last_status = 401
+    assert not fronius.breaker.allow()
+
+    fronius.reconfigure("127.0.0.1:80", "User", "other")
+    assert fronius.breaker.state == lpp_a.BREAKER_CLOSED
+    assert fronius.breaker.allow()
+    assert fronius.last_status is None
+    assert fronius.user == "user"
+
+
+async def hold(scheduler, priority: int, started: list, name: str, release):
+    """Take a slot, note the start and keep it until release is set."""
+    async with scheduler.slot(priority):
+        started.append(name)
+        await release.wait()
+
+
+async def settle() -> None:
+    """Let all ready tasks run."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_scheduler_keeps_a_slot_for_writes() -> None:
+    """Reads never take the last slot, a write starts right away."""
+
+    async def run():
+        scheduler = lpp_a.RequestScheduler(max_concurrency=2)
+        release = asyncio.Event()
+        started: list[str] = []
+        tasks = [
+            asyncio.create_task(
+                hold(scheduler, lpp_a.PRIORITY_LOW, started, name, release)
+            )
+            for name in ("read1", "read2")
+        ]
+        await settle()
+        assert started == ["read1"]
+        assert scheduler.queued == 1
+
+        tasks.append(
+            asyncio.create_task(
+                hold(scheduler, lpp_a.PRIORITY_HIGH, started, "write", release)
+            )
+        )
+        await settle()
+        assert started == ["read1", "write"]
+        assert scheduler.active == [1, 1]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["read1", "write", "read2"]
+        assert scheduler.active == [0, 0]
+        assert scheduler.peak == 2
+        assert scheduler.queued == 0
+
+    asyncio.run(run())
+
+
+def test_scheduler_writes_overtake_reads() -> None:
+    """A queued write gets the next free slot before earlier reads."""
+
+    async def run():
+        scheduler = lpp_a.RequestScheduler(max_concurrency=1)
+        first = asyncio.Event()
+        rest = asyncio.Event()
+        started: list[str] = []
+        tasks = [
+            asyncio.create_task(
+                hold(scheduler, lpp_a.PRIORITY_LOW, started, "read1", first)
+            )
+        ]
+        await settle()
+        for priority, name in (
+            (lpp_a.PRIORITY_LOW, "read2"),
+            (lpp_a.PRIORITY_HIGH, "write"),
+        ):
+            tasks.append(
+                asyncio.create_task(hold(scheduler, priority, started, name, rest))
+            )
+            await settle()
+        assert scheduler.queued == 2
+
+        first.set()
+        await settle()
+        assert started == ["read1", "write"]
+        rest.set()
+        await asyncio.gather(*tasks)
+        assert started == ["read1", "write", "read2"]
+        stats = scheduler.as_dict()
+        assert stats["reads"]["overtaken"] == 1
+        assert stats["writes"]["requests"] == 1
+        assert stats["reads"]["requests"] == 2
+
+    asyncio.run(run())
+
+
+def test_scheduler_cancelled_waiter() -> None:
+    """A request cancelled while waiting leaves no slot behind."""
+
+    async def run():
+        scheduler = lpp_a.RequestScheduler(max_concurrency=1)
+        release = asyncio.Event()
+        started: list[str] = []
+        holder = asyncio.create_task(
+            hold(scheduler, lpp_a.PRIORITY_HIGH, started, "write1", release)
+        )
+        await settle()
+        waiter = asyncio.create_task(
+            hold(scheduler, lpp_a.PRIORITY_HIGH, started, "write2", release)
+        )
+        await settle()
+        waiter.cancel()
+        release.set()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        assert started == ["write1"]
+        assert scheduler.active == [0, 0]
+        assert scheduler.queued == 0
+
+        async with scheduler.slot(lpp_a.PRIORITY_LOW):
+            assert scheduler.active == [0, 1]
+
+    asyncio.run(run())
+
+
+def test_scheduler_parent_limits_fleet() -> None:
+    """Each request also holds a slot of the fleet scheduler."""
+
+    async def run():
+        fleet = lpp_a.RequestScheduler(max_concurrency=1)
+        inverters = [lpp_a.RequestScheduler(parent=fleet) for _ in range(3)]
+        release = asyncio.Event()
+        started: list[str] = []
+        tasks = [
+            asyncio.create_task(
+                hold(scheduler, lpp_a.PRIORITY_HIGH, started, str(index), release)
+            )
+            for index, scheduler in enumerate(inverters)
+        ]
+        await settle()
+        assert len(started) == 1
+        assert fleet.queued == 2
+        assert [sum(scheduler.active) for scheduler in inverters] == [1, 1, 1]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert sorted(started) == ["0", "1", "2"]
+        assert fleet.peak == 1
+        assert fleet.active == [0, 0]
+
+    asyncio.run(run())
@@ -0,0 +1,92 @@
+"""Size and speed of the compliance log over a long period.
+
+Fills a log in a temporary directory with one write every --interval
+seconds over --days days, then measures appending, a full scan, a one-day
+query and a one-day CSV export. Does not need Home Assistant.
+
+    python tools/bench_compliance.py --days 1825 --interval 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_http import load_component_module  # noqa: E402
+
+DAY = 86400
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Fill the log and time the queries."""
+    compliance_log = load_component_module("compliance_log")
+    records = int(args.days * DAY / args.interval)
+    begin = time.time() - args.days * DAY
+    report: dict = {"records": records}
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = compliance_log.ComplianceLog(directory)
+        start = time.perf_counter()
+        for index in range(records):
+            received = begin + index * args.interval
+            log.append(
+                compliance_log.ComplianceRecord(
+                    received=received,
+                    completed=received + 0.05,
+                    limit=1000 + index % 9000,
+                    status=200,
+                    enabled=True,
+                    round_trips=1,
+                    flags=compliance_log.FLAG_ACKNOWLEDGED,
+                )
+            )
+            if index % args.batch == 0:
+                log.flush()
+        log.close()
+        elapsed = time.perf_counter() - start
+        report["append_us_per_record"] = elapsed / records * 1e6
+        segments = list(Path(directory).iterdir())
+        report["segments"] = len(segments)
+        report["mib"] = sum(path.stat().st_size for path in segments) / 1024**2
+
+        start = time.perf_counter()
+        scanned = sum(1 for _ in log.query())
+        report["full_scan_s"] = time.perf_counter() - start
+        assert scanned == records
+
+        middle = begin + args.days * DAY / 2
+        start = time.perf_counter()
+        day = sum(1 for _ in log.query(middle, middle + DAY))
+        report["day_query_ms"] = (time.perf_counter() - start) * 1000
+        report["day_records"] = day
+
+        start = time.perf_counter()
+        log.export_csv(io.StringIO(), middle, middle + DAY)
+        report["day_csv_ms"] = (time.perf_counter() - start) * 1000
+    return report
+
+
+def main() -> None:
+    """Parse arguments and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--interval", type=float, default=60)
+    # records per flush, the integration flushes every 5 s
+    parser.add_argument("--batch", type=int, default=1000)
+    report = run(parser.parse_args())
+    for key, value in report.items():
+        print(
+            f"{key:>22}  {value:.2f}"
+            if isinstance(value, float)
+            else f"{key:>22}  {value}"
+        )
+
+
+if __name__ == "__main__":
+    main()
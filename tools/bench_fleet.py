@@ -0,0 +1,168 @@
+"""Scaling benchmark for fleet mode: many config entries, one limit signal.
+
+Sets up N entries, each talking to its own GEN24 simulator, all subscribed to
+the same ALLOWED_LIMIT topic on one minimal local broker. Every publish is a
+grid operator signal hitting all sites at once. Reports setup time, memory
+and threads per entry, the fleet time-to-apply and the peak number of
+requests in flight. Requires Home Assistant to be installed.
+
+    python tools/bench_fleet.py --entries 50 --rounds 10 --latency 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bench_mqtt_e2e  # noqa: E402
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+
+from homeassistant.config_entries import ConfigEntry  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+APPLY_TIMEOUT = 30
+
+
+def make_site(index: int, host: str, broker_port: int) -> ConfigEntry:
+    """Return the config entry of one site."""
+    return ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain="gen24lpp",
+        title=f"site {index}",
+        data=dict(bench_mqtt_e2e.make_entry(host, broker_port, 0).data),
+        source="user",
+        options={},
+    )
+
+
+async def wait_for(predicate, timeout: float = APPLY_TIMEOUT) -> bool:
+    """Wait until predicate() is true, return False on timeout."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.002)
+    return True
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Run the benchmark and return its report."""
+    from custom_components.gen24lpp import async_setup_entry, async_unload_entry
+    from custom_components.gen24lpp.sensor import SoftLimitNumber
+    from custom_components.gen24lpp.binary_sensor import SoftLimitSwitch
+
+    from homeassistant.components.number import NumberEntityDescription
+    from homeassistant.components.switch import SwitchEntityDescription
+
+    broker = bench_mqtt_e2e.MiniBroker()
+    broker_port = await broker.start()
+    simulators = [
+        await start_simulator(SimulatorConfig(latency=args.latency, jitter=args.jitter))
+        for _ in range(args.entries)
+    ]
+    hass = HomeAssistant(tempfile.mkdtemp())
+    hass.config_entries = SimpleNamespace(
+        async_forward_entry_setups=lambda entry, platforms: asyncio.sleep(0),
+        async_unload_platforms=lambda entry, platforms: asyncio.sleep(0, True),
+    )
+    entries = [
+        make_site(index, host, broker_port)
+        for index, (_, _, host) in enumerate(simulators)
+    ]
+
+    threads = threading.active_count()
+    tracemalloc.start()
+    memory = tracemalloc.get_traced_memory()[0]
+    start = time.monotonic()
+    await asyncio.gather(*(async_setup_entry(hass, entry) for entry in entries))
+    for entry in entries:
+        switch = SoftLimitSwitch(SwitchEntityDescription(key="switch"), entry)
+        number = SoftLimitNumber(NumberEntityDescription(key="number"), entry)
+        hub = entry.runtime_data.mqtt
+        hub.async_subscribe(
+            bench_mqtt_e2e.TOPIC_ACTIVE, switch._handle_message
+        )  # noqa: SLF001
+        hub.async_subscribe(
+            bench_mqtt_e2e.TOPIC_LIMIT, number._handle_message
+        )  # noqa: SLF001
+    await wait_for(
+        lambda: broker.sessions and len(next(iter(broker.sessions.values()))) >= 2
+    )
+    setup = time.monotonic() - start
+    memory = tracemalloc.get_traced_memory()[0] - memory
+    threads = threading.active_count() - threads
+    tracemalloc.stop()
+
+    controllers = [entry.runtime_data.controller for entry in entries]
+    fleet = entries[0].runtime_data.fleet
+    broker.publish(bench_mqtt_e2e.TOPIC_ACTIVE, b"true")
+    await wait_for(lambda: all(c.applied_on for c in controllers))
+
+    times: list[float] = []
+    timeouts = 0
+    for round_ in range(args.rounds):
+        limit = 2000 + 100 * round_
+        published = time.monotonic()
+        broker.publish(bench_mqtt_e2e.TOPIC_LIMIT, b"%d" % limit)
+        if await wait_for(lambda: all(c.applied_limit == limit for c in controllers)):
+            times.append(time.monotonic() - published)
+        else:
+            timeouts += 1
+        # let the monitors poll in between, as in real operation
+        await asyncio.sleep(args.pause)
+
+    report = {
+        "entries": args.entries,
+        "setup_s": setup,
+        "kib_per_entry": memory / 1024 / args.entries,
+        "threads_per_entry": threads / args.entries,
+        "p50_apply_ms": statistics.median(times) * 1000 if times else 0.0,
+        "max_apply_ms": max(times, default=0) * 1000,
+        "fleet_waves": fleet.waves,
+        "fleet_max_ms": fleet.time_to_apply.as_dict()["max_ms"],
+        "timeouts": timeouts,
+        "peak_in_flight": fleet.scheduler.peak,
+        "peak_per_host": max(sim.stats.max_active for sim, _, _ in simulators),
+    }
+
+    for entry in entries:
+        await async_unload_entry(hass, entry)
+    await hass.async_stop(force=True)
+    await broker.stop()
+    for _, runner, _ in simulators:
+        await runner.cleanup()
+    return report
+
+
+def main() -> None:
+    """Parse arguments and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--pause", type=float, default=0.5)
+    report = asyncio.run(run(parser.parse_args()))
+    for key, value in report.items():
+        print(
+            f"{key:>18}  {value:.2f}"
+            if isinstance(value, float)
+            else f"{key:>18}  {value}"
+        )
+
+
+if __name__ == "__main__":
+    main()
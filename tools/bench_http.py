@@ -0,0 +1,119 @@
+"""Benchmark the FroniusGEN24 request path against the GEN24 simulator.
+
+Reports writes per second, p50/p99 latency and HTTP round-trips per write.
+
+    python tools/bench_http.py --writes 500 --latency 0.02 --nonce-max-uses 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+from pathlib import Path
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+
+COMPONENT = Path(__file__).parent.parent / "custom_components" / "gen24lpp"
+
+
+def load_component_module(name: str):
+    """Import a module of the integration without importing Home Assistant."""
+    spec = importlib.util.spec_from_file_location(
+        f"gen24lpp_{name}", COMPONENT / f"{name}.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Return the q-th percentile of samples."""
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[int(q) - 1]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Run one benchmark and return the report."""
+    lpp_a = load_component_module("lpp_a")
+    simulator, runner, host = await start_simulator(
+        SimulatorConfig(
+            algorithm=args.algorithm,
+            nonce_lifetime=args.nonce_lifetime,
+            nonce_max_uses=args.nonce_max_uses,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            storm_rate=args.storm_rate,
+        )
+    )
+    fronius = lpp_a.FroniusGEN24(host, "Technician", "secret")
+    latencies: list[float] = []
+    failures = 0
+    try:
+        start = time.perf_counter()
+        for index in range(args.writes):
+            payload = fronius.payload.on(1000 + index % 1000, 10000)
+            begin = time.perf_counter()
+            response = await fronius.send_request(
+                "config/limit_settings/powerLimits",
+                method="POST",
+                payload=payload,
+                headers=dict(lpp_a.JSON_HEADERS),
+                add_praefix=True,
+            )
+            if response is None:
+                failures += 1
+            else:
+                latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+    finally:
+        await fronius.close()
+        await runner.cleanup()
+
+    writes = sum(fronius.round_trips.values())
+    return {
+        "writes": args.writes,
+        "failures": failures,
+        "writes_per_second": args.writes / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "round_trips_per_write": (
+            sum(n * count for n, count in fronius.round_trips.items()) / writes
+            if writes
+            else 0
+        ),
+        "round_trip_distribution": dict(sorted(fronius.round_trips.items())),
+        "server_requests": simulator.stats.requests,
+        "server_challenges": simulator.stats.challenges,
+        "server_stale": simulator.stats.stale,
+    }
+
+
+def main() -> None:
+    """Parse arguments and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--algorithm", default="MD5", choices=["MD5", "SHA-256"])
+    parser.add_argument("--nonce-lifetime", type=float, default=60.0)
+    parser.add_argument("--nonce-max-uses", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--storm-rate", type=float, default=0.0)
+    report = asyncio.run(run(parser.parse_args()))
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"{key:<{width}}  {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare limit writes over Modbus TCP (SunSpec) with the HTTP API.
+
+Both transports run against their local stand-ins with the same number of
+writes. Latency is injected per request, so the result shows how the
+request count per write and the injected latency add up.
+
+    python tools/bench_modbus.py --writes 500 --http-latency 0.05 --modbus-latency 0.005
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_http import load_component_module, percentile  # noqa: E402
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+from modbus_simulator import ModbusSimulatorConfig, start_modbus_simulator  # noqa: E402
+
+
+def summarize(latencies: list[float], elapsed: float, requests: int) -> dict:
+    """Return the report of one transport."""
+    writes = len(latencies)
+    return {
+        "writes_per_second": writes / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_write": requests / writes if writes else 0.0,
+    }
+
+
+async def bench_http(args: argparse.Namespace) -> dict:
+    """Write limits through the HTTP API."""
+    lpp_a = load_component_module("lpp_a")
+    simulator, runner, host = await start_simulator(
+        SimulatorConfig(latency=args.http_latency)
+    )
+    fronius = lpp_a.FroniusGEN24(host, "Technician", "secret")
+    latencies: list[float] = []
+    try:
+        start = time.perf_counter()
+        for index in range(args.writes):
+            begin = time.perf_counter()
+            response = await fronius.send_request(
+                "config/limit_settings/powerLimits",
+                method="POST",
+                payload=fronius.payload.on(1000 + index % 1000, 10000),
+                headers=dict(lpp_a.JSON_HEADERS),
+                add_praefix=True,
+            )
+            if response is not None:
+                latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+    finally:
+        await fronius.close()
+        await runner.cleanup()
+    return summarize(latencies, elapsed, simulator.stats.requests)
+
+
+async def bench_modbus(args: argparse.Namespace) -> dict:
+    """Write limits through SunSpec WMaxLimPct, read back included."""
+    modbus = load_component_module("modbus")
+    simulator, server, port = await start_modbus_simulator(
+        ModbusSimulatorConfig(latency=args.modbus_latency)
+    )
+    transport = modbus.SunSpecLimit("127.0.0.1", port)
+    # discovery of the SunSpec map is a one-off, not part of the write path
+    await transport.async_read()
+    discovery = simulator.stats.requests
+    latencies: list[float] = []
+    try:
+        start = time.perf_counter()
+        for index in range(args.writes):
+            begin = time.perf_counter()
+            if await transport.async_write(1000 + index % 1000):
+                latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - start
+    finally:
+        await transport.close()
+        server.close()
+        await server.wait_closed()
+    return {
+        **summarize(latencies, elapsed, simulator.stats.requests - discovery),
+        "connections": simulator.stats.connections,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    """Run both transports."""
+    return {"http": await bench_http(args), "modbus": await bench_modbus(args)}
+
+
+def main() -> None:
+    """Parse arguments and print one line per transport."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--modbus-latency", type=float, default=0.005)
+    reports = asyncio.run(run(parser.parse_args()))
+    keys = list(reports["http"])
+    print(f"{'transport':>10}  " + "  ".join(f"{key:>18}" for key in keys))
+    for name, report in reports.items():
+        print(f"{name:>10}  " + "  ".join(f"{report[key]:>18.2f}" for key in keys))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""End-to-end benchmark from MQTT publish to acknowledged powerLimits write.
+
+Drives the real SoftLimitSwitch/SoftLimitNumber message handlers, MqttHub and
+LimitController with synthetic limit traces. MQTT goes over TCP through a
+minimal in-process broker; the inverter is the GEN24 simulator. Requires Home
+Assistant to be installed.
+
+    python tools/bench_mqtt_e2e.py --rates 1 10 100 --duration 10 --latency 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+
+from homeassistant.config_entries import ConfigEntry  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+TOPIC_ACTIVE = "bench/limited_production"
+TOPIC_LIMIT = "bench/allowed_limit"
+
+
+def _encode_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        encoded.append(digit | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+class MiniBroker:
+    """MQTT 3.1.1 broker stand-in: QoS 0, exact topic filters, no retain."""
+
+    def __init__(self) -> None:
+        """Initialize the broker."""
+        self.sessions: dict[asyncio.StreamWriter, set[str]] = {}
+        self.published: dict[bytes, float] = {}
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = "127.0.0.1") -> int:
+        """Start listening, return the port."""
+        self._server = await asyncio.start_server(self._handle, host, 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Close all sessions and the listener."""
+        for writer in list(self.sessions):
+            writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        """Publish a message, remembering when it was sent."""
+        self.published[payload] = time.monotonic()
+        name = topic.encode()
+        body = len(name).to_bytes(2, "big") + name + payload
+        packet = b"\x30" + _encode_length(len(body)) + body
+        for writer, topics in self.sessions.items():
+            if topic in topics:
+                writer.write(packet)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        topics = self.sessions[writer] = set()
+        try:
+            while True:
+                packet_type = (await reader.readexactly(1))[0] >> 4
+                length, shift = 0, 0
+                while True:
+                    digit = (await reader.readexactly(1))[0]
+                    length += (digit & 0x7F) << shift
+                    shift += 7
+                    if not digit & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                if packet_type == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif packet_type in (8, 10):  # SUBSCRIBE, UNSUBSCRIBE
+                    index, codes = 2, bytearray()
+                    while index < len(body):
+                        size = int.from_bytes(body[index : index + 2], "big")
+                        topic = body[index + 2 : index + 2 + size].decode()
+                        index += 2 + size
+                        if packet_type == 8:
+                            topics.add(topic)
+                            codes.append(0)
+                            index += 1
+                        else:
+                            topics.discard(topic)
+                    reply = body[:2] + bytes(codes)
+                    writer.write(
+                        (b"\x90" if packet_type == 8 else b"\xb0")
+                        + _encode_length(len(reply))
+                        + reply
+                    )
+                elif packet_type == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif packet_type == 14:  # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.sessions.pop(writer, None)
+            writer.close()
+
+
+def make_entry(host: str, broker_port: int, rate: float) -> ConfigEntry:
+    """Return a config entry pointing at the simulator."""
+    return ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain="gen24lpp",
+        title=f"bench {rate}/s",
+        data={
+            "ip_address": host,
+            "username": "Technician",
+            "password": "secret",
+            "size": 10000,
+            "mqttbroker": "127.0.0.1",
+            "mqttport": broker_port,
+            "mqttuser": "",
+            "mqttpassword": "",
+            "limited_production": TOPIC_ACTIVE,
+            "allowed_limit": TOPIC_LIMIT,
+            "min_write_interval": 0.0,
+        },
+        source="user",
+        options={},
+    )
+
+
+def percentile(samples: list[float], q: int) -> float:
+    """Return the q-th percentile of samples in ms."""
+    if len(samples) < 2:
+        return samples[0] * 1000 if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1] * 1000
+
+
+async def run_trace(args: argparse.Namespace, rate: float) -> dict:
+    """Replay one synthetic trace and return its report."""
+    from custom_components.gen24lpp import async_setup_entry, fleet, mqtt_hub
+    from custom_components.gen24lpp.binary_sensor import SoftLimitSwitch
+    from custom_components.gen24lpp.sensor import SoftLimitNumber
+
+    from homeassistant.components.number import NumberEntityDescription
+    from homeassistant.components.switch import SwitchEntityDescription
+
+    broker = MiniBroker()
+    broker_port = await broker.start()
+    simulator, runner, host = await start_simulator(
+        SimulatorConfig(latency=args.latency, jitter=args.jitter)
+    )
+    hass = HomeAssistant(tempfile.mkdtemp())
+    hass.config_entries = SimpleNamespace(
+        async_forward_entry_setups=lambda entry, platforms: asyncio.sleep(0)
+    )
+    entry = make_entry(host, broker_port, rate)
+    await async_setup_entry(hass, entry)
+
+    switch = SoftLimitSwitch(SwitchEntityDescription(key="soft_limit_enabled"), entry)
+    number = SoftLimitNumber(NumberEntityDescription(key="soft_limit"), entry)
+    for entity in (switch, number):
+        entity.hass = hass
+    hub = entry.runtime_data.mqtt
+    hub.async_subscribe(TOPIC_ACTIVE, switch._handle_message)  # noqa: SLF001
+    hub.async_subscribe(TOPIC_LIMIT, number._handle_message)  # noqa: SLF001
+
+    controller = entry.runtime_data.controller
+    latencies: list[float] = []
+
+    def on_update() -> None:
+        published = broker.published.pop(b"%d" % (controller.applied_limit or -1), None)
+        if published is not None and controller.applied_at:
+            latencies.append(controller.applied_at - published)
+
+    controller.async_add_listener(on_update)
+    while not broker.sessions or len(next(iter(broker.sessions.values()))) < 2:
+        await asyncio.sleep(0.01)
+    broker.publish(TOPIC_ACTIVE, b"true")
+
+    count = max(1, int(rate * args.duration))
+    threads = threading.active_count()
+    cpu = time.process_time()
+    start = time.monotonic()
+    limit = 5000
+    for index in range(count):
+        # unique values, so every acknowledged limit maps to one publish
+        limit = max(0, limit + random.choice((-1, 1)) * random.randint(1, 50))
+        limit = limit * 1000 + index % 1000
+        broker.publish(TOPIC_LIMIT, b"%d" % limit)
+        limit //= 1000
+        threads = max(threads, threading.active_count())
+        await asyncio.sleep(max(0.0, start + (index + 1) / rate - time.monotonic()))
+    await asyncio.sleep(args.latency * 4 + 0.5)
+    cpu = time.process_time() - cpu
+
+    await controller.async_stop()
+    await entry.runtime_data.monitor.async_stop()
+    await mqtt_hub.async_release_mqtt_hub(hass, hub)
+    await fleet.async_leave_fleet(hass, entry)
+    await hass.async_stop(force=True)
+    await broker.stop()
+    await runner.cleanup()
+
+    return {
+        "rate": rate,
+        "published": count,
+        "applied": len(latencies),
+        "coalesced": controller.writes_suppressed,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies, default=0) * 1000,
+        "cpu_s": cpu,
+        "threads": threads,
+        "server_posts": simulator.stats.by_path.get(
+            "/api/config/limit_settings/powerLimits", 0
+        ),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    """Run all traces."""
+    return [await run_trace(args, rate) for rate in args.rates]
+
+
+def main() -> None:
+    """Parse arguments and print one line per rate."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    reports = asyncio.run(run(parser.parse_args()))
+    keys = list(reports[0])
+    print("  ".join(f"{key:>12}" for key in keys))
+    for report in reports:
+        print(
+            "  ".join(
+                f"{value:>12.2f}" if isinstance(value, float) else f"{value:>12}"
+                for value in report.values()
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
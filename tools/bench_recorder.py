@@ -0,0 +1,193 @@
+"""State writes and recorder growth of one entry under a steady limit stream.
+
+Sets up one entry with its entities against the GEN24 simulator, publishes
+the allowed limit at a fixed rate (most EMS republish an unchanged value
+every second) and counts the state_changed events of the entities and what
+the recorder would store: one states row per event, one state_attributes
+row per distinct attribute set. Runs twice, once writing the state on every
+update as before (``state_max_age`` 0, all attributes recorded), once with
+the change-only writes. Requires Home Assistant to be installed.
+
+    python tools/bench_recorder.py --duration 60 --rate 1 --change-every 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import timedelta
+import logging
+from pathlib import Path
+import sys
+import tempfile
+from types import SimpleNamespace
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bench_fleet  # noqa: E402
+import bench_mqtt_e2e  # noqa: E402
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+
+from homeassistant.const import (  # noqa: E402
+    ATTR_ATTRIBUTION,
+    ATTR_RESTORED,
+    ATTR_SUPPORTED_FEATURES,
+    EVENT_STATE_CHANGED,
+)
+from homeassistant.config_entries import ConfigEntry  # noqa: E402
+from homeassistant.core import Event, HomeAssistant  # noqa: E402
+from homeassistant.helpers import device_registry as dr  # noqa: E402
+from homeassistant.helpers import entity as entity_helper  # noqa: E402
+from homeassistant.helpers import entity_registry as er  # noqa: E402
+from homeassistant.helpers.entity_platform import EntityPlatform  # noqa: E402
+from homeassistant.helpers.json import json_bytes  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+# dropped by the recorder for every domain
+ALL_DOMAIN_EXCLUDE_ATTRS = {ATTR_ATTRIBUTION, ATTR_RESTORED, ATTR_SUPPORTED_FEATURES}
+
+
+class RecorderEstimate:
+    """What the recorder would write for the observed state_changed events."""
+
+    def __init__(self, apply_exclusions: bool) -> None:
+        """Initialize the counters."""
+        self.apply_exclusions = apply_exclusions
+        self.events = 0
+        self.state_bytes = 0
+        self.attributes: dict[bytes, int] = {}
+
+    def handle(self, event: Event) -> None:
+        """Account one state_changed event."""
+        if (state := event.data["new_state"]) is None:
+            return
+        exclude = set(ALL_DOMAIN_EXCLUDE_ATTRS)
+        if self.apply_exclusions and state.state_info:
+            exclude.update(state.state_info["unrecorded_attributes"])
+        shared = json_bytes(
+            {k: v for k, v in state.attributes.items() if k not in exclude}
+        )
+        self.events += 1
+        self.state_bytes += len(state.entity_id) + len(state.state)
+        self.attributes[shared] = len(shared)
+
+    def as_dict(self, duration: float) -> dict:
+        """Return the report, extrapolated to a day."""
+        total = self.state_bytes + sum(self.attributes.values())
+        return {
+            "state_changed": self.events,
+            "events_per_day": self.events * 86400 / duration,
+            "states_rows": self.events,
+            "attribute_rows": len(self.attributes),
+            "kib": total / 1024,
+            "mib_per_day": total * 86400 / duration / 1024**2,
+        }
+
+
+async def add_entities(hass: HomeAssistant, entry, domain: str, module) -> list:
+    """Set up one platform of the integration, return its entities."""
+    entities: list = []
+    await module.async_setup_entry(hass, entry, entities.extend)
+    platform = EntityPlatform(
+        hass=hass,
+        logger=_LOGGER,
+        domain=domain,
+        platform_name="gen24lpp",
+        platform=None,
+        scan_interval=timedelta(seconds=30),
+        entity_namespace=None,
+    )
+    await platform.async_add_entities(entities)
+    return entities
+
+
+async def run_once(args: argparse.Namespace, change_only: bool) -> dict:
+    """Stream limits for the duration and return the estimate."""
+    from custom_components.gen24lpp import (
+        async_setup_entry,
+        async_unload_entry,
+        binary_sensor,
+        sensor,
+    )
+
+    broker = bench_mqtt_e2e.MiniBroker()
+    broker_port = await broker.start()
+    _, runner, host = await start_simulator(SimulatorConfig(latency=args.latency))
+    hass = HomeAssistant(tempfile.mkdtemp())
+    hass.config_entries = SimpleNamespace(
+        async_forward_entry_setups=lambda entry, platforms: asyncio.sleep(0),
+        async_unload_platforms=lambda entry, platforms: asyncio.sleep(0, True),
+    )
+    entity_helper.async_setup(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    site = bench_fleet.make_site(0, host, broker_port)
+    entry = ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=site.domain,
+        title=site.title,
+        data={**site.data, "state_max_age": args.max_age if change_only else 0.0},
+        source="user",
+        options={},
+    )
+
+    await async_setup_entry(hass, entry)
+    entities = [
+        *await add_entities(hass, entry, "sensor", sensor),
+        *await add_entities(hass, entry, "switch", binary_sensor),
+    ]
+    await bench_fleet.wait_for(
+        lambda: broker.sessions and len(next(iter(broker.sessions.values()))) >= 2
+    )
+    estimate = RecorderEstimate(apply_exclusions=change_only)
+    hass.bus.async_listen(EVENT_STATE_CHANGED, estimate.handle)
+
+    broker.publish(bench_mqtt_e2e.TOPIC_ACTIVE, b"true")
+    limit = 5000
+    for tick in range(int(args.duration * args.rate)):
+        if args.change_every and tick % args.change_every == 0:
+            limit = 4000 + (tick // args.change_every % 10) * 200
+        broker.publish(bench_mqtt_e2e.TOPIC_LIMIT, b"%d" % limit)
+        await asyncio.sleep(1 / args.rate)
+
+    report = estimate.as_dict(args.duration)
+    report["writes_skipped"] = sum(
+        getattr(entity, "state_writes_skipped", 0) for entity in entities
+    )
+    await async_unload_entry(hass, entry)
+    await hass.async_stop(force=True)
+    await broker.stop()
+    await runner.cleanup()
+    return report
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    """Run the old and the change-only behaviour."""
+    return {
+        "every_update": await run_once(args, change_only=False),
+        "change_only": await run_once(args, change_only=True),
+    }
+
+
+def main() -> None:
+    """Parse arguments and print one column per behaviour."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--rate", type=float, default=1)
+    parser.add_argument("--change-every", type=int, default=10)
+    parser.add_argument("--max-age", type=float, default=300)
+    parser.add_argument("--latency", type=float, default=0.02)
+    reports = asyncio.run(run(parser.parse_args()))
+    keys = list(reports["change_only"])
+    print(f"{'':>16}  " + "  ".join(f"{name:>14}" for name in reports))
+    for key in keys:
+        values = (reports[name].get(key, 0) for name in reports)
+        print(f"{key:>16}  " + "  ".join(f"{value:>14.1f}" for value in values))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Startup timing of the integration with N config entries.
+
+Measures the import of the integration in a fresh interpreter (and whether
+paho or Home Assistant's MQTT component were loaded by it), the time
+async_setup_entry takes for N entries set up together, the startup
+milestones of every entry and the largest event loop stall meanwhile.
+Requires Home Assistant to be installed.
+
+    python tools/bench_startup.py --entries 20 --latency 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bench_fleet  # noqa: E402
+import bench_mqtt_e2e  # noqa: E402
+from gen24_simulator import SimulatorConfig, start_simulator  # noqa: E402
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+IMPORT_PROBE = """
+import json, sys, time
+import homeassistant.core
+start = time.perf_counter()
+import custom_components.gen24lpp
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "paho_loaded": "paho.mqtt.client" in sys.modules,
+    "ha_mqtt_loaded": "homeassistant.components.mqtt" in sys.modules,
+}))
+"""
+
+MILESTONES = ("state_restored", "platforms", "mqtt_connected", "inverter_ready")
+
+
+def measure_import() -> dict:
+    """Import the integration in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+async def watch_loop(stalls: list[float], interval: float = 0.001) -> None:
+    """Record how late the loop wakes up, i.e. how long it was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        stalls.append(loop.time() - start - interval)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Boot N entries and return the report."""
+    from custom_components.gen24lpp import async_setup_entry, async_unload_entry
+
+    broker = bench_mqtt_e2e.MiniBroker()
+    broker_port = await broker.start()
+    simulators = [
+        await start_simulator(SimulatorConfig(latency=args.latency))
+        for _ in range(args.entries)
+    ]
+    hass = HomeAssistant(tempfile.mkdtemp())
+    hass.config_entries = SimpleNamespace(
+        async_forward_entry_setups=lambda entry, platforms: asyncio.sleep(0),
+        async_unload_platforms=lambda entry, platforms: asyncio.sleep(0, True),
+    )
+    entries = [
+        bench_fleet.make_site(index, host, broker_port)
+        for index, (_, _, host) in enumerate(simulators)
+    ]
+
+    stalls: list[float] = []
+    watcher = asyncio.create_task(watch_loop(stalls))
+    start = time.monotonic()
+    await asyncio.gather(*(async_setup_entry(hass, entry) for entry in entries))
+    setup = time.monotonic() - start
+    await bench_fleet.wait_for(
+        lambda: all(
+            len(entry.runtime_data.startup.milestones) == len(MILESTONES)
+            for entry in entries
+        )
+    )
+    ready = time.monotonic() - start
+    watcher.cancel()
+
+    report: dict = {"entries": args.entries, "setup_ms": setup * 1000}
+    for name in MILESTONES:
+        samples = [
+            entry.runtime_data.startup.milestones.get(name, 0.0) for entry in entries
+        ]
+        report[f"{name}_p50_ms"] = statistics.median(samples)
+        report[f"{name}_max_ms"] = max(samples)
+    report["all_ready_ms"] = ready * 1000
+    report["max_loop_stall_ms"] = max(stalls, default=0.0) * 1000
+
+    for entry in entries:
+        await async_unload_entry(hass, entry)
+    await hass.async_stop(force=True)
+    await broker.stop()
+    for _, runner, _ in simulators:
+        await runner.cleanup()
+    return report
+
+
+def main() -> None:
+    """Parse arguments and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    report = {**measure_import(), **asyncio.run(run(args))}
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = f"{value:.1f}"
+        print(f"{key:<{width}}  {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Export the compliance log of an entry as CSV.
+
+The log lives in <config>/gen24lpp_compliance/<entry id>. Start and end
+are ISO dates or times, without a time zone they are local time; the range
+covers the completion time of the writes, the end is exclusive.
+
+    python tools/export_compliance.py /config/gen24lpp_compliance/<entry id> \\
+        --start 2026-01-01 --end 2026-04-01 --out q1.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_http import load_component_module  # noqa: E402
+
+
+def timestamp(value: str) -> float:
+    """Parse an ISO date or time into a Unix timestamp."""
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main() -> None:
+    """Parse arguments and write the CSV."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--start", type=timestamp)
+    parser.add_argument("--end", type=timestamp)
+    parser.add_argument("--out", type=Path, help="CSV file, default stdout")
+    args = parser.parse_args()
+
+    compliance_log = load_component_module("compliance_log")
+    log = compliance_log.ComplianceLog(args.directory)
+    if args.out is None:
+        count = log.export_csv(sys.stdout, args.start, args.end)
+    else:
+        with args.out.open("w", newline="") as file:
+            count = log.export_csv(file, args.start, args.end)
+    print(f"{count} records", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Local stand-in for the Fronius GEN24 web API.
+
+Implements the endpoints used by gen24lpp with real HTTP digest auth, so
+FroniusGEN24 can run against it unchanged. Latency, server errors and 401
+storms can be injected to benchmark the request path.
+
+    python tools/gen24_simulator.py --port 8080 --latency 0.05 --algorithm SHA-256
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+from aiohttp import web
+
+REALM = "Webinterface area"
+
+_AUTH_PARAM = re.compile(r'([\w-]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^,\s]*)')
+
+
+@dataclass
+class SimulatorConfig:
+    """Behaviour of the simulated inverter."""
+
+    user: str = "technician"
+    password: str = "secret"
+    algorithm: str = "MD5"
+    # Fronius answers with X-WWW-Authenticate to avoid browser popups
+    challenge_header: str = "X-WWW-Authenticate"
+    nonce_lifetime: float = 60.0
+    nonce_max_uses: int = 0
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    storm_rate: float = 0.0
+    production: float = 8000.0
+
+
+@dataclass
+class SimulatorStats:
+    """Counters of the simulated inverter."""
+
+    requests: int = 0
+    challenges: int = 0
+    stale: int = 0
+    errors: int = 0
+    # requests being served at the same time
+    active: int = 0
+    max_active: int = 0
+    by_path: dict[str, int] = field(default_factory=dict)
+
+
+class Gen24Simulator:
+    """aiohttp application answering like a GEN24."""
+
+    def __init__(self, config: SimulatorConfig | None = None) -> None:
+        """Initialize the simulator."""
+        self.config = config or SimulatorConfig()
+        self.stats = SimulatorStats()
+        self.power_limits = {
+            "exportLimits": {
+                "activePower": {
+                    "hardLimit": {"powerLimit": 0},
+                    "softLimit": {"enabled": False, "powerLimit": 0},
+                    "activated": False,
+                    "networkMode": "limitLocal",
+                },
+                "failSafeModeEnabled": False,
+                "autodetectedControlledDevices": {},
+                "staticControlledDevices": {},
+            },
+            "visualization": {"exportLimits": {"activePower": {}}},
+        }
+        self.timeofuse: dict = {"timeofuse": []}
+        # nonce -> [created, uses, last nc]
+        self._nonces: dict[str, list] = {}
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.router.add_get("/api/commands/Login", self._login)
+        self.app.router.add_get(
+            "/api/config/limit_settings/powerLimits", self._get_power_limits
+        )
+        self.app.router.add_post(
+            "/api/config/limit_settings/powerLimits", self._post_power_limits
+        )
+        self.app.router.add_get("/api/config/timeofuse", self._get_timeofuse)
+        self.app.router.add_post("/api/config/timeofuse", self._post_timeofuse)
+        self.app.router.add_get(
+            "/solar_api/v1/GetPowerFlowRealtimeData.fcgi", self._power_flow
+        )
+
+    def _hash(self, data: str) -> str:
+        if self.config.algorithm.upper() in ("SHA-256", "SHA256"):
+            return hashlib.sha256(data.encode()).hexdigest()
+        return hashlib.md5(data.encode()).hexdigest()
+
+    def _challenge(self, stale: bool = False) -> web.Response:
+        self.stats.challenges += 1
+        nonce = os.urandom(16).hex()
+        self._nonces[nonce] = [time.monotonic(), 0, 0]
+        header = (
+            f'Digest realm="{REALM}", nonce="{nonce}", qop="auth", '
+            f"algorithm={self.config.algorithm}"
+        )
+        if stale:
+            self.stats.stale += 1
+            header += ", stale=true"
+        return web.Response(status=401, headers={self.config.challenge_header: header})
+
+    def _check_auth(self, request: web.Request) -> web.Response | None:
+        """Return a 401 response unless the request carries valid credentials."""
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Digest "):
+            return self._challenge()
+        params = {
+            k: v[1:-1] if v.startswith('"') else v
+            for k, v in _AUTH_PARAM.findall(header[7:])
+        }
+        state = self._nonces.get(params.get("nonce", ""))
+        if state is None:
+            return self._challenge()
+        created, uses, last_nc = state
+        expired = time.monotonic() - created > self.config.nonce_lifetime or (
+            self.config.nonce_max_uses and uses >= self.config.nonce_max_uses
+        )
+        if random.random() < self.config.storm_rate:
+            expired = True
+        ha1 = self._hash(f"{params.get('username')}:{REALM}:{self.config.password}")
+        ha2 = self._hash(f"{request.method}:{params.get('uri')}")
+        expected = self._hash(
+            f"{ha1}:{params['nonce']}:{params.get('nc')}:{params.get('cnonce')}:"
+            f"{params.get('qop')}:{ha2}"
+        )
+        if (
+            params.get("username") != self.config.user
+            or params.get("response") != expected
+            or params.get("uri") != request.path
+        ):
+            return self._challenge()
+        if expired:
+            del self._nonces[params["nonce"]]
+            return self._challenge(stale=True)
+        nc = int(params.get("nc", "0"), 16)
+        if nc <= last_nc:
+            return self._challenge(stale=True)
+        state[1] += 1
+        state[2] = nc
+        return None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.stats.requests += 1
+        self.stats.by_path[request.path] = self.stats.by_path.get(request.path, 0) + 1
+        self.stats.active += 1
+        self.stats.max_active = max(self.stats.max_active, self.stats.active)
+        try:
+            return await self._serve(request, handler)
+        finally:
+            self.stats.active -= 1
+
+    async def _serve(self, request: web.Request, handler):
+        if delay := self.config.latency + random.uniform(0, self.config.jitter):
+            await asyncio.sleep(delay)
+        if random.random() < self.config.error_rate:
+            self.stats.errors += 1
+            return web.Response(status=500, text="simulated error")
+        if request.path.startswith("/api/"):
+            # responses are mappings and may be falsy, compare with None
+            if (denied := self._check_auth(request)) is not None:
+                return denied
+        return await handler(request)
+
+    async def _login(self, request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    async def _get_power_limits(self, request: web.Request) -> web.Response:
+        return web.json_response(self.power_limits)
+
+    async def _post_power_limits(self, request: web.Request) -> web.Response:
+        self.power_limits = json.loads(await request.read())
+        return web.json_response({"writeSuccess": ["exportLimits"]})
+
+    async def _get_timeofuse(self, request: web.Request) -> web.Response:
+        return web.json_response(self.timeofuse)
+
+    async def _post_timeofuse(self, request: web.Request) -> web.Response:
+        self.timeofuse = json.loads(await request.read())
+        return web.json_response({"writeSuccess": ["timeofuse"]})
+
+    async def _power_flow(self, request: web.Request) -> web.Response:
+        active_power = self.power_limits["exportLimits"]["activePower"]
+        feed_in = self.config.production
+        if active_power["activated"] and active_power["softLimit"]["enabled"]:
+            feed_in = min(feed_in, active_power["softLimit"]["powerLimit"])
+        return web.json_response(
+            {"Body": {"Data": {"Site": {"P_Grid": -feed_in, "P_PV": feed_in}}}}
+        )
+
+
+async def start_simulator(
+    config: SimulatorConfig | None = None, host: str = "127.0.0.1", port: int = 0
+) -> tuple[Gen24Simulator, web.AppRunner, str]:
+    """Start a simulator, return it with its runner and "host:port"."""
+    simulator = Gen24Simulator(config)
+    runner = web.AppRunner(simulator.app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]  # noqa: SLF001
+    return simulator, runner, f"{host}:{bound_port}"
+
+
+def main() -> None:
+    """Run the simulator until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--user", default="technician")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--algorithm", default="MD5", choices=["MD5", "SHA-256"])
+    parser.add_argument("--www-authenticate", action="store_true")
+    parser.add_argument("--nonce-lifetime", type=float, default=60.0)
+    parser.add_argument("--nonce-max-uses", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--storm-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        user=args.user,
+        password=args.password,
+        algorithm=args.algorithm,
+        challenge_header=(
+            "WWW-Authenticate" if args.www_authenticate else "X-WWW-Authenticate"
+        ),
+        nonce_lifetime=args.nonce_lifetime,
+        nonce_max_uses=args.nonce_max_uses,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        storm_rate=args.storm_rate,
+    )
+    web.run_app(Gen24Simulator(config).app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
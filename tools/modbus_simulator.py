@@ -0,0 +1,192 @@
+"""Local stand-in for the SunSpec Modbus TCP server of a GEN24.
+
+Serves a SunSpec map with the common model (1), an inverter model (103) and
+the models 120, 121 and 123, answering function codes 3 and 16. Latency and
+failures can be injected to benchmark the Modbus transport.
+
+    python tools/modbus_simulator.py --port 5020 --wmax 10000 --latency 0.005
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import random
+import struct
+
+SUNSPEC_BASE = 40000
+# (model id, length) in map order
+MODELS = ((1, 66), (103, 50), (120, 26), (121, 30), (123, 24))
+
+# offsets from the model start, the header included
+WMAX = 2
+WMAX_SF = 22
+WMAXLIMPCT = 5
+WMAXLIM_ENA = 9
+WMAXLIMPCT_SF = 23
+
+ILLEGAL_FUNCTION = 1
+ILLEGAL_ADDRESS = 2
+DEVICE_FAILURE = 4
+
+
+@dataclass
+class ModbusSimulatorConfig:
+    """Behaviour of the simulated Modbus server."""
+
+    unit_id: int = 1
+    # WMax = wmax * 10**wmax_sf, WMaxLimPct in steps of 10**pct_sf %
+    wmax: int = 10000
+    wmax_sf: int = 0
+    pct_sf: int = -2
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+
+
+@dataclass
+class ModbusSimulatorStats:
+    """Counters of the simulated Modbus server."""
+
+    connections: int = 0
+    requests: int = 0
+    reads: int = 0
+    writes: int = 0
+    errors: int = 0
+    by_function: dict[int, int] = field(default_factory=dict)
+
+
+class ModbusSimulator:
+    """Holding registers of a SunSpec device behind a Modbus TCP server."""
+
+    def __init__(self, config: ModbusSimulatorConfig | None = None) -> None:
+        """Initialize the register map."""
+        self.config = config or ModbusSimulatorConfig()
+        self.stats = ModbusSimulatorStats()
+        self.registers: dict[int, int] = {
+            SUNSPEC_BASE: 0x5375,
+            SUNSPEC_BASE + 1: 0x6E53,
+        }
+        self.models: dict[int, int] = {}
+        address = SUNSPEC_BASE + 2
+        for model, length in MODELS:
+            self.models[model] = address
+            self.registers[address] = model
+            self.registers[address + 1] = length
+            for offset in range(2, length + 2):
+                self.registers[address + offset] = 0
+            address += length + 2
+        self.registers[address] = 0xFFFF
+        self.registers[address + 1] = 0
+
+        settings = self.models[121]
+        self.registers[settings + WMAX] = self.config.wmax
+        self.registers[settings + WMAX_SF] = self.config.wmax_sf & 0xFFFF
+        controls = self.models[123]
+        self.registers[controls + WMAXLIMPCT] = round(100 / 10**self.config.pct_sf)
+        self.registers[controls + WMAXLIMPCT_SF] = self.config.pct_sf & 0xFFFF
+
+    @property
+    def limit(self) -> float | None:
+        """Active power limit in W, None while disabled."""
+        controls = self.models[123]
+        if not self.registers[controls + WMAXLIM_ENA]:
+            return None
+        pct = self.registers[controls + WMAXLIMPCT] * 10**self.config.pct_sf
+        return pct * self.config.wmax * 10**self.config.wmax_sf / 100
+
+    def _handle(self, function: int, data: bytes) -> bytes:
+        """Answer one PDU, return the response PDU."""
+        if function == 3:
+            address, count = struct.unpack(">HH", data[:4])
+            if not all(address + i in self.registers for i in range(count)):
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            self.stats.reads += 1
+            values = [self.registers[address + i] for i in range(count)]
+            return struct.pack(f">BB{count}H", function, 2 * count, *values)
+        if function == 16:
+            address, count, _ = struct.unpack(">HHB", data[:5])
+            values = struct.unpack(f">{count}H", data[5 : 5 + 2 * count])
+            if not all(address + i in self.registers for i in range(count)):
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            self.stats.writes += 1
+            for i, value in enumerate(values):
+                self.registers[address + i] = value
+            return struct.pack(">BHH", function, address, count)
+        return bytes((function | 0x80, ILLEGAL_FUNCTION))
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one client connection."""
+        self.stats.connections += 1
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                transaction, _, length, unit_id = struct.unpack(">HHHB", header)
+                pdu = await reader.readexactly(length - 1)
+                self.stats.requests += 1
+                self.stats.by_function[pdu[0]] = (
+                    self.stats.by_function.get(pdu[0], 0) + 1
+                )
+                if delay := self.config.latency + random.uniform(0, self.config.jitter):
+                    await asyncio.sleep(delay)
+                if random.random() < self.config.error_rate:
+                    self.stats.errors += 1
+                    response = bytes((pdu[0] | 0x80, DEVICE_FAILURE))
+                elif unit_id != self.config.unit_id:
+                    continue
+                else:
+                    response = self._handle(pdu[0], pdu[1:])
+                writer.write(
+                    struct.pack(">HHHB", transaction, 0, len(response) + 1, unit_id)
+                    + response
+                )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_modbus_simulator(
+    config: ModbusSimulatorConfig | None = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> tuple[ModbusSimulator, asyncio.Server, int]:
+    """Start a simulator, return it with its server and the bound port."""
+    simulator = ModbusSimulator(config)
+    server = await asyncio.start_server(simulator.handle_connection, host, port)
+    return simulator, server, server.sockets[0].getsockname()[1]
+
+
+def main() -> None:
+    """Run the simulator until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--unit-id", type=int, default=1)
+    parser.add_argument("--wmax", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = ModbusSimulatorConfig(
+        unit_id=args.unit_id,
+        wmax=args.wmax,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+
+    async def serve() -> None:
+        _, server, _ = await start_modbus_simulator(config, args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()